@@ -0,0 +1,185 @@
+import math
+
+import torch
+import torch.nn.functional as F
+
+# augmentation.py
+# Training augmentations applied to whole batches after collation, as a few
+# vectorized tensor ops, instead of per image on PIL images in the workers.
+
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+def augmentation_params(strength=1.0):
+    """
+    Magnitudes of the training augmentations, scaled by strength. 1.0 gives
+    the defaults below (RandomRotation(20), ColorJitter(0.3, 0.3, 0.3, 0.15),
+    RandomAffine(10, translate=(0.1, 0.1), scale=(0.9, 1.1))); 0 leaves
+    only the horizontal flip.
+
+    Returns:
+        dict: BatchAugment keyword arguments
+    """
+    return {
+        'rotation': 20.0 * strength,
+        'brightness': 0.3 * strength,
+        'contrast': 0.3 * strength,
+        'saturation': 0.3 * strength,
+        'hue': min(0.5, 0.15 * strength),
+        'affine_degrees': 10.0 * strength,
+        'translate': (min(1.0, 0.1 * strength), min(1.0, 0.1 * strength)),
+        'scale': (max(0.01, 1 - 0.1 * strength), 1 + 0.1 * strength),
+    }
+
+def normalize_batch(images):
+    """uint8 or [0, 1] float NCHW batch -> ImageNet-normalized float batch"""
+    if images.dtype == torch.uint8:
+        images = images.float().div_(255.0)
+    mean = torch.tensor(IMAGENET_MEAN, device=images.device).view(1, 3, 1, 1)
+    std = torch.tensor(IMAGENET_STD, device=images.device).view(1, 3, 1, 1)
+    return (images - mean) / std
+
+def _grayscale(images):
+    """ITU-R 601-2 luma, as torchvision's rgb_to_grayscale, shape N x 1 x H x W"""
+    r, g, b = images.unbind(dim=1)
+    return (0.299 * r + 0.587 * g + 0.114 * b).unsqueeze(1)
+
+def _blend(images, other, factor):
+    """Per-sample factor * images + (1 - factor) * other, clamped to [0, 1]"""
+    return (factor * images + (1.0 - factor) * other).clamp_(0.0, 1.0)
+
+def _shift_hue(images, shift):
+    """
+    Rotate each image's hue by shift (fraction of a turn, shape N x 1 x 1),
+    as torchvision's adjust_hue does via HSV. Saturation and value are
+    unchanged, so only hue is computed and the conversion back uses the
+    closed form channel = V - V*S * clamp(min(k, 4 - k), 0, 1).
+    """
+    # amax/amin and arithmetic masks rather than max(dim)/torch.where, which are far slower on CPU
+    maxc = images.amax(dim=1)
+    delta = maxc - images.amin(dim=1)  # = V * S
+    r, g, b = images.unbind(dim=1)
+
+    # Hue in sextants [0, 6); ties resolve to red, then green, like torchvision
+    is_r = r == maxc
+    is_g = (g == maxc) & ~is_r
+    is_b = ~(is_r | is_g)
+    hue = is_r * (g - b) + is_g * (b - r + 2.0 * delta) + is_b * (r - g + 4.0 * delta)
+    # Grey pixels (delta == 0) have a zero numerator, so their hue is 0 as in torchvision
+    hue = torch.remainder(hue / delta.clamp(min=1e-12) + shift * 6.0, 6.0)
+
+    channels = []
+    for n in (5.0, 3.0, 1.0):
+        k = torch.remainder(hue + n, 6.0)
+        channels.append(maxc - delta * torch.minimum(k, 4.0 - k).clamp_(0.0, 1.0))
+    return torch.stack(channels, dim=1)
+
+class BatchAugment:
+    """
+    The training augmentations of improved_train_model (RandomRotation(20),
+    RandomHorizontalFlip(0.5), ColorJitter(0.3, 0.3, 0.3, 0.15) and
+    RandomAffine(10, translate=(0.1, 0.1), scale=(0.9, 1.1))) for a whole
+    batch at once, with independent random parameters per sample.
+
+    The rotation, flip and affine are folded into one affine matrix per
+    sample and applied with a single grid_sample. Colour jitter runs its four
+    adjustments in a random order per batch (torchvision picks one per image).
+    All randomness comes from a seeded generator, so a given seed and input
+    sequence always produce the same batches.
+    """
+
+    def __init__(self, rotation=20.0, flip_p=0.5, brightness=0.3, contrast=0.3, saturation=0.3, hue=0.15,
+                 affine_degrees=10.0, translate=(0.1, 0.1), scale=(0.9, 1.1), interpolation='nearest',
+                 normalize=True, seed=None):
+        """
+        Args:
+            interpolation (str): grid_sample mode; 'nearest' matches the
+                torchvision defaults, 'bilinear' is smoother
+            normalize (bool): Return ImageNet-normalized floats (otherwise [0, 1] floats)
+            seed (int): Seed for the augmentation generator; drawn from
+                torch's global RNG if None, so torch.manual_seed still makes runs repeatable
+        """
+        self.rotation = rotation
+        self.flip_p = flip_p
+        self.brightness = brightness
+        self.contrast = contrast
+        self.saturation = saturation
+        self.hue = hue
+        self.affine_degrees = affine_degrees
+        self.translate = translate
+        self.scale = scale
+        self.interpolation = interpolation
+        self.normalize = normalize
+        if seed is None:
+            seed = int(torch.randint(2 ** 63 - 1, ()).item())
+        self.generator = torch.Generator()
+        self.generator.manual_seed(seed)
+
+    def _uniform(self, n, low, high):
+        return torch.rand(n, generator=self.generator) * (high - low) + low
+
+    def _geometry(self, images):
+        n = images.size(0)
+        angle = (self._uniform(n, -self.rotation, self.rotation)
+                 + self._uniform(n, -self.affine_degrees, self.affine_degrees)) * math.pi / 180.0
+        scale = self._uniform(n, *self.scale)
+        # Translation is a fraction of the image size; grid coordinates span 2 units
+        tx = self._uniform(n, -self.translate[0], self.translate[0]) * 2.0
+        ty = self._uniform(n, -self.translate[1], self.translate[1]) * 2.0
+        flip = torch.where(torch.rand(n, generator=self.generator) < self.flip_p, -1.0, 1.0)
+
+        # Inverse map from output to input coordinates: flip, then undo rotation, scale and shift.
+        # Grid coordinates are normalized per axis, so rotation terms carry the aspect ratio.
+        height, width = images.shape[-2:]
+        cos, sin = torch.cos(angle) / scale, torch.sin(angle) / scale
+        theta = torch.stack([
+            torch.stack([cos * flip, sin * height / width, -(cos * tx + sin * ty)], dim=1),
+            torch.stack([-sin * flip * width / height, cos, -(-sin * tx + cos * ty)], dim=1),
+        ], dim=1).to(images.device)
+
+        grid = F.affine_grid(theta, list(images.shape), align_corners=False)
+        # Areas rotated in from outside the image are filled with black, as torchvision does
+        return F.grid_sample(images, grid, mode=self.interpolation, padding_mode='zeros', align_corners=False)
+
+    def _color(self, images):
+        n = images.size(0)
+        device = images.device
+        factors = {
+            'brightness': self._uniform(n, max(0.0, 1 - self.brightness), 1 + self.brightness),
+            'contrast': self._uniform(n, max(0.0, 1 - self.contrast), 1 + self.contrast),
+            'saturation': self._uniform(n, max(0.0, 1 - self.saturation), 1 + self.saturation),
+            'hue': self._uniform(n, -self.hue, self.hue),
+        }
+        order = torch.randperm(4, generator=self.generator).tolist()
+
+        for op in [('brightness', 'contrast', 'saturation', 'hue')[i] for i in order]:
+            factor = factors[op].to(device).view(n, 1, 1, 1)
+            if op == 'brightness':
+                images = _blend(images, torch.zeros_like(images), factor)
+            elif op == 'contrast':
+                mean = _grayscale(images).mean(dim=(1, 2, 3), keepdim=True)
+                images = _blend(images, mean, factor)
+            elif op == 'saturation':
+                images = _blend(images, _grayscale(images), factor)
+            else:
+                images = _shift_hue(images, factor.view(n, 1, 1))
+        return images
+
+    def __call__(self, images):
+        """
+        Args:
+            images (torch.Tensor): uint8 [0, 255] or float [0, 1] NCHW batch
+
+        Returns:
+            torch.Tensor: Augmented float batch (normalized if normalize=True)
+        """
+        if images.dtype == torch.uint8:
+            images = images.float().div_(255.0)
+        images = self._color(self._geometry(images))
+        return normalize_batch(images) if self.normalize else images
+
+    def state_dict(self):
+        return {'generator': self.generator.get_state()}
+
+    def load_state_dict(self, state):
+        self.generator.set_state(state['generator'])
@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from augmentation import BatchAugment
+from improved_train_model import build_transforms
+
+# bench_augmentation.py
+# Training augmentation throughput in images/sec: the per-image torchvision
+# pipeline (on PIL images and on uint8 tensors) vs. BatchAugment on batches.
+
+def images_per_sec(fn, items, n_images, repeat):
+    fn(items[0])
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(items[i % len(items)])
+    return n_images * repeat / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark training augmentation')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[32, 64])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, size=(256, 128, 128, 3), dtype=np.uint8)
+    pil_images = [Image.fromarray(p) for p in pixels]
+    tensor_images = [torch.from_numpy(p).permute(2, 0, 1).contiguous() for p in pixels]
+
+    pil_train, _ = build_transforms(cached=False)
+    tensor_train, _ = build_transforms(cached=True)
+    # The PIL pipeline starts with Resize, which is a no-op copy at 128x128
+    print(f"\n{'pipeline':<40}{'images/s':>10}")
+    print("-" * 50)
+    for name, transform, images in (('torchvision per image (PIL)', pil_train, pil_images),
+                                    ('torchvision per image (uint8 tensor)', tensor_train, tensor_images)):
+        rate = images_per_sec(lambda img: transform(img), images, 1, args.repeat * 32)
+        print(f"{name:<40}{rate:>10.0f}")
+
+    augment = BatchAugment(seed=0)
+    for batch_size in args.batch_sizes:
+        batches = [torch.stack(tensor_images[i:i + batch_size]) for i in range(0, len(tensor_images) - batch_size + 1, batch_size)]
+        rate = images_per_sec(augment, batches, batch_size, args.repeat)
+        print(f"{f'BatchAugment, batch {batch_size}':<40}{rate:>10.0f}")
+
+if __name__ == "__main__":
+    main()
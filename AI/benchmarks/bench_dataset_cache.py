@@ -0,0 +1,82 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import torch
+from torch.utils.data import DataLoader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_cache import CachedSkinToneDataset
+from improved_train_model import SkinToneDataset, build_transforms
+from skintone_match import CNNModel
+from synthetic_data import write_skintone_folders
+
+# bench_dataset_cache.py
+# Epoch time of the training input pipeline: decoding every JPEG each epoch
+# vs. reading pre-decoded pixels from the memory-mapped uint8 cache.
+
+def time_epochs(dataset, batch_size, num_workers, epochs, model=None):
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True, num_workers=num_workers,
+                        persistent_workers=num_workers > 0)
+    optimizer = torch.optim.AdamW(model.parameters()) if model is not None else None
+    times = []
+    for _ in range(epochs):
+        start = time.perf_counter()
+        for images, labels in loader:
+            if model is not None:
+                optimizer.zero_grad()
+                torch.nn.functional.cross_entropy(model(images), labels).backward()
+                optimizer.step()
+        times.append(time.perf_counter() - start)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the decoded image cache')
+    parser.add_argument('--images-per-class', type=int, default=250)
+    parser.add_argument('--resolution', type=int, nargs=2, default=[1024, 768], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--num-workers', type=int, default=2)
+    parser.add_argument('--with-model', action='store_true', help='include CNNModel forward/backward in the epoch')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        data_dir = write_skintone_folders(os.path.join(tmp, 'data_skintone'), args.images_per_class, tuple(args.resolution))
+        cache_dir = os.path.join(tmp, 'data_skintone_cache')
+        source = SkinToneDataset(data_dir)
+        jpeg_train, _ = build_transforms(cached=False)
+        cached_train, _ = build_transforms(cached=True)
+
+        start = time.perf_counter()
+        cached = CachedSkinToneDataset(source, cache_dir, transform=cached_train)
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        CachedSkinToneDataset(source, cache_dir)
+        check_s = time.perf_counter() - start
+
+        source.transform = jpeg_train
+        results = {}
+        for name, dataset in (('jpeg decode', source), ('uint8 cache', cached)):
+            model = CNNModel(num_skin_tones=4) if args.with_model else None
+            results[name] = time_epochs(dataset, args.batch_size, args.num_workers, args.epochs, model)
+
+        print(f"\n{len(source)} images at {args.resolution[0]}x{args.resolution[1]}, "
+              f"{args.num_workers} workers{', with model step' if args.with_model else ', input pipeline only'}")
+        print(f"Cache build: {build_s:.1f}s (one-time), validity check on reuse: {check_s * 1000:.1f}ms")
+        print(f"\n{'pipeline':<14}{'first epoch s':>15}{'mean epoch s':>14}{'images/s':>11}")
+        print("-" * 54)
+        for name, times in results.items():
+            mean = sum(times) / len(times)
+            print(f"{name:<14}{times[0]:>15.2f}{mean:>14.2f}{len(source) / mean:>11.0f}")
+        speedup = (sum(results['jpeg decode']) / sum(results['uint8 cache']))
+        print(f"\nEpoch speedup with the cache: {speedup:.1f}x")
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    main()
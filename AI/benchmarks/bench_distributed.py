@@ -0,0 +1,103 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_data import write_skintone_folders
+
+# bench_distributed.py
+# Scaling report for data-parallel training: the same data, epochs and
+# global batch size trained with 1, 2, 4, 8 torchrun processes (strong
+# scaling), each process getting an equal share of the CPU threads.
+
+def run_worker(args):
+    """Entry point inside torchrun: train, and have rank 0 write the summary"""
+    from improved_train_model import train_imbalance_focused_model
+    import torch
+
+    torch.manual_seed(args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = train_imbalance_focused_model(
+            data_dir=args.data_dir, num_epochs=args.epochs, batch_size=args.batch_size,
+            num_workers=0, cache_dir=args.data_dir + '_cache', output_path=args.result + '.pth',
+            augment='batch', augment_seed=args.seed
+        )
+    if int(os.environ.get('RANK', '0')) == 0:
+        with open(args.result, 'w') as f:
+            json.dump({
+                'epoch_times': summary['epoch_times'],
+                'best_weighted_f1': summary['best_weighted_f1'],
+                'final_weighted_f1': summary['final_metrics']['weighted_f1'],
+            }, f)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark multi-process data-parallel training')
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--images-per-class', type=int, default=150)
+    parser.add_argument('--resolution', type=int, nargs=2, default=[320, 240], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--global-batch', type=int, default=32, help='split evenly across the processes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--data-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--batch-size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    cpus = os.cpu_count()
+    tmp = tempfile.mkdtemp()
+    try:
+        data_dir = write_skintone_folders(os.path.join(tmp, 'data_skintone'), args.images_per_class, tuple(args.resolution))
+        results = {}
+        for n in args.processes:
+            result_path = os.path.join(tmp, f'result-{n}.json')
+            env = dict(os.environ, OMP_NUM_THREADS=str(max(1, cpus // n)))
+            command = [sys.executable, '-m', 'torch.distributed.run', '--standalone', f'--nproc-per-node={n}',
+                       os.path.abspath(__file__), '--worker', '--data-dir', data_dir, '--epochs', str(args.epochs),
+                       '--batch-size', str(max(1, args.global_batch // n)), '--seed', str(args.seed),
+                       '--result', result_path]
+            completed = subprocess.run(command, env=env, capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(completed.stderr[-2000:])
+                sys.exit(f"{n}-process run failed")
+            with open(result_path) as f:
+                results[n] = json.load(f)
+            print(f"  {n} process(es): done")
+
+        print(f"\n{args.images_per_class * 4} images, {args.epochs} epochs, global batch {args.global_batch}, "
+              f"{cpus} CPUs")
+        print(f"\n{'processes':>10}{'threads each':>14}{'epoch s':>9}{'images/s':>10}{'speedup':>9}"
+              f"{'efficiency':>12}{'val F1':>8}")
+        print("-" * 72)
+        train_images = int(args.images_per_class * 4 * 0.8)
+        # Speedup over the first process count, scaled by that count (normally 1 process = 1.0x)
+        base_n, base_s = None, None
+        for n, result in results.items():
+            # The first epoch includes the cache build and process group warm-up
+            times = result['epoch_times'][1:] or result['epoch_times']
+            epoch_s = float(np.mean(times))
+            if base_n is None:
+                base_n, base_s = n, epoch_s
+            speedup = base_s / epoch_s * base_n
+            print(f"{n:>10}{max(1, cpus // n):>14}{epoch_s:>9.2f}{train_images / epoch_s:>10.0f}{speedup:>8.2f}x"
+                  f"{speedup / n:>11.0%}{result['final_weighted_f1']:>8.3f}")
+        if cpus < max(args.processes):
+            print(f"\nNote: only {cpus} CPUs, so runs with more processes than CPUs are oversubscribed")
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    main()
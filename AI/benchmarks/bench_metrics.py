@@ -0,0 +1,64 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from improved_train_model import calculate_focused_metrics
+from streaming_metrics import StreamingConfusionMatrix
+
+# bench_metrics.py
+# Per-epoch cost of the training metrics: per-batch .cpu().numpy() into
+# Python lists plus sklearn scoring vs. the on-device confusion matrix.
+
+CLASS_NAMES = ['Dark', 'Light', 'Mid-Dark', 'Mid-Light']
+
+def list_and_sklearn(batches):
+    predictions, labels = [], []
+    for predicted, target in batches:
+        predictions.extend(predicted.cpu().numpy())
+        labels.extend(target.cpu().numpy())
+    with contextlib.redirect_stdout(io.StringIO()):
+        return calculate_focused_metrics(labels, predictions, CLASS_NAMES)
+
+def streaming(batches, device):
+    confusion = StreamingConfusionMatrix(len(CLASS_NAMES), device)
+    for predicted, target in batches:
+        confusion.update(predicted, target)
+    return confusion.compute()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark training-loop metrics')
+    parser.add_argument('--samples', type=int, nargs='+', default=[2000, 20000, 200000])
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    generator = torch.Generator().manual_seed(0)
+    print(f"\n{'samples':>8}{'lists + sklearn ms':>20}{'streaming ms':>14}{'identical':>11}")
+    print("-" * 53)
+    for n in args.samples:
+        target = torch.randint(0, 4, (n,), generator=generator)
+        predicted = torch.where(torch.rand(n, generator=generator) < 0.7, target, torch.randint(0, 4, (n,), generator=generator))
+        batches = [(predicted[i:i + args.batch_size].to(device), target[i:i + args.batch_size].to(device))
+                   for i in range(0, n, args.batch_size)]
+
+        start = time.perf_counter()
+        expected = list_and_sklearn(batches)
+        sklearn_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        actual = streaming(batches, device)
+        streaming_ms = (time.perf_counter() - start) * 1000
+
+        identical = all(np.array_equal(np.asarray(expected[key]), np.asarray(actual[key])) for key in expected)
+        print(f"{n:>8}{sklearn_ms:>20.1f}{streaming_ms:>14.1f}{str(identical):>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from improved_train_model import train_imbalance_focused_model
+from synthetic_data import write_skintone_folders
+
+# bench_precision.py
+# Training epoch time and validation weighted F1 of the fp32 NCHW baseline
+# vs. channels-last, bf16 autocast and gradient accumulation.
+
+# name -> (precision, channels_last, accumulation_steps)
+CONFIGS = {
+    'fp32': ('fp32', False, 1),
+    'fp32 channels-last': ('fp32', True, 1),
+    'bf16': ('bf16', False, 1),
+    'bf16 channels-last': ('bf16', True, 1),
+    'bf16 channels-last, accumulate 2': ('bf16', True, 2),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark mixed-precision and channels-last training')
+    parser.add_argument('--images-per-class', type=int, default=150)
+    parser.add_argument('--resolution', type=int, nargs=2, default=[320, 240], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--epochs', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--num-workers', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        data_dir = write_skintone_folders(os.path.join(tmp, 'data_skintone'), args.images_per_class, tuple(args.resolution))
+        results = {}
+        for name in args.configs:
+            precision, channels_last, accumulation_steps = CONFIGS[name]
+            # Same sampler order, initial weights and augmentations for every config
+            torch.manual_seed(args.seed)
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[name] = train_imbalance_focused_model(
+                    data_dir=data_dir, num_epochs=args.epochs, batch_size=args.batch_size,
+                    num_workers=args.num_workers, cache_dir=os.path.join(tmp, 'data_skintone_cache'),
+                    output_path=os.path.join(tmp, 'model.pth'), augment='batch', augment_seed=args.seed,
+                    precision=precision, channels_last=channels_last, accumulation_steps=accumulation_steps
+                )
+            print(f"  {name}: done")
+
+        print(f"\n{args.images_per_class * 4} images, {args.epochs} epochs, batch {args.batch_size}, "
+              f"{torch.get_num_threads()} threads")
+        print(f"\n{'config':<36}{'epoch s':>9}{'speedup':>9}{'best val F1':>13}{'final val F1':>14}")
+        print("-" * 81)
+        baseline = None
+        for name, result in results.items():
+            # The first epoch includes the cache build and oneDNN kernel selection
+            times = result['epoch_times'][1:] or result['epoch_times']
+            epoch_s = float(np.mean(times))
+            baseline = baseline or epoch_s
+            print(f"{name:<36}{epoch_s:>9.2f}{baseline / epoch_s:>8.2f}x"
+                  f"{result['best_weighted_f1']:>13.4f}{result['final_metrics']['weighted_f1']:>14.4f}")
+        if args.configs[0] != 'fp32':
+            print(f"\nSpeedups are relative to '{args.configs[0]}'")
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    main()
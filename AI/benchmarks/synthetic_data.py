@@ -0,0 +1,53 @@
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+# synthetic_data.py
+# A synthetic data_skintone folder for the training benchmarks, so they run
+# without the real dataset. Each class gets its own skin colour range, so a
+# model can actually learn it and F1 comparisons mean something.
+
+CLASS_FOLDERS = ['dark', 'light', 'mid-dark', 'mid-light']
+
+# Rough RGB centre of each class's skin colour
+CLASS_SKIN_RGB = {
+    'dark': (95, 60, 45),
+    'light': (230, 195, 170),
+    'mid-dark': (150, 105, 80),
+    'mid-light': (200, 150, 120),
+}
+
+def synthetic_face_jpeg(width, height, skin_rgb, rng, quality=90):
+    """JPEG bytes of a skin-coloured face blob over a noisy gradient"""
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    background = np.stack([xs / width * 160, ys / height * 120, np.full_like(xs, 90)], axis=-1)
+    skin = np.asarray(skin_rgb, dtype=np.float32) + rng.normal(0, 12, size=3).astype(np.float32)
+    cy = height * rng.uniform(0.35, 0.55)
+    cx = width * rng.uniform(0.4, 0.6)
+    face = (((ys - cy) / (height * 0.3)) ** 2 + ((xs - cx) / (width * 0.22)) ** 2) <= 1.0
+    pixels = np.where(face[..., None], skin, background)
+    pixels += rng.normal(0, 12, size=pixels.shape).astype(np.float32)
+
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+def write_skintone_folders(root, images_per_class, resolution=(1024, 768), seed=0, imbalance=(1.0, 1.2, 1.3, 0.8)):
+    """
+    Write root/<class>/<n>.jpg for every class, with a mild class imbalance
+    like the real dataset's.
+
+    Returns:
+        str: root
+    """
+    rng = np.random.default_rng(seed)
+    width, height = resolution
+    for class_name, factor in zip(CLASS_FOLDERS, imbalance):
+        class_dir = os.path.join(root, class_name)
+        os.makedirs(class_dir, exist_ok=True)
+        for i in range(max(1, int(images_per_class * factor))):
+            with open(os.path.join(class_dir, f'{i}.jpg'), 'wb') as f:
+                f.write(synthetic_face_jpeg(width, height, CLASS_SKIN_RGB[class_name], rng))
+    return root
@@ -0,0 +1,169 @@
+import copy
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+import numpy as np
+import torch
+
+# checkpointing.py
+# Full training-state checkpoints written by a background thread, so the
+# training loop only pays for an in-memory copy of the state.
+
+CHECKPOINT_FORMAT_VERSION = 2
+CHECKPOINT_PATTERN = re.compile(r'^checkpoint-e(\d+)-b(\d+)\.pth$')
+
+def checkpoint_filename(epoch, batches_done):
+    """Zero-padded, so name order is training order"""
+    return f"checkpoint-e{epoch:04d}-b{batches_done:06d}.pth"
+
+def list_checkpoints(directory):
+    """Complete periodic checkpoints in directory, oldest first"""
+    if not directory or not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if CHECKPOINT_PATTERN.match(name))
+    return [os.path.join(directory, name) for name in names]
+
+def latest_checkpoint(directory):
+    checkpoints = list_checkpoints(directory)
+    return checkpoints[-1] if checkpoints else None
+
+def load_checkpoint(path):
+    # Checkpoints hold Python and NumPy RNG states, so they can't be loaded weights-only
+    checkpoint = torch.load(path, map_location='cpu', weights_only=False)
+    if checkpoint.get('format_version') != CHECKPOINT_FORMAT_VERSION:
+        raise ValueError(f"{path} is not a training checkpoint (format {checkpoint.get('format_version')})")
+    return checkpoint
+
+def snapshot(state):
+    """Copy of a nested state (dicts, lists, tensors) with every tensor cloned to the CPU"""
+    if isinstance(state, torch.Tensor):
+        return state.detach().to('cpu', copy=True)
+    if isinstance(state, dict):
+        return {key: snapshot(value) for key, value in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot(value) for value in state)
+    return copy.deepcopy(state)
+
+def capture_rng_state():
+    """Python, NumPy and torch (CPU and CUDA) global RNG states"""
+    state = {
+        'python': random.getstate(),
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+def restore_rng_state(state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+def write_atomic(state, path):
+    """torch.save under a temporary name, then rename, so readers never see a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+class AsyncCheckpointer:
+    """
+    Saves checkpoints from a background writer thread.
+
+    save() copies the state on the calling thread and returns; the
+    serialization and disk write happen on the writer. At most one copy
+    waits behind the one being written, so if the disk can't keep up save()
+    blocks instead of piling up copies in memory. A failed write is raised
+    from the next save(), wait() or close().
+
+    The writer is not a daemon thread: if training dies with checkpoints
+    still queued (e.g. Ctrl-C), they are written before the process exits.
+    """
+
+    def __init__(self, directory=None, keep=2):
+        """
+        Args:
+            directory (str): Where periodic checkpoints go (None: only
+                explicit paths are written)
+            keep (int): Periodic checkpoints kept; older ones are deleted
+        """
+        self.directory = directory
+        self.keep = keep
+        self.saves = 0
+        self.save_seconds = 0.0  # spent in save() on the training thread
+        self.write_seconds = 0.0  # spent writing on the background thread
+        self.last_path = None
+        self._error = None
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name='checkpoint-writer')
+        self._thread.start()
+
+    def save(self, state, path):
+        """
+        Args:
+            state (dict): Any nested state; tensors are copied before returning
+            path (str): Destination file
+        """
+        self._enqueue(state, path, rotate=False)
+
+    def save_checkpoint(self, state, epoch, batches_done):
+        """Periodic checkpoint in the checkpoint directory, keeping the newest `keep`"""
+        if self.directory is None:
+            raise ValueError("AsyncCheckpointer has no directory for periodic checkpoints")
+        self._enqueue(state, os.path.join(self.directory, checkpoint_filename(epoch, batches_done)), rotate=True)
+
+    def _enqueue(self, state, path, rotate):
+        self._raise_error()
+        start = time.perf_counter()
+        self._queue.put((snapshot(state), path, rotate))
+        self.saves += 1
+        self.save_seconds += time.perf_counter() - start
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                # Queue drained and the main thread gone: the interpreter is exiting
+                if not threading.main_thread().is_alive():
+                    return
+                continue
+            try:
+                if item is None:
+                    return
+                state, path, rotate = item
+                start = time.perf_counter()
+                write_atomic(state, path)
+                self.last_path = path
+                if rotate:
+                    for old in list_checkpoints(self.directory)[:-self.keep]:
+                        os.remove(old)
+                self.write_seconds += time.perf_counter() - start
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError(f"Checkpoint write failed: {error}") from error
+
+    def wait(self):
+        """Block until every queued checkpoint is on disk"""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        self._queue.join()
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
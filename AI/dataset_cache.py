@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+
+# dataset_cache.py
+# One-time decode + resize of the skin tone images into a memory-mapped
+# uint8 array, so training epochs read pixels instead of decoding JPEGs.
+
+CACHE_FORMAT_VERSION = 1
+
+def dataset_fingerprint(image_paths, labels, image_size):
+    """
+    Hash of every file's path, size and mtime plus the labels and output
+    size. Adding, removing, replacing or relabelling an image changes it.
+    """
+    digest = hashlib.sha256(f"{CACHE_FORMAT_VERSION}:{image_size}".encode())
+    for path, label in zip(image_paths, labels):
+        stat = os.stat(path)
+        digest.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}|{label}\n".encode())
+    return digest.hexdigest()
+
+def _cache_paths(cache_dir):
+    return {
+        'images': os.path.join(cache_dir, 'images.npy'),
+        'labels': os.path.join(cache_dir, 'labels.npy'),
+        'meta': os.path.join(cache_dir, 'meta.json'),
+    }
+
+def _decode_resized(path, image_size):
+    """Same pixels as transforms.Resize(image_size) on the decoded PIL image"""
+    height, width = image_size
+    try:
+        image = Image.open(path).convert('RGB')
+    except Exception as e:
+        print(f"Error loading image {path}: {e}")
+        image = Image.new('RGB', (width, height), color='black')
+    return np.asarray(image.resize((width, height), Image.BILINEAR), dtype=np.uint8)
+
+def build_image_cache(image_paths, labels, cache_dir, image_size=(128, 128), num_workers=4):
+    """
+    Decode and resize every image into cache_dir/images.npy (N x H x W x 3 uint8).
+
+    Returns:
+        dict: The cache metadata (fingerprint, shape, build time)
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = _cache_paths(cache_dir)
+    height, width = image_size
+    shape = (len(image_paths), height, width, 3)
+    start = time.perf_counter()
+
+    # Write under a temporary name so an interrupted build is never mistaken for a cache
+    tmp_images = paths['images'] + '.tmp'
+    images = np.lib.format.open_memmap(tmp_images, mode='w+', dtype=np.uint8, shape=shape)
+    with ThreadPoolExecutor(max_workers=max(1, num_workers)) as pool:
+        # PIL releases the GIL while decoding, so threads overlap the JPEG work
+        for i, pixels in enumerate(pool.map(lambda p: _decode_resized(p, image_size), image_paths)):
+            images[i] = pixels
+    images.flush()
+    del images
+    os.replace(tmp_images, paths['images'])
+    np.save(paths['labels'], np.asarray(labels, dtype=np.int64))
+
+    meta = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'fingerprint': dataset_fingerprint(image_paths, labels, image_size),
+        'shape': list(shape),
+        'build_seconds': time.perf_counter() - start,
+    }
+    with open(paths['meta'], 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+def cache_is_valid(image_paths, labels, cache_dir, image_size=(128, 128)):
+    paths = _cache_paths(cache_dir)
+    if not all(os.path.exists(p) for p in paths.values()):
+        return False
+    with open(paths['meta']) as f:
+        meta = json.load(f)
+    return (meta.get('format_version') == CACHE_FORMAT_VERSION
+            and meta.get('fingerprint') == dataset_fingerprint(image_paths, labels, image_size))
+
+class CachedSkinToneDataset(Dataset):
+    """
+    SkinToneDataset backed by the uint8 image cache.
+    Samples are uint8 CHW tensor views straight into the memory map (no
+    decode, no copy); transforms must therefore accept tensors.
+    """
+
+    def __init__(self, source, cache_dir, transform=None, image_size=(128, 128), num_workers=4):
+        """
+        Args:
+            source (SkinToneDataset): Provides the image paths, labels and classes
+            cache_dir (str): Where the cache lives; (re)built if missing or stale
+            transform (callable): Applied to each uint8 CHW tensor
+        """
+        self.classes = source.classes
+        self.class_to_idx = source.class_to_idx
+        self.labels = list(source.labels)
+        self.transform = transform
+        self.cache_dir = cache_dir
+        self._images = None
+
+        if cache_is_valid(source.images, self.labels, cache_dir, image_size):
+            print(f"Using decoded image cache in {cache_dir}")
+        else:
+            print(f"Building decoded image cache in {cache_dir} ({len(self.labels)} images)...")
+            meta = build_image_cache(source.images, self.labels, cache_dir, image_size, num_workers)
+            print(f"  Cache built in {meta['build_seconds']:.1f}s")
+
+    def _open(self):
+        # Opened lazily so DataLoader workers each map the file rather than
+        # receive a pickled copy of the array. Copy-on-write mode keeps the
+        # file read-only while giving torch.from_numpy a writable buffer.
+        if self._images is None:
+            self._images = np.load(_cache_paths(self.cache_dir)['images'], mmap_mode='c')
+        return self._images
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_images'] = None
+        return state
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        image = torch.from_numpy(self._open()[idx]).permute(2, 0, 1)
+        if self.transform:
+            image = self.transform(image)
+        return image, self.labels[idx]
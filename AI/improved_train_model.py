@@ -1,6 +1,7 @@
 import torch
 import torch.nn as nn
 import torch.optim as optim
+import torch.distributed as dist
 import torchvision.transforms as transforms
 from torch.utils.data import DataLoader, Dataset, WeightedRandomSampler
 import numpy as np
@@ -8,12 +9,21 @@ from sklearn.model_selection import StratifiedShuffleSplit
 from sklearn.metrics import f1_score, precision_score, recall_score
 from sklearn.utils.class_weight import compute_class_weight
 import os
+import sys
+import time
+import argparse
+import contextlib
 from PIL import Image
 from pathlib import Path
 from collections import Counter
 
 # Import the model
 from skintone_match import CNNModel
+from dataset_cache import CachedSkinToneDataset
+from augmentation import BatchAugment, augmentation_params, normalize_batch
+from streaming_metrics import StreamingConfusionMatrix
+from checkpointing import (CHECKPOINT_FORMAT_VERSION, AsyncCheckpointer, capture_rng_state, latest_checkpoint,
+                           load_checkpoint, restore_rng_state, snapshot)
 
 class SkinToneDataset(Dataset):
     def __init__(self, data_dir, transform=None):
@@ -72,6 +82,22 @@ class SkinToneDataset(Dataset):
                 dummy_image = self.transform(dummy_image)
             return dummy_image, label
 
+class TransformSubset(Dataset):
+    """Subset of a dataset with its own transform, so train and val can differ"""
+    def __init__(self, dataset, indices, transform=None):
+        self.dataset = dataset
+        self.indices = indices
+        self.transform = transform
+    
+    def __len__(self):
+        return len(self.indices)
+    
+    def __getitem__(self, idx):
+        image, label = self.dataset[self.indices[idx]]
+        if self.transform:
+            image = self.transform(image)
+        return image, label
+
 class ImbalanceFocusedLoss(nn.Module):
     """
     Custom loss that heavily penalizes misclassifications on minority classes
@@ -83,6 +109,10 @@ class ImbalanceFocusedLoss(nn.Module):
         self.label_smoothing = label_smoothing
         
     def forward(self, inputs, targets):
+        # Always computed in fp32: under bf16 autocast the logits arrive in
+        # bf16, whose 8-bit mantissa is too coarse for the focal term
+        inputs = inputs.float()
+        
         # Label smoothing to prevent overconfidence
         num_classes = inputs.size(1)
         targets_smooth = torch.zeros_like(inputs).scatter_(1, targets.unsqueeze(1), 1)
@@ -99,15 +129,55 @@ class ImbalanceFocusedLoss(nn.Module):
         else:
             weighted_loss = weighted_loss.sum(dim=1)
         
-        # Focal loss component
-        probs = torch.softmax(inputs, dim=1)
+        # Focal loss component. Probabilities come from the same log-softmax
+        # as the cross entropy, and 1 - pt is clamped because rounding can
+        # push pt fractionally above 1, where a fractional gamma gives NaN
+        probs = log_probs.exp()
         pt = (targets_smooth * probs).sum(dim=1)
-        focal_weight = (1 - pt) ** self.focal_gamma
+        focal_weight = (1 - pt).clamp(min=0) ** self.focal_gamma
         
         return (focal_weight * weighted_loss).mean()
 
-def create_balanced_sampler(dataset, labels):
-    """Create a weighted sampler to balance classes during training"""
+class ResumableWeightedSampler(WeightedRandomSampler):
+    """
+    WeightedRandomSampler drawing from its own generator, whose next epoch
+    can start part-way through: restore the generator state the epoch was
+    drawn from and set start_offset to the samples already trained on, and
+    the remaining samples come out in the original order.
+    
+    With num_replicas > 1 (distributed training) every rank draws the same
+    balanced sample from the same seed and keeps every num_replicas-th
+    draw, so ranks get disjoint, equally sized, balanced shares of it.
+    """
+    def __init__(self, weights, num_samples, seed, num_replicas=1, rank=0):
+        generator = torch.Generator()
+        generator.manual_seed(seed)
+        per_rank = -(-num_samples // num_replicas)
+        super(ResumableWeightedSampler, self).__init__(weights, per_rank * num_replicas, replacement=True,
+                                                       generator=generator)
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.start_offset = 0
+    
+    def __iter__(self):
+        order = torch.multinomial(self.weights, self.num_samples, self.replacement, generator=self.generator)
+        order = order[self.rank::self.num_replicas]
+        offset, self.start_offset = self.start_offset, 0
+        return iter(order[offset:].tolist())
+    
+    def __len__(self):
+        return self.num_samples // self.num_replicas - self.start_offset
+
+def create_balanced_sampler(dataset, labels, seed=None, num_replicas=1, rank=0):
+    """
+    Create a weighted sampler to balance classes during training
+    
+    Args:
+        seed (int): Sampler seed; drawn from torch's global RNG if None, so
+            torch.manual_seed still makes runs repeatable. Must be the same on every rank
+        num_replicas (int): Distributed world size
+        rank (int): This process's rank
+    """
     
     # Count samples per class
     class_counts = Counter(labels)
@@ -126,10 +196,14 @@ def create_balanced_sampler(dataset, labels):
         weight = class_weights.get(i, 0)
         print(f"  {class_name}: {weight:.3f}")
     
-    return WeightedRandomSampler(
+    if seed is None:
+        seed = int(torch.randint(2 ** 62, (1,)).item())
+    return ResumableWeightedSampler(
         weights=sample_weights,
         num_samples=len(sample_weights),
-        replacement=True
+        seed=seed,
+        num_replicas=num_replicas,
+        rank=rank
     )
 
 def calculate_focused_metrics(y_true, y_pred, class_names):
@@ -144,6 +218,21 @@ def calculate_focused_metrics(y_true, y_pred, class_names):
     per_class_precision = precision_score(y_true, y_pred, average=None, zero_division=0)
     per_class_recall = recall_score(y_true, y_pred, average=None, zero_division=0)
     
+    return report_focused_metrics({
+        'weighted_f1': weighted_f1,
+        'macro_f1': macro_f1,
+        'per_class_f1': per_class_f1,
+        'per_class_precision': per_class_precision,
+        'per_class_recall': per_class_recall
+    }, class_names)
+
+def report_focused_metrics(metrics, class_names):
+    """Print the metrics from calculate_focused_metrics or StreamingConfusionMatrix.compute"""
+    weighted_f1, macro_f1 = metrics['weighted_f1'], metrics['macro_f1']
+    per_class_f1 = metrics['per_class_f1']
+    per_class_precision = metrics['per_class_precision']
+    per_class_recall = metrics['per_class_recall']
+    
     print(f"FOCUSED METRICS (ignoring accuracy):")
     print(f"  Weighted F1: {weighted_f1:.4f}")
     print(f"  Macro F1:    {macro_f1:.4f}")
@@ -164,15 +253,93 @@ def calculate_focused_metrics(y_true, y_pred, class_names):
         if rec < 0.7:
             print(f"    LOW RECALL - missing true cases")
     
-    return {
-        'weighted_f1': weighted_f1,
-        'macro_f1': macro_f1,
-        'per_class_f1': per_class_f1,
-        'per_class_precision': per_class_precision,
-        'per_class_recall': per_class_recall
-    }
+    return metrics
 
-def train_imbalance_focused_model():
+def build_transforms(cached, augment='per-image', strength=1.0):
+    """
+    Train/val transforms. The decoded-image cache already holds 128x128 uint8
+    pixels, so its pipelines skip Resize and work on tensors instead of PIL images.
+    With augment='batch' both only produce uint8 tensors; augmentation and
+    normalization then happen on whole batches in the training loop.
+    strength scales the augmentation magnitudes (see augmentation_params).
+    """
+    if augment == 'batch':
+        base = None if cached else transforms.Compose([transforms.Resize((128, 128)), transforms.PILToTensor()])
+        return base, base
+    
+    normalize = transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+    params = augmentation_params(strength)
+    augment = [
+        # More aggressive augmentation to help with imbalance
+        transforms.RandomRotation(params['rotation']),
+        transforms.RandomHorizontalFlip(0.5),
+        transforms.ColorJitter(brightness=params['brightness'], contrast=params['contrast'],
+                               saturation=params['saturation'], hue=params['hue']),
+        transforms.RandomAffine(degrees=params['affine_degrees'], translate=params['translate'], scale=params['scale']),
+    ]
+    if cached:
+        to_float = transforms.ConvertImageDtype(torch.float32)
+        return transforms.Compose(augment + [to_float, normalize]), transforms.Compose([to_float, normalize])
+    
+    resize = transforms.Resize((128, 128))
+    train_transform = transforms.Compose([resize] + augment + [transforms.ToTensor(), normalize])
+    val_transform = transforms.Compose([resize, transforms.ToTensor(), normalize])
+    return train_transform, val_transform
+
+def train_imbalance_focused_model(data_dir='data_skintone', num_epochs=30, batch_size=None, num_workers=None,
+                                  cache_dir=None, output_path='best_imbalance_focused_model.pth',
+                                  augment='per-image', augment_seed=None, precision='fp32', channels_last=False,
+                                  accumulation_steps=1, checkpoint_dir=None, checkpoint_every=0, resume=None,
+                                  learning_rate=0.001, focal_gamma=2.0, label_smoothing=0.1, augment_strength=1.0,
+                                  on_epoch_end=None):
+    """
+    Args:
+        data_dir (str): Folder with one sub-folder of JPEGs per skin tone class
+        num_epochs (int): Maximum number of epochs
+        batch_size (int): Defaults to 64 on a GPU/MPS and 32 on CPU
+        num_workers (int): DataLoader workers, defaults to 8 on a GPU/MPS and 2 on CPU
+        cache_dir (str): If set, decode and resize the images once into a
+            memory-mapped uint8 cache there and train from it
+        output_path (str): Where the best checkpoint is saved
+        augment (str): "per-image" runs torchvision transforms on each sample
+            in the DataLoader workers; "batch" runs BatchAugment on whole
+            batches after collation
+        augment_seed (int): Seed for BatchAugment (plus the rank); drawn from torch's global RNG if None
+        precision (str): "fp32", or "bf16" to run the training forward pass
+            under autocast in bfloat16 (weights, gradients and the loss stay fp32)
+        channels_last (bool): Keep the model and input batches in NHWC
+            memory format, which the oneDNN convolutions run fastest on CPU
+        accumulation_steps (int): Batches whose gradients are summed per
+            optimizer step (effective batch = batch_size * accumulation_steps)
+        checkpoint_dir (str): If set, full training state (model, optimizer,
+            scheduler, RNGs, sampler position, early-stopping state) is
+            checkpointed there at each epoch end, by a background thread
+        checkpoint_every (int): Also checkpoint every N optimizer steps within an epoch
+        resume (str): Checkpoint file to continue from, or "latest" for the
+            newest one in checkpoint_dir. The run continues exactly as if it
+            had never stopped (same thread count and settings assumed)
+        learning_rate (float): AdamW learning rate
+        focal_gamma (float): ImbalanceFocusedLoss focal exponent
+        label_smoothing (float): ImbalanceFocusedLoss label smoothing
+        augment_strength (float): Scales the augmentation magnitudes (1.0 = defaults)
+        on_epoch_end (callable): Called as on_epoch_end(epoch, val_metrics)
+            after each epoch; returning True stops training (e.g. a sweep
+            pruning the trial). Under torchrun it must decide the same on every rank
+    
+    When launched by torchrun (WORLD_SIZE > 1) every process trains one
+    DistributedDataParallel replica over the gloo backend: batch_size is per
+    rank, the balanced sample and the validation set are split across ranks,
+    and metrics are summed over all ranks before F1 is computed, so every
+    rank makes the same scheduling and early-stopping decisions.
+    
+    Returns:
+        dict: best_weighted_f1, final_metrics and epoch_times, or None if no images were found
+    """
+    if precision not in ('fp32', 'bf16'):
+        raise ValueError(f"Unknown precision '{precision}'. Expected 'fp32' or 'bf16'.")
+    if accumulation_steps < 1:
+        raise ValueError("accumulation_steps must be at least 1")
+    
     print("🧠 IMBALANCE-FOCUSED CNN Training")
     print("Goal: Fix TN inflation + class imbalance issues")
     print("=" * 60)
@@ -192,43 +359,57 @@ def train_imbalance_focused_model():
         print(f"Using device: {device} (CPU)")
         print("Consider using GPU for faster training")
     
+    # Launched by torchrun: one data-parallel replica per process
+    distributed = int(os.environ.get('WORLD_SIZE', '1')) > 1
+    owns_process_group = distributed and not dist.is_initialized()
+    if owns_process_group:
+        dist.init_process_group(backend='gloo')
+    rank = dist.get_rank() if distributed else 0
+    world_size = dist.get_world_size() if distributed else 1
+    if distributed:
+        # gloo reduces CPU and CUDA tensors but not MPS ones
+        if device.type == 'cuda':
+            device = torch.device('cuda', int(os.environ.get('LOCAL_RANK', '0')))
+            torch.cuda.set_device(device)
+        elif device.type == 'mps':
+            device = torch.device('cpu')
+        print(f"Distributed: rank {rank} of {world_size} (gloo) on {device}")
+    
     # Enhanced data augmentation for minority classes
-    train_transform = transforms.Compose([
-        transforms.Resize((128, 128)),
-        # More aggressive augmentation to help with imbalance
-        transforms.RandomRotation(20),
-        transforms.RandomHorizontalFlip(0.5),
-        transforms.ColorJitter(brightness=0.3, contrast=0.3, saturation=0.3, hue=0.15),
-        transforms.RandomAffine(degrees=10, translate=(0.1, 0.1), scale=(0.9, 1.1)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-    
-    val_transform = transforms.Compose([
-        transforms.Resize((128, 128)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
+    train_transform, val_transform = build_transforms(cached=cache_dir is not None, augment=augment, strength=augment_strength)
+    # Each rank augments its share of the batch with its own random parameters
+    batch_augment = None
+    if augment == 'batch':
+        if augment_seed is None:
+            augment_seed = int(torch.randint(2 ** 62, (1,)).item())
+        batch_augment = BatchAugment(**augmentation_params(augment_strength), seed=augment_seed + rank)
+    prepare_eval_batch = normalize_batch if augment == 'batch' else (lambda images: images)
     
     # Load dataset
-    data_dir = 'data_skintone'
     full_dataset = SkinToneDataset(data_dir, transform=None)
     
     if len(full_dataset) == 0:
-                    print("No images found")
+        print("No images found")
         return
     
+    if cache_dir is not None:
+        # The first rank on each machine builds the cache while the others wait
+        first_on_node = int(os.environ.get('LOCAL_RANK', '0')) == 0
+        if distributed and not first_on_node:
+            dist.barrier()
+        full_dataset = CachedSkinToneDataset(full_dataset, cache_dir)
+        if distributed and first_on_node:
+            dist.barrier()
+    
     # Stratified train/val split
     print(f"\nCreating stratified split...")
     splitter = StratifiedShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
     
     for train_idx, val_idx in splitter.split(range(len(full_dataset)), full_dataset.labels):
-        train_dataset = torch.utils.data.Subset(full_dataset, train_idx)
-        val_dataset = torch.utils.data.Subset(full_dataset, val_idx)
-        
-        # Apply transforms
-        train_dataset.dataset.transform = train_transform
-        val_dataset.dataset.transform = val_transform
+        # Each subset applies its own transform to the shared, untransformed dataset
+        train_dataset = TransformSubset(full_dataset, train_idx, train_transform)
+        # Each rank validates a disjoint share; the confusion matrices are summed
+        val_dataset = TransformSubset(full_dataset, val_idx[rank::world_size], val_transform)
         break
     
     # Get training labels for balancing
@@ -236,7 +417,7 @@ def train_imbalance_focused_model():
     val_labels = [full_dataset.labels[i] for i in val_idx]
     
     print(f"Training samples: {len(train_dataset)}")
-    print(f"Validation samples: {len(val_dataset)}")
+    print(f"Validation samples: {len(val_idx)}")
     
     # Calculate class weights based on your actual data distribution
     # From your evaluation: dark(24.1%), light(27.3%), mid-dark(29.5%), mid-light(19.1%)
@@ -249,18 +430,29 @@ def train_imbalance_focused_model():
         print(f"  {name}: {weight:.3f}")
     
     # Create balanced sampler
-    balanced_sampler = create_balanced_sampler(full_dataset, train_labels)
+    sampler_seed = torch.randint(2 ** 62, (1,))
+    if distributed:
+        # Every rank draws the same balanced sample and takes its own share of it
+        dist.broadcast(sampler_seed, src=0)
+    balanced_sampler = create_balanced_sampler(full_dataset, train_labels, seed=int(sampler_seed.item()),
+                                               num_replicas=world_size, rank=rank)
+    # Seeds the DataLoader workers each epoch; its own generator so a resumed run can rewind it
+    loader_generator = torch.Generator()
+    loader_generator.manual_seed(int(torch.randint(2 ** 62, (1,)).item()))
     
     # Data loaders with balanced sampling - optimized for GPU/MPS
     use_accelerator = torch.backends.mps.is_available() or torch.cuda.is_available()
-    batch_size = 64 if use_accelerator else 32
-    num_workers = 8 if use_accelerator else 2
+    if batch_size is None:
+        batch_size = 64 if use_accelerator else 32
+    if num_workers is None:
+        num_workers = 8 if use_accelerator else 2
     
     train_loader = DataLoader(
         train_dataset, 
         batch_size=batch_size, 
         sampler=balanced_sampler,  # This ensures balanced batches
         num_workers=num_workers,
+        generator=loader_generator,
         pin_memory=torch.cuda.is_available()  # Only for CUDA, not MPS
     )
     val_loader = DataLoader(
@@ -280,21 +472,35 @@ def train_imbalance_focused_model():
     # Model
     model = CNNModel(num_skin_tones=4)
     model.to(device)
+    memory_format = torch.channels_last if channels_last else torch.contiguous_format
+    if channels_last:
+        model.to(memory_format=memory_format)
+    # DDP broadcasts rank 0's initial weights and averages gradients across
+    # ranks during backward; `model` stays the plain module for eval and saving
+    train_model = model
+    if distributed:
+        train_model = nn.parallel.DistributedDataParallel(model, device_ids=[device.index] if device.type == 'cuda' else None)
+    # Only the training forward pass is autocast; validation runs in fp32,
+    # the precision the API serves the model in
+    use_bf16 = precision == 'bf16'
+    print(f"Precision: {precision}{', channels-last' if channels_last else ''}"
+          f", effective batch {batch_size * accumulation_steps * world_size} "
+          f"({accumulation_steps} x {batch_size}{f' x {world_size} ranks' if distributed else ''})")
     
     # Imbalance-focused loss
     criterion = ImbalanceFocusedLoss(
         class_weights=class_weights_tensor,
-        focal_gamma=2.0,  # Focus on hard examples
-        label_smoothing=0.1  # Prevent overconfidence
+        focal_gamma=focal_gamma,  # Focus on hard examples
+        label_smoothing=label_smoothing  # Prevent overconfidence
     )
     
     print(f"Using ImbalanceFocusedLoss with:")
     print(f"  - Class weights: YES")
-    print(f"  - Focal loss (γ=2.0): YES") 
+    print(f"  - Focal loss (γ={focal_gamma}): YES") 
     print(f"  - Label smoothing: YES")
     
     # Optimizer
-    optimizer = optim.AdamW(model.parameters(), lr=0.001, weight_decay=1e-4)
+    optimizer = optim.AdamW(model.parameters(), lr=learning_rate, weight_decay=1e-4)
     
     # Scheduler focused on F1, not accuracy
     scheduler = optim.lr_scheduler.ReduceLROnPlateau(
@@ -302,59 +508,187 @@ def train_imbalance_focused_model():
     )
     
     # Training loop with F1 focus
-    num_epochs = 30
     best_weighted_f1 = 0.0
+    best_state = None
     patience = 8
     patience_counter = 0
+    epoch_times = []
+    start_epoch = 0
+    resume_batches = 0
+    stopped_early = False
+    
+    # Settings a resumed run must share with the checkpoint to follow the same trajectory
+    run_config = {
+        'train_samples': len(train_dataset),
+        'batch_size': batch_size,
+        'accumulation_steps': accumulation_steps,
+        'augment': augment,
+        'precision': precision,
+        'channels_last': channels_last,
+        'world_size': world_size,
+        'learning_rate': learning_rate,
+        'focal_gamma': focal_gamma,
+        'label_smoothing': label_smoothing,
+        'augment_strength': augment_strength,
+    }
+    
+    if resume is not None:
+        checkpoint_path = latest_checkpoint(checkpoint_dir) if resume == 'latest' else resume
+        if checkpoint_path is None:
+            raise FileNotFoundError(f"No checkpoint to resume from in {checkpoint_dir}")
+        checkpoint = load_checkpoint(checkpoint_path)
+        mismatched = {key: (checkpoint['config'].get(key), value) for key, value in run_config.items()
+                      if checkpoint['config'].get(key) != value}
+        if mismatched:
+            raise ValueError(f"Checkpoint {checkpoint_path} was written with different settings "
+                             f"(checkpoint, now): {mismatched}")
+        
+        model.load_state_dict(checkpoint['model_state_dict'])
+        optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+        scheduler.load_state_dict(checkpoint['scheduler_state_dict'])
+        best_weighted_f1 = checkpoint['best_weighted_f1']
+        best_state = checkpoint['best_state']
+        patience_counter = checkpoint['patience_counter']
+        epoch_times = checkpoint['epoch_times']
+        stopped_early = checkpoint['stopped_early']
+        start_epoch = checkpoint['epoch']
+        resume_batches = checkpoint['batches_done']
+        
+        balanced_sampler.generator.set_state(checkpoint['sampler_generator'])
+        balanced_sampler.start_offset = resume_batches * batch_size
+        rank_state = checkpoint['rank_states'][rank]
+        loader_generator.set_state(rank_state['loader_generator'])
+        if batch_augment is not None:
+            batch_augment.load_state_dict(rank_state['augment_state'])
+        restore_rng_state(rank_state['rng'])
+        
+        print(f"\nResuming from {checkpoint_path}: epoch {start_epoch + 1}, batch {resume_batches}")
+        if resume_batches and augment == 'per-image' and num_workers > 0:
+            print("Note: per-image augmentation in worker processes is only replayed exactly "
+                  "from end-of-epoch checkpoints")
+    
+    checkpointer = AsyncCheckpointer(checkpoint_dir)
+    
+    def save_training_state(epoch, batches_done, generator_states, train_confusion=None):
+        """
+        Queue a full-state checkpoint for resuming at (epoch, batches_done).
+        Called on every rank: rank 0 gathers the per-rank state and writes
+        one checkpoint (model and optimizer are identical on all ranks).
+        """
+        rank_states = [{
+            'loader_generator': generator_states[1],
+            'augment_state': batch_augment.state_dict() if batch_augment is not None else None,
+            'rng': capture_rng_state(),
+            'train_confusion': train_confusion.matrix.cpu() if train_confusion is not None else None,
+        }]
+        if distributed:
+            local_state = rank_states[0]
+            rank_states = [None] * world_size if rank == 0 else None
+            dist.gather_object(local_state, rank_states, dst=0)
+        if rank != 0:
+            return
+        checkpointer.save_checkpoint({
+            'format_version': CHECKPOINT_FORMAT_VERSION,
+            'config': run_config,
+            'epoch': epoch,
+            'batches_done': batches_done,
+            'model_state_dict': model.state_dict(),
+            'optimizer_state_dict': optimizer.state_dict(),
+            'scheduler_state_dict': scheduler.state_dict(),
+            'best_weighted_f1': best_weighted_f1,
+            'best_state': best_state,
+            'patience_counter': patience_counter,
+            'stopped_early': stopped_early,
+            'epoch_times': epoch_times,
+            'sampler_generator': generator_states[0],
+            'rank_states': rank_states,
+        }, epoch, batches_done)
     
     print(f"\nTraining for {num_epochs} epochs...")
     print(f"📈 SUCCESS METRIC: Weighted F1 Score (NOT accuracy!)")
+    if checkpoint_dir:
+        print(f"Checkpoints: {checkpoint_dir} (every {checkpoint_every} optimizer steps and each epoch end)"
+              if checkpoint_every else f"Checkpoints: {checkpoint_dir} (each epoch end)")
     
-    for epoch in range(num_epochs):
+    for epoch in range(start_epoch, num_epochs):
+        if stopped_early:
+            break
         print(f"\n📅 Epoch {epoch + 1}/{num_epochs}")
         print("-" * 40)
+        epoch_start = time.perf_counter()
+        # The generator states this epoch's sample order and worker seeds are
+        # drawn from; a mid-epoch checkpoint rewinds to them and skips ahead
+        epoch_generator_states = (balanced_sampler.generator.get_state(), loader_generator.get_state())
         
         # Training
         model.train()
-        train_predictions = []
-        train_labels_epoch = []
+        # Confusion matrices stay on the device, so no per-batch host sync
+        train_confusion = StreamingConfusionMatrix(len(class_names), device)
+        first_batch = 0
+        if resume_batches:
+            train_confusion.matrix.copy_(rank_state['train_confusion'])
+            first_batch, resume_batches = resume_batches, 0
         
-        for batch_idx, (images, labels) in enumerate(train_loader):
+        num_batches = first_batch + len(train_loader)
+        optimizer.zero_grad()
+        for batch_idx, (images, labels) in enumerate(train_loader, start=first_batch):
             images, labels = images.to(device), labels.to(device)
+            if batch_augment is not None:
+                images = batch_augment(images)
+            images = images.contiguous(memory_format=memory_format)
             
-            optimizer.zero_grad()
-            outputs = model(images)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            optimizer.step()
+            # Average over the accumulation group; the last group of the epoch may be shorter
+            group_start = batch_idx - batch_idx % accumulation_steps
+            group_size = min(accumulation_steps, num_batches - group_start)
+            step_now = batch_idx - group_start == group_size - 1
+            # Under DDP only the group's last backward all-reduces the gradients
+            with train_model.no_sync() if distributed and not step_now else contextlib.nullcontext():
+                with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=use_bf16):
+                    outputs = train_model(images)
+                loss = criterion(outputs, labels)
+                (loss / group_size).backward()
             
             _, predicted = torch.max(outputs.data, 1)
-            train_predictions.extend(predicted.cpu().numpy())
-            train_labels_epoch.extend(labels.cpu().numpy())
+            train_confusion.update(predicted, labels)
+            
+            if step_now:
+                optimizer.step()
+                optimizer.zero_grad()
+                
+                # Mid-epoch checkpoints only fall between optimizer steps, so no
+                # partial gradients need saving; the epoch end is saved below
+                steps_done = (batch_idx + 1) // accumulation_steps
+                if (checkpoint_dir and checkpoint_every and steps_done % checkpoint_every == 0
+                        and batch_idx + 1 < num_batches):
+                    save_training_state(epoch, batch_idx + 1, epoch_generator_states, train_confusion)
             
             if batch_idx % 50 == 0:
                 print(f"  Batch {batch_idx}: loss = {loss.item():.4f}")
         
         # Training metrics
-        train_metrics = calculate_focused_metrics(train_labels_epoch, train_predictions, class_names)
+        if distributed:
+            train_confusion.all_reduce()
+        train_metrics = report_focused_metrics(train_confusion.compute(), class_names)
         
         # Validation
         model.eval()
-        val_predictions = []
-        val_labels_epoch = []
+        val_confusion = StreamingConfusionMatrix(len(class_names), device)
         
         with torch.no_grad():
             for images, labels in val_loader:
                 images, labels = images.to(device), labels.to(device)
-                outputs = model(images)
+                outputs = model(prepare_eval_batch(images).contiguous(memory_format=memory_format))
                 _, predicted = torch.max(outputs.data, 1)
-                
-                val_predictions.extend(predicted.cpu().numpy())
-                val_labels_epoch.extend(labels.cpu().numpy())
+                val_confusion.update(predicted, labels)
         
         # Validation metrics
+        if distributed:
+            val_confusion.all_reduce()
         print(f"\nVALIDATION RESULTS:")
-        val_metrics = calculate_focused_metrics(val_labels_epoch, val_predictions, class_names)
+        val_metrics = report_focused_metrics(val_confusion.compute(), class_names)
+        
+        epoch_times.append(time.perf_counter() - epoch_start)
+        print(f"Epoch time: {epoch_times[-1]:.1f}s")
         
         # Learning rate scheduling on weighted F1
         scheduler.step(val_metrics['weighted_f1'])
@@ -365,47 +699,66 @@ def train_imbalance_focused_model():
             best_weighted_f1 = current_f1
             patience_counter = 0
             
-            # Save best model
-            torch.save({
-                'epoch': epoch,
-                'model_state_dict': model.state_dict(),
-                'optimizer_state_dict': optimizer.state_dict(),
-                'best_weighted_f1': best_weighted_f1,
-                'class_weights': class_weights_tensor,
-                'val_metrics': val_metrics
-            }, 'best_imbalance_focused_model.pth')
-                            print(f"NEW BEST MODEL! Weighted F1: {best_weighted_f1:.4f}")
+            # Keep the best weights in memory for the final evaluation, and
+            # save them in the standard contiguous layout, whatever format training ran in
+            best_state = snapshot({k: v.contiguous() for k, v in model.state_dict().items()})
+            if rank == 0:
+                checkpointer.save({
+                    'epoch': epoch,
+                    'model_state_dict': best_state,
+                    'optimizer_state_dict': optimizer.state_dict(),
+                    'best_weighted_f1': best_weighted_f1,
+                    'class_weights': class_weights_tensor,
+                    'val_metrics': val_metrics
+                }, output_path)
+            print(f"NEW BEST MODEL! Weighted F1: {best_weighted_f1:.4f}")
         else:
             patience_counter += 1
             print(f"Patience: {patience_counter}/{patience}")
+        
+        stopped_early = patience_counter >= patience
+        if on_epoch_end is not None and on_epoch_end(epoch, val_metrics) and not stopped_early:
+            print("Stopped by on_epoch_end")
+            stopped_early = True
+        if checkpoint_dir:
+            # Resumes at the start of the next epoch
+            save_training_state(epoch + 1, 0, (balanced_sampler.generator.get_state(), loader_generator.get_state()))
             
-        if patience_counter >= patience:
-                            print(f"Early stopping - no F1 improvement for {patience} epochs")
+        if stopped_early:
+            if patience_counter >= patience:
+                print(f"Early stopping - no F1 improvement for {patience} epochs")
             break
     
+    checkpointer.close()
     print(f"\nTRAINING COMPLETED!")
     print(f"🏆 Best Weighted F1: {best_weighted_f1:.4f}")
+    if epoch_times:
+        print(f"Mean epoch time: {np.mean(epoch_times):.1f}s ({'decoded image cache' if cache_dir else 'JPEG decode per epoch'}, "
+              f"{precision}{' channels-last' if channels_last else ''})")
+    print(f"Checkpointing: {checkpointer.saves} saves, {checkpointer.save_seconds:.2f}s in the training loop, "
+          f"{checkpointer.write_seconds:.2f}s writing in the background")
     
     # Final evaluation with best model
     print(f"\nFINAL EVALUATION:")
-    checkpoint = torch.load('best_imbalance_focused_model.pth')
-    model.load_state_dict(checkpoint['model_state_dict'])
+    if best_state is None:
+        print("No epoch improved on a weighted F1 of 0; evaluating the last weights")
+    else:
+        model.load_state_dict(best_state)
     
     model.eval()
-    final_predictions = []
-    final_labels = []
+    final_confusion = StreamingConfusionMatrix(len(class_names), device)
     
     with torch.no_grad():
         for images, labels in val_loader:
             images, labels = images.to(device), labels.to(device)
-            outputs = model(images)
+            outputs = model(prepare_eval_batch(images).contiguous(memory_format=memory_format))
             _, predicted = torch.max(outputs.data, 1)
-            
-            final_predictions.extend(predicted.cpu().numpy())
-            final_labels.extend(labels.cpu().numpy())
+            final_confusion.update(predicted, labels)
     
+    if distributed:
+        final_confusion.all_reduce()
     print(f"=" * 50)
-    final_metrics = calculate_focused_metrics(final_labels, final_predictions, class_names)
+    final_metrics = report_focused_metrics(final_confusion.compute(), class_names)
     
     print(f"\nKEY IMPROVEMENTS IMPLEMENTED:")
     print(f"Balanced sampling - equal batches for all classes")
@@ -415,12 +768,85 @@ def train_imbalance_focused_model():
     print(f"Enhanced augmentation - more diverse training data")
     print(f"Label smoothing - prevent overconfidence")
     
-    print(f"\nBest model saved to: 'best_imbalance_focused_model.pth'")
+    print(f"\nBest model saved to: '{output_path}'")
     print(f"This model optimizes for F1, not accuracy!")
+    
+    if owns_process_group:
+        dist.destroy_process_group()
+    return {
+        'best_weighted_f1': best_weighted_f1,
+        'final_metrics': final_metrics,
+        'epoch_times': epoch_times
+    }
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Train the imbalance-focused skin tone CNN",
+        epilog="Data-parallel on one machine: torchrun --standalone --nproc-per-node 4 improved_train_model.py ... "
+               "On several machines run torchrun on each with --nnodes N --node-rank I "
+               "--rdzv-backend c10d --rdzv-endpoint HOST:PORT; every machine needs the data, and the "
+               "checkpoint directory must be shared to resume."
+    )
+    parser.add_argument('--data-dir', default='data_skintone')
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int)
+    parser.add_argument('--num-workers', type=int)
+    parser.add_argument('--cache', action='store_true',
+                        help="decode and resize the images once into a cache (at <data-dir>_cache unless --cache-dir)")
+    parser.add_argument('--cache-dir', help="decoded image cache location (implies --cache)")
+    parser.add_argument('--output', default='best_imbalance_focused_model.pth')
+    parser.add_argument('--augment', choices=['per-image', 'batch'], default='per-image',
+                        help="augment each image in the DataLoader workers, or whole batches with tensor ops "
+                             "(faster; same augmentations, but different random draws)")
+    parser.add_argument('--augment-seed', type=int)
+    parser.add_argument('--augment-strength', type=float, default=1.0, help="scales the augmentation magnitudes")
+    parser.add_argument('--lr', type=float, default=0.001)
+    parser.add_argument('--focal-gamma', type=float, default=2.0)
+    parser.add_argument('--label-smoothing', type=float, default=0.1)
+    parser.add_argument('--precision', choices=['fp32', 'bf16'], default='fp32',
+                        help="bf16 runs the training forward pass under CPU/GPU autocast")
+    parser.add_argument('--channels-last', action='store_true', help="train in NHWC memory format")
+    parser.add_argument('--accumulation-steps', type=int, default=1,
+                        help="batches per optimizer step (effective batch = batch size x steps)")
+    parser.add_argument('--checkpoint-dir', help="full-state checkpoints (default: <output>_checkpoints)")
+    parser.add_argument('--no-checkpoints', action='store_true', help="only save the best model")
+    parser.add_argument('--checkpoint-every', type=int, default=0,
+                        help="also checkpoint every N optimizer steps within an epoch")
+    parser.add_argument('--resume', nargs='?', const='latest',
+                        help="continue from a checkpoint file (default: the latest in the checkpoint dir)")
+    args = parser.parse_args()
+    
+    checkpoint_dir = args.checkpoint_dir or os.path.splitext(args.output)[0] + '_checkpoints'
+    if args.no_checkpoints:
+        if args.resume == 'latest':
+            parser.error("--resume without a file needs checkpoints enabled")
+        checkpoint_dir = None
+    
+    # Under torchrun only rank 0 reports progress
+    if int(os.environ.get('RANK', '0')) != 0:
+        sys.stdout = open(os.devnull, 'w')
+    
     try:
-        train_imbalance_focused_model()
+        train_imbalance_focused_model(
+            data_dir=args.data_dir,
+            num_epochs=args.epochs,
+            batch_size=args.batch_size,
+            num_workers=args.num_workers,
+            cache_dir=args.cache_dir or (args.data_dir.rstrip('/') + '_cache' if args.cache else None),
+            output_path=args.output,
+            augment=args.augment,
+            augment_seed=args.augment_seed,
+            precision=args.precision,
+            channels_last=args.channels_last,
+            accumulation_steps=args.accumulation_steps,
+            checkpoint_dir=checkpoint_dir,
+            checkpoint_every=args.checkpoint_every,
+            resume=args.resume,
+            learning_rate=args.lr,
+            focal_gamma=args.focal_gamma,
+            label_smoothing=args.label_smoothing,
+            augment_strength=args.augment_strength
+        )
     except KeyboardInterrupt:
         print("\nTraining interrupted")
     except Exception as e:
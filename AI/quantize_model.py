@@ -0,0 +1,146 @@
+import argparse
+import io
+import json
+import os
+import time
+
+import torch
+import torchvision.transforms as transforms
+from torch.utils.data import DataLoader, Subset
+from sklearn.model_selection import StratifiedShuffleSplit
+
+from skintone_match import (
+    CNNModel, quantize_dynamic_model, quantize_static_model, quantized_artifact_path, record_export_source
+)
+from improved_train_model import SkinToneDataset, calculate_focused_metrics
+
+# quantize_model.py
+# Builds int8 versions of a trained skin tone CNN and reports what they cost
+# in accuracy and gain in latency and size, so each deployment can choose.
+
+CLASS_NAMES = ['Dark', 'Light', 'Mid-Dark', 'Mid-Light']
+
+# The weights the API serves (its SKINTONE_WEIGHTS_PATH default); SKINTONE_QUANTIZATION=static
+# loads the int8 export from next to this file
+SERVING_WEIGHTS_PATH = os.getenv(
+    "SKINTONE_WEIGHTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trained_model.pth')
+)
+
+def load_trained_model(weights_path):
+    """Load either a plain state dict or a training checkpoint into a CNNModel"""
+    # Training checkpoints also hold NumPy validation metrics, which weights_only loading rejects;
+    # these are our own local files
+    state = torch.load(weights_path, map_location='cpu', weights_only=False)
+    if 'model_state_dict' in state:
+        state = state['model_state_dict']
+    model = CNNModel(num_skin_tones=state['fc2.weight'].shape[0])
+    model.load_state_dict(state)
+    return model.eval()
+
+def split_dataset(data_dir):
+    """Same stratified 80/20 split as train_imbalance_focused_model"""
+    eval_transform = transforms.Compose([
+        transforms.Resize((128, 128)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+    ])
+    dataset = SkinToneDataset(data_dir, transform=eval_transform)
+    splitter = StratifiedShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+    train_idx, val_idx = next(splitter.split(range(len(dataset)), dataset.labels))
+    return Subset(dataset, train_idx), Subset(dataset, val_idx)
+
+def evaluate(model, loader):
+    predictions, labels = [], []
+    with torch.no_grad():
+        for images, batch_labels in loader:
+            predictions.extend(model(images).argmax(1).tolist())
+            labels.extend(batch_labels.tolist())
+    return calculate_focused_metrics(labels, predictions, CLASS_NAMES)
+
+def latency_ms(model, batch_size, iterations=20):
+    images = torch.randn(batch_size, 3, 128, 128)
+    with torch.no_grad():
+        for _ in range(3):
+            model(images)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            model(images)
+    return (time.perf_counter() - start) / iterations * 1000
+
+def size_mb(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the skin tone CNN and report the trade-offs")
+    parser.add_argument('--weights', default=SERVING_WEIGHTS_PATH,
+                        help="trained weights or checkpoint (default: the weights the API serves)")
+    parser.add_argument('--data-dir', default='data_skintone')
+    parser.add_argument('--calibration-batches', type=int, default=10, help="training batches used to calibrate static quantization")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--backend', default='x86', help="quantized engine: x86, fbgemm or qnnpack")
+    parser.add_argument('--export', help="where to save the static int8 TorchScript model "
+                                         "(default: next to --weights, where the API looks for it)")
+    parser.add_argument('--report', help="also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    fp32_model = load_trained_model(args.weights)
+    train_subset, val_subset = split_dataset(args.data_dir)
+    calibration_loader = DataLoader(train_subset, batch_size=args.batch_size, shuffle=True)
+    val_loader = DataLoader(val_subset, batch_size=args.batch_size, shuffle=False)
+
+    print(f"\nCalibrating static quantization on {args.calibration_batches} training batches...")
+    calibration_batches = []
+    for images, _ in calibration_loader:
+        calibration_batches.append(images)
+        if len(calibration_batches) >= args.calibration_batches:
+            break
+
+    models = {
+        'fp32': fp32_model,
+        'int8-dynamic': quantize_dynamic_model(load_trained_model(args.weights)),
+        'int8-static': quantize_static_model(fp32_model, calibration_batches, backend=args.backend),
+    }
+
+    report = {}
+    for name, model in models.items():
+        print(f"\n{name.upper()} VALIDATION:")
+        metrics = evaluate(model, val_loader)
+        report[name] = {
+            'weighted_f1': float(metrics['weighted_f1']),
+            'macro_f1': float(metrics['macro_f1']),
+            'latency_ms_batch1': latency_ms(model, 1),
+            f'latency_ms_batch{args.batch_size}': latency_ms(model, args.batch_size),
+            'size_mb': size_mb(model),
+        }
+
+    baseline = report['fp32']
+    print("\nQUANTIZATION REPORT")
+    print("=" * 86)
+    print(f"{'mode':<14}{'weighted F1':>12}{'Δ':>8}{'macro F1':>10}{'Δ':>8}"
+          f"{'b1 ms':>8}{f'b{args.batch_size} ms':>9}{'size MB':>9}{'size Δ':>8}")
+    for name, r in report.items():
+        print(f"{name:<14}{r['weighted_f1']:>12.4f}{r['weighted_f1'] - baseline['weighted_f1']:>+8.4f}"
+              f"{r['macro_f1']:>10.4f}{r['macro_f1'] - baseline['macro_f1']:>+8.4f}"
+              f"{r['latency_ms_batch1']:>8.2f}{r[f'latency_ms_batch{args.batch_size}']:>9.2f}"
+              f"{r['size_mb']:>9.2f}{r['size_mb'] / baseline['size_mb']:>7.0%}")
+
+    # Static int8 needs calibration, so serving loads this export rather than quantizing at startup.
+    # The API refuses an export whose recorded source isn't the .pth it serves
+    export_path = args.export or quantized_artifact_path(args.weights)
+    example = torch.randn(1, 3, 128, 128)
+    torch.jit.save(torch.jit.trace(models['int8-static'], example), export_path)
+    record_export_source(export_path, args.weights)
+    print(f"\nStatic int8 model saved to: '{export_path}' (serve with SKINTONE_QUANTIZATION=static "
+          f"and SKINTONE_WEIGHTS_PATH={args.weights})")
+    if os.path.abspath(export_path) != os.path.abspath(quantized_artifact_path(args.weights)):
+        print(f"The API looks for it at {quantized_artifact_path(args.weights)}; move it there "
+              f"together with {os.path.basename(export_path)}.source.json")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,71 @@
-import pandas as pd
 import numpy as np
 import json
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, confusion_matrix, classification_report
-from sklearn.preprocessing import OneHotEncoder
-import statsmodels.api as sm
+import hashlib
+import io
+import itertools
+import os
+import time
+
+# pandas, scikit-learn and statsmodels are only needed to load data and fit.
+# They are imported inside those methods so that serving a loaded artifact
+# (load_artifact + predict) doesn't pay for importing them.
+
+NUMERIC_FEATURES = ['waist', 'bust', 'height', 'length']
+CATEGORICAL_FEATURES = ['category', 'fit']
+
+# Bump when the layout of exported size model artifacts changes
+ARTIFACT_FORMAT_VERSION = 1
+
+# Training backends for SizePredictionModel.fit; all produce the same coefficient layout
+SOLVERS = ('statsmodels', 'lbfgs', 'sklearn')
+
+DEFAULT_DATA_PATH = os.getenv("MODCLOTH_DATA_PATH", "/Users/ayaanizhar/Stats Ass/modcloth_final_data.json")
+
+def manifest_path_for(artifact_path):
+    """The JSON manifest that sits next to an .npz artifact"""
+    return os.path.splitext(artifact_path)[0] + '.json'
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _to_float(value):
+    """Same coercion as pd.to_numeric(errors='coerce') for a single value"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def softmax(logits):
+    """Row-wise softmax, shifted by the row max for numerical stability"""
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def softmax_information(design, probs):
+    """
+    Hessian of the summed negative log-likelihood of a reference-class
+    softmax model with respect to its non-reference coefficients.
+    
+    Args:
+        design (np.ndarray): (n, p) design matrix
+        probs (np.ndarray): (n, n_classes) predicted probabilities, reference class first
+    
+    Returns:
+        np.ndarray: (p * (n_classes - 1), p * (n_classes - 1)), in the
+            order of coef[:, 1:].ravel()
+    """
+    p, m = design.shape[1], probs.shape[1] - 1
+    information = np.empty((p, m, p, m))
+    for j in range(m):
+        for k in range(j, m):
+            weights = probs[:, j + 1] * (float(j == k) - probs[:, k + 1])
+            block = design.T @ (design * weights[:, None])
+            information[:, j, :, k] = block
+            information[:, k, :, j] = block
+    return information.reshape(p * m, p * m)
 
 class SizePredictionModel:
     """
@@ -12,14 +73,135 @@ class SizePredictionModel:
     Predicts clothing sizes (S, M, L) based on various features like measurements and reviews
     """
     
-    def __init__(self, json_path="/Users/ayaanizhar/Stats Ass/modcloth_final_data.json"):
+    def __init__(self, json_path=DEFAULT_DATA_PATH):
         """Initialize the model with data path"""
         self.json_path = json_path
-        self.model = None
+        self.model = None            # statsmodels fit result (solver='statsmodels' only)
         self.feature_columns = None
+        self.model_version = None
+        self.solver_ = None
+        self.reference_levels_ = {}   # category/fit value dropped by the one-hot encoding
+        self.parent_version_ = None   # loaded/exported model_version this was incrementally updated from
+        self.unexported_updates_ = 0  # partial_fit() calls since then
+        
+        # Compiled form of the fitted model, used for prediction
+        self.coef_ = None            # (1 + n_features, n_classes); row 0 is the intercept
+        self.classes_ = None         # size label for each coefficient column
+        self.column_index_ = None    # feature name -> design matrix column
+        self.dummy_index_ = None     # (field, value) -> design matrix column
+        # Observed information (negative log-likelihood Hessian) of the non-reference
+        # coefficients, flattened from coef_[:, 1:]; the prior for partial_fit()
+        self.information_ = None
+    
+    def load_and_preprocess_data(self, streaming=True, chunksize=50000):
+        """
+        Load and preprocess the JSON data
+        
+        Args:
+            streaming (bool): Parse the file in chunks, keeping only the needed
+                fields in compact dtypes. False uses the original pandas loader.
+            chunksize (int): Lines parsed per chunk when streaming
+        """
+        if streaming:
+            return self._load_and_preprocess_streaming(chunksize)
+        return self._load_and_preprocess_eager()
+    
+    def _load_and_preprocess_streaming(self, chunksize):
+        """
+        Same output as _load_and_preprocess_eager(), but memory-bounded.
+        Review text is reduced to its length as each line is parsed, and
+        each chunk is packed into float32/int32/int8 arrays straight away.
+        """
+        import pandas as pd
+        
+        chunks = []
+        vocab = {field: {} for field in CATEGORICAL_FEATURES}  # value -> code, shared by all chunks
+        row_offset = 0
+        
+        with open(self.json_path) as f:
+            lines = []
+            for line in f:
+                if line.strip():
+                    lines.append(line)
+                if len(lines) == chunksize:
+                    chunks.append(self._parse_chunk(lines, row_offset, vocab))
+                    row_offset += len(lines)
+                    lines = []
+            if lines:
+                chunks.append(self._parse_chunk(lines, row_offset, vocab))
+        
+        if not chunks:
+            raise ValueError(f"No records in size data file {self.json_path}")
+        columns = {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]}
+        index = columns.pop('index')
+        
+        df = pd.DataFrame({
+            'waist': columns['waist'],
+            'quality': columns['quality'],
+            'bust': columns['bust'],
+            'height': columns['height'],
+            'length': columns['length'],
+            'size_cat': pd.Categorical.from_codes(columns['size_cat'], categories=['S', 'M', 'L'], ordered=True),
+            'review_text_len': columns['review_text_len'],
+            'review_summary_len': columns['review_summary_len'],
+        }, index=index)
+        
+        # One-hot encode like get_dummies(drop_first=True): sorted values, first one dropped
+        self.reference_levels_ = {}
+        for field in CATEGORICAL_FEATURES:
+            values = sorted(vocab[field], key=str)
+            if values:
+                self.reference_levels_[field] = str(values[0])
+            codes = columns[field]
+            code_of = np.array([vocab[field][v] for v in values], dtype=np.int32)
+            for value, code in zip(values[1:], code_of[1:]):
+                df[f"{field}_{value}"] = (codes == code).astype(np.int8)
+        
+        return df
     
-    def load_and_preprocess_data(self):
-        """Load and preprocess the JSON data"""
+    @staticmethod
+    def _parse_chunk(lines, row_offset, vocab):
+        """Parse JSON lines into compact column arrays, dropping rows without a usable size"""
+        records = (json.loads(line) for line in lines)
+        return SizePredictionModel._parse_records(records, len(lines), row_offset, vocab)
+    
+    @staticmethod
+    def _parse_records(records, n, row_offset, vocab):
+        """_parse_chunk() for n already-decoded review records"""
+        numeric = {name: np.full(n, np.nan, dtype=np.float32) for name in NUMERIC_FEATURES + ['quality']}
+        text_len = {name: np.zeros(n, dtype=np.int32) for name in ['review_text_len', 'review_summary_len']}
+        codes = {field: np.full(n, -1, dtype=np.int32) for field in CATEGORICAL_FEATURES}
+        size_cat = np.full(n, -1, dtype=np.int8)
+        
+        for i, record in enumerate(records):
+            for name in numeric:
+                numeric[name][i] = _to_float(record.get(name))
+            # Match astype(str).apply(len): a missing field reads as NaN ("nan"), null as None ("None")
+            for name, field in (('review_text_len', 'review_text'), ('review_summary_len', 'review_summary')):
+                text_len[name][i] = len(str(record[field])) if field in record else 3
+            # Same bins as pd.cut(size, [-inf, 4, 8, inf], labels=['S', 'M', 'L'])
+            size = _to_float(record.get('size'))
+            if np.isnan(size):
+                continue
+            size_cat[i] = 0 if size <= 4 else (1 if size <= 8 else 2)
+            # Only kept rows add to the vocabulary, as get_dummies runs after the size filter
+            for field in CATEGORICAL_FEATURES:
+                value = record.get(field)
+                if value is not None:
+                    codes[field][i] = vocab[field].setdefault(value, len(vocab[field]))
+        
+        keep = size_cat >= 0
+        chunk = {name: values[keep] for name, values in numeric.items()}
+        chunk.update({name: values[keep] for name, values in text_len.items()})
+        chunk.update({field: values[keep] for field, values in codes.items()})
+        chunk['size_cat'] = size_cat[keep]
+        chunk['index'] = np.arange(row_offset, row_offset + n)[keep]
+        return chunk
+    
+    def _load_and_preprocess_eager(self):
+        """Original loader: reads every column of the file into pandas first"""
+        import pandas as pd
+        
         # STEP 1: Load JSON lines file
         df = pd.read_json(self.json_path, lines=True)
         
@@ -50,12 +232,24 @@ class SizePredictionModel:
         
         # STEP 6: One-hot encode categorical features
         categorical_cols = ['category', 'fit']
-        df = pd.get_dummies(df, columns=categorical_cols, drop_first=True)
+        self.reference_levels_ = {
+            field: str(sorted(df[field].dropna().unique(), key=str)[0])
+            for field in categorical_cols if df[field].notna().any()
+        }
+        df = pd.get_dummies(df, columns=categorical_cols, drop_first=True, dtype=float)
         
         return df
     
-    def train(self, test_size=0.2, random_state=123):
-        """Train the model on the preprocessed data"""
+    def train(self, test_size=0.2, random_state=123, solver='statsmodels'):
+        """
+        Train the model on the preprocessed data
+        
+        Args:
+            solver (str): Fitting backend, one of SOLVERS (see fit())
+        """
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import accuracy_score, confusion_matrix, classification_report
+        
         # Load and preprocess data
         df = self.load_and_preprocess_data()
         
@@ -63,22 +257,19 @@ class SizePredictionModel:
         X = df.drop(columns=['size_cat'])
         y = df['size_cat']
         
-        self.feature_columns = X.columns
+        self.feature_columns = list(X.columns)
         
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=test_size, random_state=random_state, stratify=y
         )
         
-        # STEP 8: Multinomial logistic regression (using statsmodels)
-        # Add intercept
-        X_train_sm = sm.add_constant(X_train)
-        model = sm.MNLogit(y_train, X_train_sm)
-        self.model = model.fit()
+        # STEP 8: Multinomial logistic regression
+        self.fit(X_train, y_train, solver=solver)
         
         # STEP 9: Predict and evaluate
-        X_test_sm = sm.add_constant(X_test)
-        pred_probs = self.model.predict(X_test_sm)
-        preds = pred_probs.idxmax(axis=1)
+        X_test_np = np.column_stack([np.ones(len(X_test)), X_test.to_numpy(dtype=float)])
+        pred_probs = self.predict_proba_array(X_test_np)
+        preds = self.classes_[pred_probs.argmax(axis=1)]
         
         # STEP 10: Evaluation
         print("Model Training Results:")
@@ -93,6 +284,503 @@ class SizePredictionModel:
             'classification_report': classification_report(y_test, preds)
         }
     
+    def fit(self, X, y, solver='statsmodels', warm_start=False, max_iter=1000, tol=1e-8):
+        """
+        Fit the multinomial logit on a feature frame and size labels, then compile it.
+        
+        Every solver maximizes the same unpenalized likelihood and yields the
+        same coefficient layout (intercept row first, first class as the
+        all-zero reference), so the results are interchangeable:
+        - 'statsmodels': MNLogit Newton fit; slowest, but keeps the full
+          results object (standard errors, summary) in self.model
+        - 'lbfgs': NumPy softmax regression minimized with SciPy's L-BFGS
+          on standardized columns; no Hessian, memory linear in the data
+        - 'sklearn': unpenalized multinomial LogisticRegression (lbfgs)
+        
+        Args:
+            X (pd.DataFrame): Feature columns, as load_and_preprocess_data minus size_cat
+            y (pd.Series): Size labels
+            warm_start (bool): Start from the current coefficients when the
+                feature columns match (e.g. refitting on more data)
+            max_iter (int): Iteration limit for 'lbfgs' and 'sklearn'
+            tol (float): Gradient tolerance for 'lbfgs' and 'sklearn'; 'lbfgs'
+                also stops once the loss improves by less than tol * 1e-2
+                (relative), which keeps probabilities within ~1e-4 of MNLogit
+        """
+        import pandas as pd
+        
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver '{solver}'. Expected one of {SOLVERS}.")
+        feature_columns = list(X.columns)
+        initial = self.coef_ if warm_start and self.coef_ is not None and feature_columns == self.feature_columns else None
+        
+        if solver == 'statsmodels':
+            import statsmodels.api as sm
+            
+            # Add intercept
+            X_sm = sm.add_constant(X)
+            # MNLogit takes its (n_features, n_classes - 1) parameters flattened column-major
+            start_params = initial[:, 1:].ravel(order='F') if initial is not None else None
+            self.model = sm.MNLogit(y, X_sm).fit(start_params=start_params)
+            self.feature_columns = feature_columns
+            self.compile_model()
+        else:
+            # Classes in label order (S, M, L for the ordered size categories), as MNLogit orders them
+            codes, classes = pd.factorize(y, sort=True)
+            design = np.empty((len(X), len(feature_columns) + 1))
+            design[:, 0] = 1.0
+            design[:, 1:] = X.to_numpy(dtype=float)
+            if initial is not None and initial.shape[1] != len(classes):
+                initial = None
+            
+            if solver == 'lbfgs':
+                coef = self._fit_softmax_lbfgs(design, codes, len(classes), initial, max_iter, tol)
+            else:
+                coef = self._fit_sklearn(design, codes, initial, max_iter, tol)
+            del design
+            
+            self.model = None
+            self.coef_ = coef
+            self.classes_ = np.array(list(classes), dtype=object)
+            self.feature_columns = feature_columns
+            self._build_column_maps()
+        
+        self.solver_ = solver
+        self.parent_version_ = None
+        self.unexported_updates_ = 0
+        self.information_ = self._information_for_frame(X)
+    
+    def _information_for_frame(self, X, chunksize=65536):
+        """Observed information of the fitted coefficients over a feature frame, in row chunks"""
+        information = 0.0
+        for start in range(0, len(X), chunksize):
+            design = np.column_stack([np.ones(min(chunksize, len(X) - start)),
+                                      X.iloc[start:start + chunksize].to_numpy(dtype=float)])
+            information = information + softmax_information(design, self.predict_proba_array(design))
+        return information
+    
+    @staticmethod
+    def _standardize(design):
+        """
+        Scale the non-intercept columns of the design matrix in place to zero
+        mean and unit variance (constant columns are only centred). The
+        features span very different ranges (review lengths vs. 0/1 dummies),
+        which otherwise leaves first-order solvers badly conditioned.
+        
+        Returns:
+            np.ndarray, np.ndarray: Column means and scales, to map coefficients back
+        """
+        mean = design[:, 1:].mean(axis=0)
+        scale = design[:, 1:].std(axis=0)
+        scale[scale == 0] = 1.0
+        design[:, 1:] -= mean
+        design[:, 1:] /= scale
+        return mean, scale
+    
+    @staticmethod
+    def _to_standardized(coef, mean, scale):
+        """Coefficients on the original columns -> on the standardized ones"""
+        standardized = coef.copy()
+        standardized[1:] = coef[1:] * scale[:, None]
+        standardized[0] = coef[0] + mean @ coef[1:]
+        return standardized
+    
+    @staticmethod
+    def _from_standardized(standardized, mean, scale):
+        """Coefficients on the standardized columns -> on the original ones"""
+        coef = standardized.copy()
+        coef[1:] = standardized[1:] / scale[:, None]
+        coef[0] = standardized[0] - (mean / scale) @ standardized[1:]
+        return coef
+    
+    def _fit_softmax_lbfgs(self, design, codes, n_classes, initial, max_iter, tol):
+        """Reference-class softmax regression by L-BFGS; returns the (1 + n_features, n_classes) coefficients"""
+        from scipy.optimize import minimize
+        
+        mean, scale = self._standardize(design)
+        n, p = design.shape
+        # Only the non-reference classes have parameters (the reference logit is 0),
+        # so every per-row array is (n, n_classes - 1) and contiguous
+        targets = np.zeros((n, n_classes - 1))
+        targets[codes > 0, codes[codes > 0] - 1] = 1.0
+        
+        def objective(weights):
+            """Mean negative log-likelihood and its gradient"""
+            logits = design @ weights.reshape(p, n_classes - 1)
+            shift = np.maximum(logits.max(axis=1), 0.0)
+            probs = np.exp(logits - shift[:, None])
+            total = np.exp(-shift) + probs.sum(axis=1)
+            nll = np.sum(np.log(total) + shift) - np.einsum('ij,ij->', logits, targets)
+            probs /= total[:, None]
+            probs -= targets
+            return nll / n, (design.T @ probs).ravel() / n
+        
+        start = np.zeros((p, n_classes - 1))
+        if initial is not None:
+            start = self._to_standardized(initial, mean, scale)[:, 1:]
+        result = minimize(objective, start.ravel(), jac=True, method='L-BFGS-B',
+                          options={'maxiter': max_iter, 'gtol': tol, 'ftol': tol * 1e-2})
+        if not result.success:
+            print(f"Warning: L-BFGS stopped before converging: {result.message}")
+        
+        standardized = np.zeros((p, n_classes))
+        standardized[:, 1:] = result.x.reshape(p, n_classes - 1)
+        return self._from_standardized(standardized, mean, scale)
+    
+    def _fit_sklearn(self, design, codes, initial, max_iter, tol):
+        """Unpenalized multinomial LogisticRegression, re-expressed against the first class"""
+        from sklearn.linear_model import LogisticRegression
+        
+        mean, scale = self._standardize(design)
+        # C=inf: no penalty, the same likelihood as MNLogit
+        estimator = LogisticRegression(C=np.inf, solver='lbfgs', max_iter=max_iter, tol=tol, warm_start=initial is not None)
+        if initial is not None:
+            start = self._to_standardized(initial, mean, scale)
+            estimator.coef_ = np.ascontiguousarray(start[1:].T)
+            estimator.intercept_ = start[0].copy()
+        estimator.fit(design[:, 1:], codes)
+        
+        # sklearn scores every class; subtracting class 0 gives the same probabilities
+        standardized = np.vstack([estimator.intercept_, estimator.coef_.T])
+        standardized -= standardized[:, :1]
+        return self._from_standardized(standardized, mean, scale)
+    
+    def partial_fit(self, records, forgetting=1.0, new_column_prior=1.0, max_iter=50, tol=1e-8):
+        """
+        Fold a mini-batch of new labelled reviews into the fitted coefficients.
+        
+        All data seen so far is summarized by the coefficients and their
+        observed information (a Gaussian approximation of its likelihood), so
+        an update is a few Newton steps on the batch likelihood plus that
+        quadratic prior, and updating batch by batch stays close to refitting
+        on everything. Category/fit values the model hasn't seen get new
+        dummy columns, starting from 0, i.e. from how they were scored before.
+        Models without recorded reference levels (artifacts exported before
+        they were recorded) treat every unseen value as new.
+        
+        Args:
+            records (list): Review records in the training file's format
+                (measurements, quality, category, fit, review_text,
+                review_summary and the numeric size). Rows without a usable
+                size or with a missing measurement are skipped.
+            forgetting (float): Scale in (0, 1] applied to the accumulated
+                information first; below 1 weights the new batch more
+            new_column_prior (float): Prior precision of new columns'
+                coefficients, so a rarely seen value stays close to 0
+            max_iter (int): Newton iteration limit
+            tol (float): Stop once half the Newton decrement is below this
+        
+        Returns:
+            dict: Rows used and skipped, new columns, Newton iterations and
+                the resulting model_version
+        """
+        if self.coef_ is None:
+            raise ValueError("Model not trained. Call train() first.")
+        if self.information_ is None:
+            raise ValueError("Model has no information matrix to update; retrain and re-export it first.")
+        if not 0 < forgetting <= 1:
+            raise ValueError("forgetting must be in (0, 1].")
+        
+        records = list(records)
+        vocab = {field: {} for field in CATEGORICAL_FEATURES}
+        chunk = self._parse_records(records, len(records), 0, vocab)
+        
+        # Unseen category/fit values get columns after the existing ones
+        dummy_index = dict(self.dummy_index_)
+        new_columns = []
+        for field in CATEGORICAL_FEATURES:
+            for value in sorted(map(str, vocab[field])):
+                if (field, value) not in dummy_index and value != self.reference_levels_.get(field):
+                    dummy_index[(field, value)] = len(self.feature_columns) + len(new_columns) + 1
+                    new_columns.append(f"{field}_{value}")
+        
+        class_of = {str(c): i for i, c in enumerate(self.classes_)}
+        missing = [label for label in ('S', 'M', 'L') if label not in class_of]
+        if missing:
+            raise ValueError(f"Model has no class for sizes {missing}")
+        codes = np.array([class_of['S'], class_of['M'], class_of['L']])[chunk['size_cat']]
+        
+        design = np.zeros((len(codes), len(self.feature_columns) + len(new_columns) + 1))
+        design[:, 0] = 1.0
+        for name, col in self.column_index_.items():
+            design[:, col] = chunk[name]
+        for field in CATEGORICAL_FEATURES:
+            for value, code in vocab[field].items():
+                col = dummy_index.get((field, str(value)))  # None for the reference level
+                if col is not None:
+                    design[chunk[field] == code, col] = 1.0
+        keep = np.isfinite(design).all(axis=1)
+        design, codes = design[keep], codes[keep]
+        
+        summary = {'rows': len(codes), 'skipped': len(records) - len(codes), 'new_columns': new_columns, 'iterations': 0}
+        if len(codes) == 0:
+            summary['model_version'] = self.model_version
+            return summary
+        
+        # Parameters are coef[:, 1:].ravel(), so new rows' parameters come last
+        m = len(self.classes_) - 1
+        n_old, n_params = self.information_.shape[0], design.shape[1] * m
+        prior = np.zeros((n_params, n_params))
+        prior[:n_old, :n_old] = forgetting * self.information_
+        prior[np.arange(n_old, n_params), np.arange(n_old, n_params)] = new_column_prior
+        coef = np.zeros((design.shape[1], m + 1))
+        coef[:len(self.coef_)] = self.coef_
+        
+        coef, summary['iterations'] = self._proximal_newton(design, codes, coef, prior, max_iter, tol)
+        
+        self.model = None  # a statsmodels fit no longer describes the coefficients
+        self.coef_ = coef
+        self.feature_columns = self.feature_columns + new_columns
+        self.information_ = prior + softmax_information(design, self.predict_proba_array(design))
+        self._build_column_maps()
+        # Identifies the in-memory model until export_artifact() gives it the artifact's checksum
+        if self.unexported_updates_ == 0:
+            self.parent_version_ = self.model_version
+        self.unexported_updates_ += 1
+        self.model_version = hashlib.sha256(coef.tobytes()).hexdigest()[:12]
+        summary['model_version'] = self.model_version
+        return summary
+    
+    def partial_fit_file(self, path, batch_size=1000, **kwargs):
+        """
+        partial_fit() over a JSON-lines file of new reviews, batch_size records at a time
+        
+        Returns:
+            dict: Totals of the per-batch summaries
+        """
+        totals = {'batches': 0, 'rows': 0, 'skipped': 0, 'new_columns': []}
+        with open(path) as f:
+            while True:
+                records = [json.loads(line) for line in itertools.islice(f, batch_size) if line.strip()]
+                if not records:
+                    break
+                summary = self.partial_fit(records, **kwargs)
+                totals['batches'] += 1
+                totals['rows'] += summary['rows']
+                totals['skipped'] += summary['skipped']
+                totals['new_columns'] += summary['new_columns']
+        return totals
+    
+    @staticmethod
+    def _proximal_newton(design, codes, coef, prior, max_iter, tol):
+        """
+        Minimize the batch negative log-likelihood plus 1/2 d' prior d, where d
+        is the change in the non-reference coefficients, by damped Newton steps.
+        
+        Returns:
+            np.ndarray, int: Coefficients and the iterations taken
+        """
+        p, m = design.shape[1], coef.shape[1] - 1
+        start = coef[:, 1:].ravel()
+        targets = np.zeros((len(codes), m + 1))
+        targets[np.arange(len(codes)), codes] = 1.0
+        
+        def objective(weights):
+            full = np.zeros((p, m + 1))
+            full[:, 1:] = weights.reshape(p, m)
+            logits = design @ full
+            shift = logits.max(axis=1)
+            nll = np.sum(np.log(np.exp(logits - shift[:, None]).sum(axis=1)) + shift) - np.sum(logits * targets)
+            delta = weights - start
+            return nll + 0.5 * delta @ prior @ delta, full
+        
+        weights = start.copy()
+        value, full = objective(weights)
+        for iteration in range(1, max_iter + 1):
+            probs = softmax(design @ full)
+            gradient = (design.T @ (probs - targets)[:, 1:]).ravel() + prior @ (weights - start)
+            step = np.linalg.solve(softmax_information(design, probs) + prior, gradient)
+            decrement = gradient @ step
+            if decrement / 2 < tol:
+                return full, iteration - 1
+            # Backtracking line search (Armijo)
+            t = 1.0
+            while True:
+                candidate = weights - t * step
+                candidate_value, candidate_full = objective(candidate)
+                if candidate_value <= value - 0.25 * t * decrement or t < 1e-8:
+                    break
+                t *= 0.5
+            weights, value, full = candidate, candidate_value, candidate_full
+        print(f"Warning: incremental update stopped after {max_iter} Newton steps without converging")
+        return full, max_iter
+    
+    def compile_model(self):
+        """
+        Compile the fitted statsmodels result into a plain coefficient matrix.
+        MNLogit fixes the first class as the reference, so its column is all zeros.
+        """
+        params = np.asarray(self.model.params, dtype=float)
+        self.coef_ = np.column_stack([np.zeros(params.shape[0]), params])
+        ynames = self.model.model._ynames_map
+        self.classes_ = np.array([ynames[i] for i in range(len(ynames))], dtype=object)
+        self._build_column_maps()
+    
+    def export_artifact(self, path):
+        """
+        Write the compiled model to a compact .npz artifact plus a JSON manifest.
+        The manifest records the artifact's SHA-256, which load_artifact() checks.
+        
+        Returns:
+            dict: The manifest that was written
+        """
+        if self.coef_ is None:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        arrays = {
+            'coef': self.coef_,
+            'feature_columns': np.array(self.feature_columns, dtype=str),
+            'classes': np.array(self.classes_, dtype=str),
+        }
+        if self.information_ is not None:
+            arrays['information'] = self.information_
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        payload = buffer.getvalue()
+        checksum = hashlib.sha256(payload).hexdigest()
+        
+        manifest = {
+            'format_version': ARTIFACT_FORMAT_VERSION,
+            'model_version': checksum[:12],
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'sha256': checksum,
+            'classes': [str(c) for c in self.classes_],
+            'n_features': len(self.feature_columns),
+            'solver': self.solver_,
+            'parent_version': self.parent_version_,
+            'preprocessing': {
+                'numeric_features': NUMERIC_FEATURES,
+                'categorical_features': CATEGORICAL_FEATURES,
+                'intercept': True,
+                'dummy_columns': {
+                    field: sorted(value for (f, value) in self.dummy_index_ if f == field)
+                    for field in CATEGORICAL_FEATURES
+                },
+                'reference_levels': self.reference_levels_,
+            },
+        }
+        
+        # Artifact first, manifest last: a reader never sees a manifest without its data
+        _write_atomic(path, payload)
+        _write_atomic(manifest_path_for(path), json.dumps(manifest, indent=2).encode())
+        self.model_version = manifest['model_version']
+        self.unexported_updates_ = 0
+        return manifest
+    
+    @classmethod
+    def load_artifact(cls, path):
+        """
+        Load a model exported by export_artifact(), without pandas or statsmodels.
+        Raises ValueError if the artifact fails its checksum or schema checks.
+        """
+        with open(manifest_path_for(path)) as f:
+            manifest = json.load(f)
+        with open(path, 'rb') as f:
+            payload = f.read()
+        
+        if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported size model artifact format: {manifest.get('format_version')}")
+        if hashlib.sha256(payload).hexdigest() != manifest['sha256']:
+            raise ValueError(f"Checksum mismatch for size model artifact {path}")
+        
+        preprocessing = manifest['preprocessing']
+        if (preprocessing['numeric_features'] != NUMERIC_FEATURES
+                or preprocessing['categorical_features'] != CATEGORICAL_FEATURES):
+            raise ValueError("Size model artifact was built with a different preprocessing schema")
+        
+        with np.load(io.BytesIO(payload), allow_pickle=False) as arrays:
+            coef = arrays['coef']
+            feature_columns = arrays['feature_columns'].tolist()
+            classes = arrays['classes'].tolist()
+            # Only needed for partial_fit(); older artifacts don't have it
+            information = arrays['information'] if 'information' in arrays.files else None
+        
+        if coef.shape != (len(feature_columns) + 1, len(classes)):
+            raise ValueError(f"Size model artifact has inconsistent coefficient shape {coef.shape}")
+        n_params = coef.shape[0] * (coef.shape[1] - 1)
+        if information is not None and information.shape != (n_params, n_params):
+            raise ValueError(f"Size model artifact has inconsistent information shape {information.shape}")
+        
+        model = cls(json_path=None)
+        model.coef_ = coef
+        model.feature_columns = feature_columns
+        model.classes_ = np.array(classes, dtype=object)
+        model.model_version = manifest['model_version']
+        model.solver_ = manifest.get('solver')
+        model.parent_version_ = manifest.get('parent_version')
+        model.reference_levels_ = preprocessing.get('reference_levels', {})
+        model.information_ = information
+        model._build_column_maps()
+        return model
+    
+    def _build_column_maps(self):
+        """Precompute where each numeric feature and each category/fit value lands"""
+        self.column_index_ = {}
+        self.dummy_index_ = {}
+        for i, col in enumerate(self.feature_columns, start=1):
+            for field in CATEGORICAL_FEATURES:
+                if col.startswith(field + '_'):
+                    self.dummy_index_[(field, col[len(field) + 1:])] = i
+                    break
+            else:
+                self.column_index_[col] = i
+    
+    def encode_features(self, records):
+        """
+        Build the design matrix for one or more feature dicts.
+        Matches the training encoding: intercept column first, unknown
+        category/fit values and absent features left at 0.
+        """
+        if isinstance(records, dict):
+            records = [records]
+        X = np.zeros((len(records), len(self.feature_columns) + 1))
+        X[:, 0] = 1.0
+        for row, features in enumerate(records):
+            for name, col in self.column_index_.items():
+                if name in features:
+                    value = features[name]
+                    X[row, col] = _to_float(value) if name in NUMERIC_FEATURES else value
+            for field in CATEGORICAL_FEATURES:
+                col = self.dummy_index_.get((field, features.get(field)))
+                if col is not None:
+                    X[row, col] = 1.0
+        return X
+    
+    def predict_proba_array(self, X):
+        """Class probabilities for an encoded design matrix, shape (n, n_classes)"""
+        return softmax(X @ self.coef_)
+    
+    def predict_many(self, records):
+        """
+        Predict size categories for a list of feature dicts in one vectorized pass
+        
+        Returns:
+            list: (predicted size, {size: probability}) for each record
+        """
+        return self.predict_many_timed(records)[0]
+    
+    def predict_many_timed(self, records):
+        """
+        Same as predict_many, also timing the two stages
+        
+        Returns:
+            list: (predicted size, {size: probability}) for each record
+            dict: Seconds spent in "encode" (feature encoding) and "eval" (model evaluation)
+        """
+        if self.coef_ is None:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        start = time.perf_counter()
+        X = self.encode_features(records)
+        encoded = time.perf_counter()
+        probs = self.predict_proba_array(X)
+        labels = self.classes_[probs.argmax(axis=1)]
+        predictions = [
+            (labels[i], dict(zip(self.classes_, probs[i].tolist())))
+            for i in range(len(probs))
+        ]
+        return predictions, {"encode": encoded - start, "eval": time.perf_counter() - encoded}
+    
     def predict(self, features):
         """
         Predict size category for new data
@@ -105,8 +793,18 @@ class SizePredictionModel:
             str: Predicted size category (S, M, or L)
             dict: Prediction probabilities for each size
         """
-        if not self.model or not self.feature_columns:
-            raise ValueError("Model not trained. Call train() first.")
+        return self.predict_many([features])[0]
+    
+    def predict_statsmodels(self, features):
+        """
+        Reference prediction through pandas and statsmodels.
+        Slow; kept to check the compiled path against the fitted model.
+        """
+        if self.model is None:
+            raise ValueError("No statsmodels fit. Call train(solver='statsmodels') first.")
+        
+        import pandas as pd
+        import statsmodels.api as sm
         
         # Create DataFrame with the same structure as training data
         df = pd.DataFrame([features])
@@ -115,7 +813,7 @@ class SizePredictionModel:
         df[['waist', 'bust', 'height', 'length']] = df[['waist', 'bust', 'height', 'length']].apply(pd.to_numeric, errors='coerce')
         
         # One-hot encode categorical features
-        df = pd.get_dummies(df, columns=['category', 'fit'])
+        df = pd.get_dummies(df, columns=['category', 'fit'], dtype=float)
         
         # Ensure all training features are present
         for col in self.feature_columns:
@@ -125,11 +823,11 @@ class SizePredictionModel:
         # Reorder columns to match training data
         df = df[self.feature_columns]
         
-        # Add constant for prediction
-        X_pred = sm.add_constant(df)
+        # Add constant for prediction (forced: every column of a single row looks constant)
+        X_pred = sm.add_constant(df, has_constant='add')
         
-        # Get prediction probabilities
-        pred_probs = self.model.predict(X_pred)
+        # Get prediction probabilities, labelled with the size names
+        pred_probs = self.model.predict(X_pred).rename(columns=self.model.model._ynames_map)
         
         # Get predicted size
         predicted_size = pred_probs.idxmax(axis=1)[0]
@@ -138,9 +836,39 @@ class SizePredictionModel:
 
 # Example usage
 if __name__ == "__main__":
-    # Initialize and train model
-    model = SizePredictionModel()
-    results = model.train()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Train the size prediction model")
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH, help="ModCloth JSON-lines file")
+    parser.add_argument('--export', metavar='PATH', help="write the trained model artifact (.npz) here")
+    parser.add_argument('--solver', choices=SOLVERS, default='statsmodels',
+                        help="fitting backend; lbfgs and sklearn skip the Hessian and use less memory on large data")
+    parser.add_argument('--update', metavar='ARTIFACT',
+                        help="instead of training, fold the --data reviews into this exported model and "
+                             "write it back (or to --export)")
+    parser.add_argument('--batch-size', type=int, default=1000, help="records per incremental update")
+    parser.add_argument('--forgetting', type=float, default=1.0,
+                        help="below 1, down-weights the data the model was fit on so far")
+    args = parser.parse_args()
+    
+    if args.update:
+        model = SizePredictionModel.load_artifact(args.update)
+        parent = model.model_version
+        start = time.perf_counter()
+        totals = model.partial_fit_file(args.data, batch_size=args.batch_size, forgetting=args.forgetting)
+        print(f"Folded {totals['rows']} reviews into size model {parent} in {totals['batches']} batches "
+              f"({time.perf_counter() - start:.2f}s); skipped {totals['skipped']}")
+        if totals['new_columns']:
+            print(f"New columns: {', '.join(totals['new_columns'])}")
+        args.export = args.export or args.update
+    else:
+        # Initialize and train model
+        model = SizePredictionModel(args.data)
+        results = model.train(solver=args.solver)
+    
+    if args.export:
+        manifest = model.export_artifact(args.export)
+        print(f"\nExported size model {manifest['model_version']} to {args.export}")
     
     # Example prediction
     sample_features = {
@@ -0,0 +1,80 @@
+import numpy as np
+import torch
+import torch.distributed as dist
+
+# streaming_metrics.py
+# Confusion matrix accumulated on the training device batch by batch, with
+# the imbalance-focused metrics derived from it in closed form.
+
+class StreamingConfusionMatrix:
+    """
+    Running confusion matrix (rows = true class, columns = predicted class).
+    update() stays on the device and never synchronizes with the host; the
+    matrix is copied back once, when compute() is called.
+    """
+
+    def __init__(self, num_classes, device='cpu'):
+        self.num_classes = num_classes
+        self.matrix = torch.zeros(num_classes * num_classes, dtype=torch.int64, device=device)
+
+    def reset(self):
+        self.matrix.zero_()
+
+    def update(self, predictions, targets):
+        """Add a batch of predicted and true class indices (same device as the matrix)"""
+        index = targets.reshape(-1).to(torch.int64) * self.num_classes + predictions.reshape(-1).to(torch.int64)
+        self.matrix += torch.bincount(index, minlength=self.num_classes * self.num_classes)
+
+    def all_reduce(self):
+        """
+        Sum the matrix over every rank of the default process group, so each
+        rank computes the metrics of the whole (sharded) dataset
+        """
+        dist.all_reduce(self.matrix, op=dist.ReduceOp.SUM)
+
+    def confusion_matrix(self):
+        return self.matrix.view(self.num_classes, self.num_classes).cpu().numpy()
+
+    def compute(self):
+        """
+        Same values as calculate_focused_metrics (sklearn f1/precision/recall)
+        on the underlying predictions, including its conventions: only
+        classes seen in the labels or predictions are reported, and a zero
+        denominator scores 0.
+
+        Returns:
+            dict: weighted_f1, macro_f1, per_class_f1, per_class_precision, per_class_recall
+        """
+        return metrics_from_confusion(self.confusion_matrix())
+
+def metrics_from_confusion(matrix):
+    matrix = np.asarray(matrix, dtype=np.int64)
+    true_sum = matrix.sum(axis=1)
+    pred_sum = matrix.sum(axis=0)
+
+    # sklearn scores the labels that occur in y_true or y_pred, in sorted order
+    present = (true_sum + pred_sum) > 0
+    tp = np.diag(matrix)[present].astype(np.float64)
+    true_sum = true_sum[present]
+    pred_sum = pred_sum[present]
+
+    def divide(numerator, denominator):
+        denominator = denominator.astype(np.float64)
+        return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+
+    precision = divide(tp, pred_sum)
+    recall = divide(tp, true_sum)
+    f1 = divide(2.0 * tp, true_sum + pred_sum)
+
+    if f1.size == 0:
+        return {
+            'weighted_f1': float('nan'), 'macro_f1': float('nan'),
+            'per_class_f1': f1, 'per_class_precision': precision, 'per_class_recall': recall
+        }
+    return {
+        'weighted_f1': float(np.average(f1, weights=true_sum)) if true_sum.sum() else 0.0,
+        'macro_f1': float(np.mean(f1)),
+        'per_class_f1': f1,
+        'per_class_precision': precision,
+        'per_class_recall': recall
+    }
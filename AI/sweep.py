@@ -0,0 +1,238 @@
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# sweep.py
+# Hyperparameter sweep for the imbalance-focused CNN: trials run
+# concurrently in a process pool, all training from one decoded image
+# cache, and trials trailing the others on validation weighted F1 are pruned.
+
+# Parameter -> list of values (grid / random choice) or {"uniform": [low, high]}
+# or {"log_uniform": [low, high]}. Keys are train_imbalance_focused_model arguments.
+DEFAULT_SPACE = {
+    'learning_rate': {'log_uniform': [3e-4, 3e-3]},
+    'focal_gamma': [1.0, 2.0, 3.0],
+    'label_smoothing': [0.0, 0.1, 0.2],
+    'augment_strength': {'uniform': [0.5, 1.5]},
+}
+
+RESULT_COLUMNS = ['rank', 'trial', 'status', 'best_weighted_f1', 'final_weighted_f1', 'epochs', 'seconds']
+
+def sample_trials(space, n_trials=None, seed=0):
+    """
+    Expand a search space into trial parameter dicts: the full grid when
+    every parameter is a list and n_trials is None, otherwise n_trials
+    random draws.
+    """
+    names = sorted(space)
+    if n_trials is None:
+        if not all(isinstance(space[name], list) for name in names):
+            raise ValueError("Continuous ranges need a number of trials")
+        return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+    rng = np.random.default_rng(seed)
+    trials = []
+    for _ in range(n_trials):
+        params = {}
+        for name in names:
+            spec = space[name]
+            if isinstance(spec, list):
+                params[name] = spec[rng.integers(len(spec))]
+            elif 'uniform' in spec:
+                params[name] = float(rng.uniform(*spec['uniform']))
+            elif 'log_uniform' in spec:
+                low, high = np.log(spec['log_uniform'])
+                params[name] = float(np.exp(rng.uniform(low, high)))
+            else:
+                raise ValueError(f"Unknown search space entry for {name}: {spec}")
+        trials.append(params)
+    return trials
+
+class MedianPruner:
+    """
+    Epoch-end callback that stops a trial whose best validation weighted F1
+    so far is below the median of the other trials' best at the same epoch.
+    The history is shared between the trial processes. A trial that has
+    reached its last epoch is never pruned: stopping it saves nothing.
+    """
+
+    def __init__(self, history, trial_id, warmup_epochs=2, min_trials=3, total_epochs=None):
+        """
+        Args:
+            history (dict): trial id -> per-epoch weighted F1 (a Manager dict)
+            warmup_epochs (int): Epochs every trial runs before it can be pruned
+            min_trials (int): Other trials that must have reached the epoch
+            total_epochs (int): Epochs a trial runs unless pruned
+        """
+        self.history = history
+        self.trial_id = trial_id
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+        self.total_epochs = total_epochs
+        self.pruned = False
+
+    def __call__(self, epoch, val_metrics):
+        # Manager dicts don't see in-place changes, so store a new list
+        scores = list(self.history.get(self.trial_id, [])) + [val_metrics['weighted_f1']]
+        self.history[self.trial_id] = scores
+        if epoch + 1 < self.warmup_epochs:
+            return False
+        if self.total_epochs is not None and epoch + 1 >= self.total_epochs:
+            return False
+        others = [max(h[:epoch + 1]) for trial_id, h in self.history.items()
+                  if trial_id != self.trial_id and len(h) > epoch]
+        if len(others) < self.min_trials:
+            return False
+        self.pruned = max(scores) < float(np.median(others))
+        return self.pruned
+
+def _init_worker(threads):
+    # Set before the trial's first parallel op so each trial stays within its share of the cores
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+def run_trial(trial_id, params, config, history):
+    """Train one trial (in a pool process) and return its result row"""
+    import torch
+    from improved_train_model import train_imbalance_focused_model
+
+    pruner = MedianPruner(history, trial_id, config['warmup_epochs'], config['min_trials'], config['epochs'])
+    start = time.perf_counter()
+    # Same initial weights and sample order for every trial, so they differ only by params
+    torch.manual_seed(config['seed'])
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = train_imbalance_focused_model(
+                data_dir=config['data_dir'], num_epochs=config['epochs'], batch_size=config['batch_size'],
+                num_workers=0, cache_dir=config['cache_dir'],
+                output_path=os.path.join(config['output_dir'], f"trial-{trial_id:03d}.pth"),
+                augment='batch', augment_seed=config['seed'], on_epoch_end=pruner, **params
+            )
+    except Exception:
+        return {'trial': trial_id, 'status': 'failed', 'error': traceback.format_exc(limit=3), **params}
+
+    return {
+        'trial': trial_id,
+        'status': 'pruned' if pruner.pruned else 'complete',
+        'best_weighted_f1': summary['best_weighted_f1'],
+        'final_weighted_f1': summary['final_metrics']['weighted_f1'],
+        'epochs': len(summary['epoch_times']),
+        'seconds': time.perf_counter() - start,
+        **params
+    }
+
+def prepare_shared_cache(data_dir, cache_dir):
+    """Build (or validate) the decoded image cache once, before any trial starts"""
+    from dataset_cache import CachedSkinToneDataset
+    from improved_train_model import SkinToneDataset
+
+    source = SkinToneDataset(data_dir)
+    if len(source) == 0:
+        raise ValueError(f"No images found in {data_dir}")
+    CachedSkinToneDataset(source, cache_dir)
+
+def write_results(rows, param_names, path):
+    """Rank by best validation weighted F1 (failed trials last) and write a CSV"""
+    ranked = sorted(rows, key=lambda row: (row['status'] == 'failed', -row.get('best_weighted_f1', 0.0)))
+    for rank, row in enumerate(ranked, start=1):
+        row['rank'] = rank
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS + param_names + ['error'], extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(ranked)
+    return ranked
+
+def run_sweep(data_dir, space, output_dir, n_trials=None, parallel=2, threads_per_trial=None, epochs=10,
+              batch_size=32, cache_dir=None, warmup_epochs=2, min_trials=3, seed=0):
+    """
+    Args:
+        space (dict): Search space (see DEFAULT_SPACE)
+        output_dir (str): Trial models and results.csv
+        n_trials (int): Random trials; None runs the full grid of a list-only space
+        parallel (int): Trials running at once
+        threads_per_trial (int): torch threads per trial (default: CPUs / parallel)
+
+    Returns:
+        list: Result rows ranked by best validation weighted F1
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache_dir = cache_dir or data_dir.rstrip('/') + '_cache'
+    threads_per_trial = threads_per_trial or max(1, (os.cpu_count() or 1) // parallel)
+    trials = sample_trials(space, n_trials, seed)
+    config = {
+        'data_dir': data_dir, 'cache_dir': cache_dir, 'output_dir': output_dir, 'epochs': epochs,
+        'batch_size': batch_size, 'warmup_epochs': warmup_epochs, 'min_trials': min_trials, 'seed': seed,
+    }
+
+    prepare_shared_cache(data_dir, cache_dir)
+    print(f"Sweep: {len(trials)} trials, {parallel} at a time with {threads_per_trial} threads each")
+
+    rows = []
+    start = time.perf_counter()
+    with multiprocessing.Manager() as manager:
+        history = manager.dict()
+        # spawn, so trial processes don't inherit the parent's torch thread pools
+        with ProcessPoolExecutor(max_workers=parallel, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(threads_per_trial,)) as pool:
+            futures = [pool.submit(run_trial, trial_id, params, config, history) for trial_id, params in enumerate(trials)]
+            for future in as_completed(futures):
+                row = future.result()
+                rows.append(row)
+                score = f"F1 {row['best_weighted_f1']:.4f} after {row['epochs']} epochs" if row['status'] != 'failed' else row['error']
+                print(f"  trial {row['trial']:>3} {row['status']:<8} {score}")
+
+    ranked = write_results(rows, sorted(space), os.path.join(output_dir, 'results.csv'))
+    print(f"\nSweep finished in {time.perf_counter() - start:.0f}s")
+    return ranked
+
+def print_table(ranked, param_names, limit=20):
+    header = f"{'rank':>4} {'trial':>5} {'status':<9}{'best F1':>8}{'epochs':>7}" + ''.join(f"{name:>18}" for name in param_names)
+    print(header)
+    print("-" * len(header))
+    for row in ranked[:limit]:
+        f1 = f"{row['best_weighted_f1']:.4f}" if 'best_weighted_f1' in row else '-'
+        values = ''.join(f"{row[name]:>18.4g}" if isinstance(row[name], float) else f"{row[name]:>18}" for name in param_names)
+        print(f"{row['rank']:>4} {row['trial']:>5} {row['status']:<9}{f1:>8}{row.get('epochs', '-'):>7}{values}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for the imbalance-focused skin tone CNN")
+    parser.add_argument('--data-dir', default='data_skintone')
+    parser.add_argument('--cache-dir', help="decoded image cache shared by all trials (default: <data-dir>_cache)")
+    parser.add_argument('--space', help="JSON search space file (default: learning rate, focal gamma, "
+                                        "label smoothing and augmentation strength)")
+    parser.add_argument('--trials', type=int, help="random trials (default: full grid, if the space is all lists)")
+    parser.add_argument('--parallel', type=int, default=2, help="trials running at once")
+    parser.add_argument('--threads-per-trial', type=int)
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--warmup-epochs', type=int, default=2, help="epochs before a trial can be pruned")
+    parser.add_argument('--min-trials', type=int, default=3, help="trials compared against before pruning")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default='sweep')
+    args = parser.parse_args()
+
+    space = DEFAULT_SPACE
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    trials = args.trials
+    if trials is None and not all(isinstance(spec, list) for spec in space.values()):
+        trials = 16
+
+    ranked = run_sweep(args.data_dir, space, args.output_dir, n_trials=trials, parallel=args.parallel,
+                       threads_per_trial=args.threads_per_trial, epochs=args.epochs, batch_size=args.batch_size,
+                       cache_dir=args.cache_dir, warmup_epochs=args.warmup_epochs, min_trials=args.min_trials,
+                       seed=args.seed)
+    print_table(ranked, sorted(space))
+    print(f"\nResults written to {os.path.join(args.output_dir, 'results.csv')}")
@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sweep import MedianPruner
+
+# test_sweep.py
+
+def history_of_others(scores_per_epoch, trials=3):
+    return {trial_id: list(scores_per_epoch) for trial_id in range(trials)}
+
+def test_trailing_trial_is_pruned_before_its_last_epoch():
+    history = history_of_others([0.8, 0.8, 0.8])
+    pruner = MedianPruner(history, trial_id=99, warmup_epochs=2, min_trials=3, total_epochs=3)
+
+    assert not pruner(0, {'weighted_f1': 0.1})  # still warming up
+    assert pruner(1, {'weighted_f1': 0.1})
+    assert pruner.pruned
+
+def test_last_epoch_is_never_pruned():
+    history = history_of_others([0.8, 0.8])
+    history[99] = [0.1]
+    pruner = MedianPruner(history, trial_id=99, warmup_epochs=1, min_trials=3, total_epochs=2)
+
+    assert not pruner(1, {'weighted_f1': 0.1})
+    assert not pruner.pruned
+    # The final score is still shared with the other trials
+    assert history[99] == [0.1, 0.1]
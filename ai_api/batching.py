@@ -0,0 +1,176 @@
+import asyncio
+import inspect
+import time
+from collections import Counter
+
+# batching.py
+
+# Upper bounds (in milliseconds) of the queue-wait histogram buckets
+QUEUE_WAIT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+class MicroBatcher:
+    """
+    Collects concurrent inference requests into a single batched call.
+    A batch is flushed as soon as max_batch_size items are waiting or the
+    oldest item in it has waited max_wait_ms, whichever happens first.
+    """
+
+    def __init__(self, process_batch, max_batch_size=16, max_wait_ms=5.0):
+        """
+        Args:
+            process_batch (callable): Takes a list of items and returns a list
+                of results in the same order. May be a coroutine function,
+                e.g. one that hands the batch to an executor
+            max_batch_size (int): Largest number of items run in one call
+            max_wait_ms (float): Longest time the first item of a batch waits
+                for more items to arrive
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = None
+        self._worker = None
+        self._batch_tasks = set()
+
+        # Metrics
+        self.batch_size_counts = Counter()
+        self.total_batches = 0
+        self.total_items = 0
+        self.failed_batches = 0
+        self.queue_wait_sum = 0.0
+        self.queue_wait_max = 0.0
+        self.queue_wait_buckets = [0] * (len(QUEUE_WAIT_BUCKETS_MS) + 1)
+
+    async def start(self):
+        """Start the background task that forms and runs batches"""
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and fail any requests still queued"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        for task in list(self._batch_tasks):
+            task.cancel()
+        await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped before request was processed."))
+
+    async def submit(self, item):
+        """Queue one item and wait for its own result"""
+        if self._worker is None:
+            raise RuntimeError("Batcher is not running. Call start() first.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    def queue_depth(self):
+        """Number of items waiting to be picked up by the next batch"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def batches_in_flight(self):
+        """Number of batches handed to process_batch that haven't finished"""
+        return len(self._batch_tasks)
+
+    async def _collect_batch(self):
+        """Wait for the first item, then gather more until full or timed out"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _record_batch(self, batch):
+        """Update batch-size and queue-wait metrics for a batch about to run"""
+        now = time.perf_counter()
+        self.batch_size_counts[len(batch)] += 1
+        self.total_batches += 1
+        self.total_items += len(batch)
+
+        for _, _, enqueued_at in batch:
+            waited = now - enqueued_at
+            self.queue_wait_sum += waited
+            self.queue_wait_max = max(self.queue_wait_max, waited)
+            waited_ms = waited * 1000.0
+            for i, bound in enumerate(QUEUE_WAIT_BUCKETS_MS):
+                if waited_ms <= bound:
+                    self.queue_wait_buckets[i] += 1
+                    break
+            else:
+                self.queue_wait_buckets[-1] += 1
+
+    async def _process(self, batch):
+        try:
+            results = self.process_batch([item for item, _, _ in batch])
+            if inspect.isawaitable(results):
+                results = await results
+        except Exception as e:
+            self.failed_batches += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            # Drop requests whose callers have already gone away
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+
+            self._record_batch(batch)
+            # Run the batch in its own task so the next one can form meanwhile;
+            # how many run at once is left to whatever process_batch hands off to
+            task = asyncio.create_task(self._process(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    def stats(self):
+        """Batch-size distribution and queue-wait summary"""
+        wait_buckets = {f"<={bound}ms": count for bound, count in zip(QUEUE_WAIT_BUCKETS_MS, self.queue_wait_buckets)}
+        wait_buckets[f">{QUEUE_WAIT_BUCKETS_MS[-1]}ms"] = self.queue_wait_buckets[-1]
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "total_batches": self.total_batches,
+            "total_items": self.total_items,
+            "failed_batches": self.failed_batches,
+            "mean_batch_size": self.total_items / self.total_batches if self.total_batches else 0.0,
+            "batch_size_distribution": {str(size): count for size, count in sorted(self.batch_size_counts.items())},
+            "queue_depth": self.queue_depth(),
+            "batches_in_flight": self.batches_in_flight(),
+            "queue_wait_ms": {
+                "mean": (self.queue_wait_sum / self.total_items * 1000.0) if self.total_items else 0.0,
+                "max": self.queue_wait_max * 1000.0,
+                "buckets": wait_buckets,
+            },
+        }
@@ -0,0 +1,82 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+import requests
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from bench_workers import free_port
+from synthetic import synthetic_selfie_jpeg
+
+# bench_cold_start.py
+# Where the API's cold start goes: per-package import cost of `import main`
+# and wall time from launching uvicorn to the first answered request.
+
+HEAVY_PACKAGES = ('torch', 'fastapi', 'PIL', 'numpy', 'pandas', 'sklearn', 'statsmodels', 'onnxruntime')
+
+def import_times():
+    """Cumulative import time (ms) of each top-level package pulled in by `import main`"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=API_DIR, capture_output=True, text=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|\s+([\w.]+)$', line)
+        # A package's own line carries the cumulative time of its submodules
+        if match and '.' not in match.group(2):
+            times[match.group(2)] = int(match.group(1)) / 1000
+    return times
+
+def time_to_first_request(port, env):
+    image = synthetic_selfie_jpeg(1280, 960, seed=0)
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port)],
+        cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        url = f'http://127.0.0.1:{port}/predict_skin_tone/'
+        while time.perf_counter() - start < 120:
+            try:
+                if requests.post(url, files={'file': ('selfie.jpg', image, 'image/jpeg')}, timeout=10).ok:
+                    first_request_s = time.perf_counter() - start
+                    startup = requests.get(f'http://127.0.0.1:{port}/health', timeout=5).json().get('startup', {})
+                    return first_request_s, startup
+            except requests.RequestException:
+                pass
+            time.sleep(0.05)
+        raise RuntimeError("Server did not answer a request within 120s")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark API cold start')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--no-warmup', action='store_true', help='start with STARTUP_WARMUP=0')
+    args = parser.parse_args()
+
+    times = import_times()
+    print("\nImport time of `import main` (cumulative ms)")
+    print("-" * 40)
+    for package in HEAVY_PACKAGES:
+        value = f"{times[package]:.0f}" if package in times else "not imported"
+        print(f"{package:<16}{value:>16}")
+
+    env = dict(os.environ, STARTUP_WARMUP='0' if args.no_warmup else '1', SKINTONE_CACHE_MAX_MB='0')
+    print(f"\nTime to first /predict_skin_tone/ response over {args.runs} runs")
+    print("-" * 40)
+    for run in range(args.runs):
+        first_request_s, startup = time_to_first_request(free_port(), env)
+        print(f"run {run + 1}: {first_request_s * 1000:.0f}ms")
+        for stage, ms in startup.items():
+            print(f"    {stage:<28}{ms:>8.1f}")
+
+if __name__ == "__main__":
+    main()
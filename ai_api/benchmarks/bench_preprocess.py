@@ -0,0 +1,77 @@
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from torchvision import transforms
+
+from skintone_match import ImagePreprocessor, IMAGENET_MEAN, IMAGENET_STD
+from synthetic import PHONE_RESOLUTIONS, synthetic_selfie_jpeg
+
+# bench_preprocess.py
+# Per-stage latency of image decode + preprocessing: the original per-call
+# transforms.Compose pipeline vs. the reusable ImagePreprocessor.
+
+def original_stages(image_bytes, input_size=(128, 128)):
+    """The pre-ImagePreprocessor code path, timed stage by stage"""
+    t0 = time.perf_counter()
+    img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    t1 = time.perf_counter()
+    preprocess = transforms.Compose([
+        transforms.Resize(input_size),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD),
+    ])
+    tensor = preprocess(img).unsqueeze(0)
+    t2 = time.perf_counter()
+    return {'decode': t1 - t0, 'preprocess': t2 - t1}, img.size, tensor
+
+def pipeline_stages(preprocessor, image_bytes):
+    t0 = time.perf_counter()
+    img = preprocessor.decode(image_bytes)
+    t1 = time.perf_counter()
+    tensor = preprocessor.to_tensor(preprocessor.resize(img)).unsqueeze(0)
+    t2 = time.perf_counter()
+    return {'decode': t1 - t0, 'preprocess': t2 - t1}, img.size, tensor
+
+def run(stage_fn, repeat):
+    totals = {'decode': 0.0, 'preprocess': 0.0}
+    for _ in range(repeat):
+        timings, decoded_size, tensor = stage_fn()
+        for stage, seconds in timings.items():
+            totals[stage] += seconds
+    return {stage: seconds / repeat for stage, seconds in totals.items()}, decoded_size, tensor
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark image preprocessing stages')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    fast = ImagePreprocessor(fast_decode=True)
+    full = ImagePreprocessor(fast_decode=False)
+
+    print(f"\n{'image':<8}{'pipeline':<22}{'decode ms':>11}{'prep ms':>10}{'total ms':>10}{'decoded MB':>12}{'max |diff|':>12}")
+    print("-" * 85)
+    for name, (width, height) in PHONE_RESOLUTIONS.items():
+        image_bytes = synthetic_selfie_jpeg(width, height)
+        reference = None
+        for label, fn in (
+            ('original', lambda: original_stages(image_bytes)),
+            ('reused, full decode', lambda: pipeline_stages(full, image_bytes)),
+            ('reused, draft decode', lambda: pipeline_stages(fast, image_bytes)),
+        ):
+            stages, (w, h), tensor = run(fn, args.repeat)
+            if reference is None:
+                reference = tensor
+            diff = (tensor - reference).abs().max().item()
+            decoded_mb = w * h * 3 / 1e6
+            total = stages['decode'] + stages['preprocess']
+            print(f"{name:<8}{label:<22}{stages['decode'] * 1e3:>11.2f}{stages['preprocess'] * 1e3:>10.2f}"
+                  f"{total * 1e3:>10.2f}{decoded_mb:>12.2f}{diff:>12.4f}")
+
+if __name__ == "__main__":
+    main()
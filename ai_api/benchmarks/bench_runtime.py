@@ -0,0 +1,67 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_runtime import (
+    artifact_paths, check_parity, export_onnx, export_torchscript,
+    load_eager_model, load_runtime, measure_latency, onnxruntime_available
+)
+
+# bench_runtime.py
+# CPU latency/throughput of the skin tone CNN under each serving runtime,
+# with a parity check against eager mode.
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark skin tone model runtimes')
+    parser.add_argument('--weights', help='trained .pth state dict (random weights if omitted)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--compile', action='store_true', help='also benchmark torch.compile (slow to warm up)')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        weights_path = os.path.join(tmp, 'trained_model.pth')
+        if args.weights:
+            shutil.copy(args.weights, weights_path)
+        else:
+            torch.save(load_eager_model(None).state_dict(), weights_path)
+
+        eager = load_eager_model(weights_path)
+        paths = artifact_paths(weights_path)
+        export_torchscript(eager, paths['torchscript'])
+        runtimes = ['eager', 'torchscript']
+        if onnxruntime_available():
+            export_onnx(eager, paths['onnx'])
+            runtimes.append('onnx')
+        else:
+            print("onnxruntime not installed; skipping ONNX")
+        if args.compile:
+            runtimes.append('compile')
+
+        eager_latency = {bs: measure_latency(eager, bs, iterations=args.iterations) for bs in args.batch_sizes}
+
+        print(f"\nSkin tone CNN on CPU ({torch.get_num_threads()} threads)")
+        print(f"{'runtime':<13}{'batch':>6}{'latency ms':>12}{'images/s':>11}{'speedup':>9}{'max |diff|':>12}")
+        print("-" * 63)
+        for runtime in runtimes:
+            model, _ = load_runtime(runtime, eager, weights_path, torch.device('cpu'))
+            parity = check_parity(eager, model, batch_sizes=args.batch_sizes)
+            for batch_size in args.batch_sizes:
+                if runtime == 'eager':
+                    seconds = eager_latency[batch_size]
+                else:
+                    seconds = measure_latency(model, batch_size, iterations=args.iterations)
+                print(f"{runtime:<13}{batch_size:>6}{seconds * 1e3:>12.2f}{batch_size / seconds:>11.0f}"
+                      f"{eager_latency[batch_size] / seconds:>8.2f}x{parity[batch_size]['max_abs_diff']:>12.2e}")
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import modcloth_record
+
+# bench_size_loader.py
+# Peak RSS and wall time of the streaming vs. the original pandas ModCloth loader.
+# Each loader runs in a fresh interpreter so their peaks don't mask each other.
+
+CHILD = """
+import json, resource, sys, time
+sys.path.insert(0, {api_dir!r})
+from size_prediction import SizePredictionModel
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+df = SizePredictionModel({path!r}).load_and_preprocess_data(streaming={streaming})
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    'seconds': elapsed,
+    'peak_rss_mb': peak / 1024,
+    'loader_rss_mb': (peak - baseline) / 1024,
+    'rows': len(df),
+    'frame_mb': df.memory_usage(deep=True).sum() / 1e6,
+}}))
+"""
+
+def write_long_reviews(path, n_rows, text_len, seed=0):
+    """Synthetic reviews with long text fields, like a full review dump"""
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        for _ in range(n_rows):
+            record = modcloth_record(rng)
+            record['review_text'] = 'lorem ipsum ' * rng.randint(text_len // 24, text_len // 12)
+            f.write(json.dumps(record) + '\n')
+
+def run_loader(path, streaming):
+    api_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = CHILD.format(api_dir=api_dir, path=path, streaming=streaming)
+    out = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ModCloth loaders')
+    parser.add_argument('--rows', type=int, default=300000)
+    parser.add_argument('--text-len', type=int, default=1500, help='average review_text length')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'modcloth.json')
+        write_long_reviews(path, args.rows, args.text_len)
+        file_mb = os.path.getsize(path) / 1e6
+
+        eager = run_loader(path, streaming=False)
+        streaming = run_loader(path, streaming=True)
+
+    print(f"\nModCloth loader, {args.rows} rows, {file_mb:.0f}MB file")
+    print("-" * 62)
+    print(f"{'loader':<12}{'time (s)':>10}{'peak RSS (MB)':>16}{'loader RSS (MB)':>17}{'frame (MB)':>12}")
+    for name, r in (('pandas', eager), ('streaming', streaming)):
+        print(f"{name:<12}{r['seconds']:>10.2f}{r['peak_rss_mb']:>16.0f}{r['loader_rss_mb']:>17.0f}{r['frame_mb']:>12.1f}")
+    print(f"\nLoader RSS reduction: {eager['loader_rss_mb'] / max(streaming['loader_rss_mb'], 1):.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import LRUCache, quantized_key
+from size_prediction import NUMERIC_FEATURES, SizePredictionModel
+from synthetic import CATEGORIES, FITS, write_modcloth_jsonl
+
+# bench_size_memo.py
+# Hit ratio, per-request latency, memory and rounding error of the size
+# prediction memo on a request stream where returning users resend the same
+# measurements, typed to the half inch.
+
+def clustered_requests(n, users=2000, zipf=1.1, seed=0):
+    """
+    Size requests from a pool of users whose measurements are entered to the
+    nearest half inch (height to the inch). Users are picked with Zipf-like
+    popularity and each request is for a random category and fit.
+    """
+    rng = random.Random(seed)
+    profiles = [{
+        'waist': round(rng.gauss(30, 4) * 2) / 2,
+        'bust': round(rng.gauss(36, 4) * 2) / 2,
+        'height': float(round(rng.gauss(65, 3))),
+        'length': round(rng.gauss(35, 3) * 2) / 2,
+        'quality': rng.choice([3, 4, 4, 5, 5]),
+    } for _ in range(users)]
+    weights = [1 / (rank + 1) ** zipf for rank in range(users)]
+    picks = rng.choices(profiles, weights=weights, k=n)
+    return [dict(profile, category=rng.choice(CATEGORIES), fit=rng.choice(FITS)) for profile in picks]
+
+def run_memo(model, requests, resolution, max_bytes):
+    """The API's memo path, one request at a time; returns the predictions, seconds and cache"""
+    cache = LRUCache(max_bytes=max_bytes, ttl_seconds=86400)
+    predictions = []
+    start = time.perf_counter()
+    for features in requests:
+        snapped, key = quantized_key(features, NUMERIC_FEATURES, resolution, namespace=model.model_version)
+        prediction = cache.get(key)
+        if prediction is None:
+            prediction = model.predict_many_timed([snapped])[0][0]
+            cache.set(key, prediction)
+        predictions.append(prediction)
+    return predictions, time.perf_counter() - start, cache
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the size prediction memo')
+    parser.add_argument('--rows', type=int, default=20000, help='synthetic training rows')
+    parser.add_argument('--requests', type=int, default=50000)
+    parser.add_argument('--users', type=int, default=2000, help='distinct measurement profiles')
+    parser.add_argument('--resolutions', type=float, nargs='+', default=[0, 0.5, 1.0, 2.0])
+    parser.add_argument('--max-mb', type=float, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = write_modcloth_jsonl(os.path.join(tmp, 'modcloth.json'), args.rows)
+        model = SizePredictionModel(data_path)
+        model.train(solver='lbfgs')
+        model.export_artifact(os.path.join(tmp, 'size_model.npz'))
+
+    requests = clustered_requests(args.requests, users=args.users, seed=1)
+
+    start = time.perf_counter()
+    exact = [model.predict_many_timed([features])[0][0] for features in requests]
+    uncached_s = time.perf_counter() - start
+    exact_probs = np.array([list(probs.values()) for _, probs in exact])
+
+    print(f"\n{args.requests} requests from {args.users} users, memo budget {args.max_mb}MB")
+    print(f"{'resolution':>10}{'hit ratio':>11}{'entries':>9}{'MB':>7}{'us/request':>12}{'speedup':>9}"
+          f"{'max |dp|':>10}{'same size':>11}")
+    print("-" * 79)
+    print(f"{'no memo':>10}{'-':>11}{'-':>9}{'-':>7}{uncached_s / len(requests) * 1e6:>12.1f}{'1.0x':>9}{'-':>10}{'-':>11}")
+    for resolution in args.resolutions:
+        predictions, seconds, cache = run_memo(model, requests, resolution, int(args.max_mb * 1024 * 1024))
+        stats = cache.stats()
+        probs = np.array([list(p.values()) for _, p in predictions])
+        same = np.mean([size == exact_size for (size, _), (exact_size, _) in zip(predictions, exact)])
+        print(f"{resolution:>10g}{stats['hit_rate']:>11.1%}{stats['entries']:>9}{stats['bytes'] / 1e6:>7.2f}"
+              f"{seconds / len(requests) * 1e6:>12.1f}{uncached_s / seconds:>8.1f}x"
+              f"{np.abs(probs - exact_probs).max():>10.4f}{same:>11.2%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from size_prediction import SizePredictionModel
+from synthetic import write_modcloth_jsonl, size_requests
+
+# bench_size_predict.py
+# Compares the compiled NumPy prediction path with the pandas/statsmodels path.
+
+def time_per_call(fn, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - start) / (repeat * len(items))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark size prediction paths')
+    parser.add_argument('--rows', type=int, default=20000, help='synthetic training rows')
+    parser.add_argument('--requests', type=int, default=200, help='distinct prediction payloads')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = write_modcloth_jsonl(os.path.join(tmp, 'modcloth.json'), args.rows)
+        model = SizePredictionModel(data_path)
+        model.train()
+
+    payloads = size_requests(args.requests, seed=1)
+
+    # Parity: compiled path must agree with statsmodels within float tolerance
+    max_diff = 0.0
+    for features in payloads:
+        fast_size, fast_probs = model.predict(features)
+        ref_size, ref_probs = model.predict_statsmodels(features)
+        assert fast_size == ref_size, (features, fast_size, ref_size)
+        max_diff = max(max_diff, max(abs(fast_probs[k] - ref_probs[k]) for k in ref_probs))
+    assert max_diff < 1e-9, max_diff
+
+    statsmodels_s = time_per_call(model.predict_statsmodels, payloads, 1)
+    numpy_s = time_per_call(model.predict, payloads, args.repeat)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        model.predict_many(payloads)
+    batch_s = (time.perf_counter() - start) / (args.repeat * len(payloads))
+
+    print("\nSize prediction latency (per record)")
+    print("-----------------------------------")
+    print(f"statsmodels path:       {statsmodels_s * 1e6:10.1f} us")
+    print(f"numpy path (single):    {numpy_s * 1e6:10.1f} us  ({statsmodels_s / numpy_s:.0f}x)")
+    print(f"numpy path (batch {len(payloads)}): {batch_s * 1e6:10.1f} us  ({statsmodels_s / batch_s:.0f}x)")
+    print(f"max |probability diff|: {max_diff:.2e}")
+
+if __name__ == "__main__":
+    main()
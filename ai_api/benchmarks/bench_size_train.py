@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from size_prediction import SOLVERS
+from synthetic import write_modcloth_jsonl
+
+# bench_size_train.py
+# Fit time and peak memory of the size-model training backends, plus how
+# closely each one's predictions agree with the statsmodels MNLogit fit.
+# Each fit runs in a fresh interpreter; the test-set probabilities are
+# saved so the parent can compare them.
+
+CHILD = """
+import json, sys, time, tracemalloc
+import numpy as np
+sys.path.insert(0, {api_dir!r})
+from sklearn.model_selection import train_test_split
+from size_prediction import SizePredictionModel
+
+model = SizePredictionModel({path!r})
+df = model.load_and_preprocess_data()
+X, y = df.drop(columns=['size_cat']), df['size_cat']
+X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=123, stratify=y)
+
+start = time.perf_counter()
+model.fit(X_train, y_train, solver={solver!r})
+seconds = time.perf_counter() - start
+
+# Second fit under tracemalloc (NumPy reports its buffers to it), kept out of the timing
+tracemalloc.start()
+SizePredictionModel(None).fit(X_train, y_train, solver={solver!r})
+peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+
+design = np.column_stack([np.ones(len(X_test)), X_test.to_numpy(dtype=float)])
+np.save({probs_path!r}, model.predict_proba_array(design))
+print(json.dumps({{
+    'seconds': seconds,
+    'peak_mb': peak / 1e6,
+    'train_rows': len(X_train),
+    'features': X_train.shape[1],
+    'classes': [str(c) for c in model.classes_],
+}}))
+"""
+
+def run_fit(path, solver, probs_path):
+    api_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = CHILD.format(api_dir=api_dir, path=path, solver=solver, probs_path=probs_path)
+    out = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark size-model training backends')
+    parser.add_argument('--rows', type=int, nargs='+', default=[50000, 500000])
+    parser.add_argument('--solvers', nargs='+', choices=SOLVERS, default=list(SOLVERS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in args.rows:
+            path = write_modcloth_jsonl(os.path.join(tmp, f'modcloth-{n_rows}.json'), n_rows)
+            results, probs = {}, {}
+            for solver in args.solvers:
+                probs_path = os.path.join(tmp, f'probs-{n_rows}-{solver}.npy')
+                results[solver] = run_fit(path, solver, probs_path)
+                probs[solver] = np.load(probs_path)
+
+            first = results[args.solvers[0]]
+            print(f"\n{first['train_rows']} training rows, {first['features']} features, classes {first['classes']}")
+            print(f"{'solver':<13}{'fit s':>9}{'speedup':>9}{'peak MB':>10}{'max |dp| vs statsmodels':>26}{'same argmax':>13}")
+            print("-" * 80)
+            reference = probs.get('statsmodels')
+            base = results.get('statsmodels', first)['seconds']
+            for solver, r in results.items():
+                if reference is not None:
+                    diff = f"{np.abs(probs[solver] - reference).max():.2e}"
+                    agree = f"{(probs[solver].argmax(axis=1) == reference.argmax(axis=1)).mean():.4%}"
+                else:
+                    diff, agree = '-', '-'
+                print(f"{solver:<13}{r['seconds']:>9.2f}{base / r['seconds']:>8.1f}x{r['peak_mb']:>10.0f}{diff:>26}{agree:>13}")
+
+if __name__ == "__main__":
+    main()
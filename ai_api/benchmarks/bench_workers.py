@@ -0,0 +1,129 @@
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+import torch
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from loadgen import run_load
+from model_runtime import artifact_paths, export_mmap_weights, load_eager_model
+from synthetic import synthetic_selfie_jpeg
+
+# bench_workers.py
+# Per-worker memory and total throughput of `uvicorn --workers N`, with the
+# skin tone weights loaded privately by each worker vs. memory-mapped once.
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def child_pids(parent_pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                cmdline = f.read()
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == parent_pid and b'resource_tracker' not in cmdline:
+            children.append(int(entry))
+    return children
+
+def worker_pids(server, workers):
+    # With a single worker uvicorn serves from the main process itself
+    return [server.pid] if workers == 1 else child_pids(server.pid)
+
+def memory_mb(pid):
+    """RSS and PSS (RSS with shared pages split between their users) of a process"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                values[key] = int(rest.split()[0]) / 1024
+    return values.get('Rss', 0.0), values.get('Pss', 0.0)
+
+def start_server(workers, weights_path, mmap, port):
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        SKINTONE_WEIGHTS_PATH=weights_path,
+        SKINTONE_RUNTIME='eager',
+        SKINTONE_MMAP_WEIGHTS='auto' if mmap else '0',
+        SKINTONE_CACHE_MAX_MB='0',
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers)],
+        cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/health', timeout=1).ok and len(worker_pids(server, workers)) >= workers:
+                return server
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.kill()
+    raise RuntimeError(f"Server with {workers} workers did not start")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark multi-worker serving')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--weights', help='trained .pth state dict (random weights if omitted)')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--concurrency-per-worker', type=int, default=4)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        weights_path = os.path.join(tmp, 'trained_model.pth')
+        model = load_eager_model(args.weights)
+        torch.save(model.state_dict(), weights_path)
+        export_mmap_weights(model, artifact_paths(weights_path)['mmap'])
+
+        images = [synthetic_selfie_jpeg(1920, 1080, seed=i) for i in range(32)]
+
+        print(f"\n{'workers':>7}{'weights':>9}{'RSS/worker':>12}{'PSS/worker':>12}{'total PSS':>11}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+        print("-" * 78)
+        for workers in args.workers:
+            for mmap in (False, True):
+                port = free_port()
+                server = start_server(workers, weights_path, mmap, port)
+                try:
+                    url = f'http://127.0.0.1:{port}/predict_skin_tone/'
+                    sessions = {}
+
+                    def send(worker_index, request_index):
+                        session = sessions.setdefault(worker_index, requests.Session())
+                        image = images[(worker_index * 7 + request_index) % len(images)]
+                        return session.post(url, files={'file': ('selfie.jpg', image, 'image/jpeg')}).ok
+
+                    result = run_load(send, workers * args.concurrency_per_worker, duration=args.duration)
+                    usage = [memory_mb(pid) for pid in worker_pids(server, workers)]
+                    rss = sum(u[0] for u in usage) / len(usage)
+                    pss = sum(u[1] for u in usage) / len(usage)
+                    print(f"{workers:>7}{'mmap' if mmap else 'private':>9}{rss:>10.0f}MB{pss:>10.0f}MB"
+                          f"{pss * len(usage):>9.0f}MB{result['throughput_rps']:>9.1f}"
+                          f"{result['p50_ms']:>9.1f}{result['p99_ms']:>9.1f}")
+                finally:
+                    server.terminate()
+                    server.wait(timeout=30)
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    main()
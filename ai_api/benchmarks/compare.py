@@ -0,0 +1,66 @@
+import argparse
+import sys
+
+from results import load_results
+
+# compare.py
+# Diff two benchmark result files (from load_test.py or micro.py) and flag
+# regressions, e.g. between the results of two commits.
+
+# Metric -> True if a higher value is better
+COMPARED_METRICS = {
+    'throughput_rps': True,
+    'mean_ms': False,
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+}
+
+def compare(baseline, candidate, threshold):
+    """
+    Returns:
+        list: (benchmark, metric, baseline value, candidate value, relative change, regressed)
+    """
+    rows = []
+    for name, base_metrics in baseline['results'].items():
+        new_metrics = candidate['results'].get(name)
+        if new_metrics is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in base_metrics or metric not in new_metrics or not base_metrics[metric]:
+                continue
+            change = (new_metrics[metric] - base_metrics[metric]) / base_metrics[metric]
+            regressed = -change > threshold if higher_is_better else change > threshold
+            rows.append((name, metric, base_metrics[metric], new_metrics[metric], change, regressed))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative change counted as a regression')
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    candidate = load_results(args.candidate)
+    if baseline['suite'] != candidate['suite']:
+        sys.exit(f"Can't compare a {baseline['suite']} run with a {candidate['suite']} run")
+
+    print(f"baseline:  {baseline['environment']['git_commit']} ({baseline['environment']['timestamp']})")
+    print(f"candidate: {candidate['environment']['git_commit']} ({candidate['environment']['timestamp']})")
+    if baseline['environment']['cpus'] != candidate['environment']['cpus']:
+        print("Warning: runs used a different number of CPUs")
+
+    rows = compare(baseline, candidate, args.threshold)
+    print(f"\n{'benchmark':<42}{'metric':<16}{'baseline':>11}{'candidate':>11}{'change':>9}")
+    print("-" * 89)
+    for name, metric, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<42}{metric:<16}{old:>11.3f}{new:>11.3f}{change:>+9.1%}{flag}")
+
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
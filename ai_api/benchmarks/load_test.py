@@ -0,0 +1,129 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from bench_workers import free_port
+from loadgen import run_load
+from results import write_results
+from synthetic import PHONE_RESOLUTIONS, size_requests, synthetic_selfie_jpeg, write_modcloth_jsonl
+
+# load_test.py
+# Drives /predict_skin_tone/ and /predict_size/ on a local API instance at
+# fixed concurrency levels and reports throughput and p50/p95/p99 latency.
+# Inputs are seeded, so two runs send exactly the same requests.
+#
+#   python benchmarks/load_test.py --start --output load.json
+#   python benchmarks/load_test.py --url http://127.0.0.1:8000 --output load.json
+
+def start_local_server(port, workdir, size_memo=False):
+    """Launch uvicorn with a synthetic size model, the skin tone cache off and the size memo off unless asked"""
+    from size_prediction import SizePredictionModel
+
+    artifact_path = os.path.join(workdir, 'size_model.npz')
+    model = SizePredictionModel(write_modcloth_jsonl(os.path.join(workdir, 'modcloth.json'), 20000))
+    model.train()
+    model.export_artifact(artifact_path)
+
+    env = dict(
+        os.environ,
+        SIZE_MODEL_ARTIFACT=artifact_path,
+        # Every synthetic image is distinct anyway, but make sure no result is served from cache
+        SKINTONE_CACHE_MAX_MB='0',
+        # Off by default so the size scenario measures the model, comparably with runs before the memo
+        **({} if size_memo else {'SIZE_CACHE_MAX_MB': '0'}),
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port)],
+        cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{url}/health', timeout=1).ok:
+                return server, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.kill()
+    raise RuntimeError("Local API server did not start")
+
+def skin_tone_sender(url, images):
+    sessions = {}
+
+    def send(worker_index, request_index):
+        session = sessions.setdefault(worker_index, requests.Session())
+        image = images[(worker_index * 7 + request_index) % len(images)]
+        return session.post(f'{url}/predict_skin_tone/', files={'file': ('selfie.jpg', image, 'image/jpeg')}).ok
+    return send
+
+def size_sender(url, payloads):
+    sessions = {}
+
+    def send(worker_index, request_index):
+        session = sessions.setdefault(worker_index, requests.Session())
+        payload = payloads[(worker_index * 7 + request_index) % len(payloads)]
+        return session.post(f'{url}/predict_size/', json=payload).ok
+    return send
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the StylesSync AI API')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='running API instance')
+    parser.add_argument('--start', action='store_true', help='start a local instance instead of using --url')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--resolutions', nargs='+', default=list(PHONE_RESOLUTIONS), choices=list(PHONE_RESOLUTIONS))
+    parser.add_argument('--images-per-resolution', type=int, default=4)
+    parser.add_argument('--size-payloads', type=int, default=500)
+    parser.add_argument('--size-memo', action='store_true', help='with --start, leave the size prediction memo on')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    args = parser.parse_args()
+
+    print("Generating synthetic selfies and size payloads...")
+    images = {
+        name: [synthetic_selfie_jpeg(*PHONE_RESOLUTIONS[name], seed=args.seed + i) for i in range(args.images_per_resolution)]
+        for name in args.resolutions
+    }
+    payloads = size_requests(args.size_payloads, seed=args.seed)
+
+    server = None
+    workdir = tempfile.TemporaryDirectory()
+    try:
+        url = args.url
+        if args.start:
+            server, url = start_local_server(free_port(), workdir.name, size_memo=args.size_memo)
+
+        scenarios = [(f'skin_tone_{name}', skin_tone_sender(url, images[name])) for name in args.resolutions]
+        scenarios.append(('size', size_sender(url, payloads)))
+
+        results = {}
+        print(f"\n{'scenario':<18}{'conc':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        print("-" * 68)
+        for scenario, send in scenarios:
+            for concurrency in args.concurrency:
+                result = run_load(send, concurrency, duration=args.duration, warmup=args.warmup)
+                results[f'{scenario}/c{concurrency}'] = result
+                print(f"{scenario:<18}{concurrency:>6}{result['throughput_rps']:>9.1f}{result['p50_ms']:>9.1f}"
+                      f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['errors']:>8}")
+
+        if args.output:
+            config = dict(vars(args), url=url)
+            write_results(args.output, 'load', results, config)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        workdir.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import threading
+import time
+
+# loadgen.py
+# Closed-loop load generator: a fixed number of threads each send requests
+# back to back, so concurrency stays constant for the whole run.
+
+def percentile(sorted_values, q):
+    """q-th percentile (0-100) of an already sorted list, nearest-rank"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def run_load(send, concurrency, duration=10.0, warmup=1.0):
+    """
+    Call send(worker_index, request_index) from `concurrency` threads for
+    `duration` seconds. send returns True on success. Only requests started
+    after the first `warmup` seconds are counted, so the throughput is
+    requests started in the measured window over `duration`.
+
+    Returns:
+        dict: Throughput, error count and latency percentiles in milliseconds
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def worker(worker_index):
+        request_index = 0
+        local_latencies, local_errors = [], 0
+        while True:
+            t0 = time.perf_counter()
+            if t0 >= stop_at:
+                break
+            try:
+                ok = send(worker_index, request_index)
+            except Exception:
+                ok = False
+            t1 = time.perf_counter()
+            request_index += 1
+            if t0 >= measure_from:
+                if ok:
+                    local_latencies.append(t1 - t0)
+                else:
+                    local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': len(latencies) / duration,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': (sum(latencies) / len(latencies) * 1000) if latencies else 0.0,
+    }
@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results import write_results
+from size_prediction import SizePredictionModel
+from skintone_match import CNNModel, preprocess_image_for_inference
+from synthetic import PHONE_RESOLUTIONS, size_requests, synthetic_selfie_jpeg, write_modcloth_jsonl
+
+# micro.py
+# Function-level micro-benchmarks of the three hot functions behind the API:
+# preprocess_image_for_inference, CNNModel.forward and SizePredictionModel.predict.
+
+def time_calls(fn, inputs, repeat, warmup=3):
+    """
+    Time fn over inputs, round-robin, after a few untimed warmup calls.
+
+    Returns:
+        dict: Calls timed and mean/min/p50/p95 latency in milliseconds
+    """
+    for i in range(warmup):
+        fn(inputs[i % len(inputs)])
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(inputs[i % len(inputs)])
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        'calls': repeat,
+        'mean_ms': sum(samples) / len(samples) * 1000,
+        'min_ms': samples[0] * 1000,
+        'p50_ms': samples[len(samples) // 2] * 1000,
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark the API hot functions')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    results = {}
+
+    for name, (width, height) in PHONE_RESOLUTIONS.items():
+        images = [synthetic_selfie_jpeg(width, height, seed=args.seed + i) for i in range(4)]
+        results[f'preprocess_image_for_inference/{name}'] = time_calls(preprocess_image_for_inference, images, args.repeat)
+
+    model = CNNModel(num_skin_tones=6).eval()
+    for batch_size in args.batch_sizes:
+        batch = [torch.randn(batch_size, 3, 128, 128)]
+        with torch.no_grad():
+            results[f'CNNModel.forward/batch{batch_size}'] = time_calls(model, batch, args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        size_model = SizePredictionModel(write_modcloth_jsonl(os.path.join(tmp, 'modcloth.json'), 20000, seed=args.seed))
+        size_model.train()
+    payloads = size_requests(200, seed=args.seed)
+    results['SizePredictionModel.predict'] = time_calls(size_model.predict, payloads, args.repeat * 20)
+
+    print(f"\n{'benchmark':<42}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'min ms':>10}")
+    print("-" * 82)
+    for name, r in results.items():
+        print(f"{name:<42}{r['mean_ms']:>10.3f}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['min_ms']:>10.3f}")
+
+    if args.output:
+        write_results(args.output, 'micro', results, vars(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import json
+import os
+import platform
+import subprocess
+import time
+
+# results.py
+# Shared JSON result format for the benchmark suite, so runs from different
+# commits can be diffed with compare.py.
+
+RESULTS_FORMAT_VERSION = 1
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment_info():
+    """Where and on what a benchmark ran"""
+    import torch
+
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count()
+    return {
+        'git_commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'platform': platform.platform(),
+        'cpus': cpus,
+        'torch_threads': torch.get_num_threads(),
+    }
+
+def write_results(path, suite, results, config):
+    """
+    Save benchmark results as JSON.
+
+    Args:
+        suite (str): "load" or "micro"
+        results (dict): Benchmark name -> metrics dict (latencies in ms, throughput in req/s)
+        config (dict): Arguments the run used
+    """
+    payload = {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'suite': suite,
+        'environment': environment_info(),
+        'config': config,
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    print(f"\nResults written to {path}")
+    return path
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
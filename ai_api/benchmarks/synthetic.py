@@ -0,0 +1,83 @@
+import json
+import random
+
+# synthetic.py
+# Synthetic inputs for the benchmarks, so they run without the real datasets.
+
+CATEGORIES = ['new', 'tops', 'bottoms', 'dresses', 'outerwear', 'sale', 'wedding']
+FITS = ['fit', 'small', 'large']
+
+def modcloth_record(rng):
+    """One ModCloth-style review row whose measurements loosely track size"""
+    size = rng.randint(0, 20)
+    record = {
+        'waist': round(24 + size * 0.8 + rng.gauss(0, 2), 1),
+        'quality': rng.randint(1, 5),
+        'category': rng.choice(CATEGORIES),
+        'bust': round(30 + size * 0.7 + rng.gauss(0, 2), 1),
+        'height': round(60 + rng.gauss(0, 3), 1),
+        'length': round(30 + rng.gauss(0, 3), 1),
+        'fit': rng.choice(FITS),
+        'review_text': 'x' * rng.randint(0, 300),
+        'review_summary': 'y' * rng.randint(0, 50),
+        'size': size,
+    }
+    # Real dumps have missing and null review fields
+    if rng.random() < 0.05:
+        record['review_text'] = None
+    if rng.random() < 0.05:
+        del record['review_summary']
+    return record
+
+def write_modcloth_jsonl(path, n_rows, seed=0):
+    """Write n_rows synthetic reviews as a JSON-lines file"""
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        for _ in range(n_rows):
+            f.write(json.dumps(modcloth_record(rng)) + '\n')
+    return path
+
+def size_request(rng):
+    """One payload shaped like SizePredictionRequest"""
+    return {
+        'waist': round(rng.uniform(22, 40), 1),
+        'quality': rng.randint(1, 5),
+        'category': rng.choice(CATEGORIES),
+        'bust': round(rng.uniform(28, 46), 1),
+        'height': round(rng.uniform(56, 74), 1),
+        'length': round(rng.uniform(25, 40), 1),
+        'fit': rng.choice(FITS),
+    }
+
+def size_requests(n, seed=0):
+    rng = random.Random(seed)
+    return [size_request(rng) for _ in range(n)]
+
+# Common phone camera resolutions (width, height)
+PHONE_RESOLUTIONS = {
+    '12mp': (4032, 3024),
+    '8mp': (3264, 2448),
+    '1080p': (1920, 1080),
+}
+
+def synthetic_selfie_jpeg(width, height, seed=0, quality=90):
+    """
+    JPEG bytes of a face-sized skin-coloured blob over a gradient, with noise,
+    so it compresses and decodes like a photo rather than a flat image.
+    """
+    import io
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    background = np.stack([xs / width * 160, ys / height * 120, np.full_like(xs, 90)], axis=-1)
+    skin = np.array(rng.uniform([90, 60, 40], [230, 180, 150]), dtype=np.float32)
+    cy, cx = height * 0.45, width * 0.5
+    face = (((ys - cy) / (height * 0.3)) ** 2 + ((xs - cx) / (width * 0.22)) ** 2) <= 1.0
+    pixels = np.where(face[..., None], skin, background)
+    pixels += rng.normal(0, 12, size=pixels.shape).astype(np.float32)
+
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import math
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# cache.py
+
+# Rough per-entry bookkeeping cost (OrderedDict node, tuple, floats)
+ENTRY_OVERHEAD_BYTES = 200
+
+def content_key(data):
+    """Hash raw bytes (e.g. an uploaded image) into a cache key"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def quantized_key(features, numeric_fields, resolution, namespace=None):
+    """
+    Snap the numeric fields of a feature dict to a grid and build a hashable key from every field
+    
+    Args:
+        features (dict): Feature values (numbers and strings)
+        numeric_fields (list): Fields rounded to a multiple of resolution
+        resolution (float): Grid step; 0 keeps the values exact
+        namespace: Leading key part, e.g. a model version
+    
+    Returns:
+        dict, tuple: The snapped features (predict on these, so every request
+            sharing a key gets the same answer) and the key
+    """
+    snapped = dict(features)
+    parts = [namespace]
+    for name in sorted(features):
+        value = features[name]
+        if name in numeric_fields and resolution > 0 and isinstance(value, (int, float)) and math.isfinite(value):
+            steps = round(value / resolution)
+            snapped[name] = steps * resolution
+            value = steps
+        parts.append((name, value))
+    return snapped, tuple(parts)
+
+def approx_size(key, value):
+    """Approximate memory held by one cache entry, in bytes"""
+    return sys.getsizeof(key) + len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)) + ENTRY_OVERHEAD_BYTES
+
+class SQLiteCacheBackend:
+    """
+    Shared cache store in a local SQLite file.
+    Lets several uvicorn workers on one host reuse each other's results
+    without running a separate cache server.
+
+    Calls block on disk I/O and, while another worker holds the write lock,
+    for up to the busy timeout, so async code should go through
+    LRUCache.get_async/set_async, which run them on a thread pool.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl_seconds):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time() + ttl_seconds)
+        )
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def purge_expired(self):
+        self._connection().execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+
+class LRUCache:
+    """
+    In-process LRU cache with a time-to-live and a memory bound.
+    Optionally backed by a shared store that is consulted on local misses.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl_seconds=3600.0, backend=None, namespace=""):
+        """
+        Args:
+            max_bytes (int): Approximate memory budget for local entries
+            ttl_seconds (float): How long an entry stays valid after it is set
+            backend (object): Optional shared store with get/set/clear methods
+            namespace (str): Prefix for backend keys, e.g. a model version
+        """
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds)
+        self.backend = backend
+        self.namespace = namespace
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+        self.backend_errors = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _backend_key(self, key):
+        return f"{self.namespace}:{key}" if self.namespace else key
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        value = self._get_local(key)
+        if value is None and self.backend is not None:
+            value = self._get_backend(key)
+        if value is None:
+            with self._lock:
+                self.misses += 1
+        return value
+
+    async def get_async(self, key):
+        """get() for the event loop: a local miss reads the backend on the default thread pool"""
+        if not self.enabled:
+            return None
+
+        value = self._get_local(key)
+        if value is None and self.backend is not None:
+            loop = asyncio.get_running_loop()
+            value = await loop.run_in_executor(None, self._get_backend, key)
+        if value is None:
+            with self._lock:
+                self.misses += 1
+        return value
+
+    def set(self, key, value):
+        """Cache value under key, evicting least recently used entries if needed"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._store(key, value)
+        if self.backend is not None:
+            self._set_backend(key, value)
+
+    async def set_async(self, key, value):
+        """set() for the event loop: the backend write runs on the default thread pool"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._store(key, value)
+        if self.backend is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._set_backend, key, value)
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._remove(key)
+                self.expirations += 1
+        return None
+
+    def _get_backend(self, key):
+        try:
+            value = self.backend.get(self._backend_key(key))
+        except Exception as e:
+            self.backend_errors += 1
+            print(f"Cache backend read failed: {e}")
+            return None
+        if value is not None:
+            with self._lock:
+                self.backend_hits += 1
+                self.hits += 1
+                self._store(key, value)
+        return value
+
+    def _set_backend(self, key, value):
+        try:
+            self.backend.set(self._backend_key(key), value, self.ttl_seconds)
+        except Exception as e:
+            self.backend_errors += 1
+            print(f"Cache backend write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def _store(self, key, value):
+        if key in self._entries:
+            self._remove(key)
+        size = approx_size(key, value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds, size)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "backend_hits": self.backend_hits,
+            "backend_errors": self.backend_errors,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+def build_cache_backend(kind, path):
+    """Create the shared cache backend named by kind ("" or "none" disables it)"""
+    if not kind or kind == "none":
+        return None
+    if kind == "sqlite":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return SQLiteCacheBackend(path)
+    raise ValueError(f"Unknown cache backend: {kind}")
@@ -0,0 +1,190 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# executor.py
+
+class PoolFullError(Exception):
+    """Raised when a pool's wait queue is full and a request is rejected"""
+    pass
+
+# Size model held by each process-pool worker (set by the pool initializer)
+_worker_size_model = None
+
+def _init_size_worker(model):
+    global _worker_size_model
+    _worker_size_model = model
+
+def _call_size_model(method_name, *args):
+    return getattr(_worker_size_model, method_name)(*args)
+
+class BoundedPool:
+    """
+    Wraps a concurrent.futures executor with a concurrency limit and a
+    bounded wait queue, so overload is rejected instead of piling up.
+    """
+
+    def __init__(self, name, executor, max_concurrency, max_queue):
+        self.name = name
+        self.executor = executor
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self._semaphore = None
+
+        # Metrics
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool once a concurrency slot is free"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise PoolFullError(f"{self.name} pool is at capacity ({self.max_queue} requests waiting).")
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args))
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def swap_executor(self, executor):
+        """
+        Send jobs that haven't been submitted yet to executor; returns the old
+        one, which still finishes its submitted jobs and must be shut down by
+        the caller. The queue and the metrics carry over.
+        """
+        # run() reads self.executor right before submitting, with no await in between,
+        # so a job is never handed to an executor after it was swapped out
+        old_executor, self.executor = self.executor, executor
+        return old_executor
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+class InferenceExecutor:
+    """
+    Runs blocking inference off the asyncio event loop.
+
+    Torch work (image decode, transforms, forward pass) goes to a thread pool,
+    since torch releases the GIL. The pandas-heavy size path uses its own pool,
+    which can be threads or, optionally, worker processes that each hold a
+    copy of the size model.
+    """
+
+    def __init__(self, torch_workers=2, torch_queue=64, size_workers=1, size_queue=64, size_mode="thread"):
+        """
+        Args:
+            torch_workers (int): Concurrent torch jobs (thread pool size)
+            torch_queue (int): Torch jobs allowed to wait for a free worker
+            size_workers (int): Concurrent size-model jobs
+            size_queue (int): Size-model jobs allowed to wait for a free worker
+            size_mode (str): "thread" or "process" for the size-model pool
+        """
+        if size_mode not in ("thread", "process"):
+            raise ValueError("size_mode must be 'thread' or 'process'.")
+
+        self.size_mode = size_mode
+        self.size_workers = size_workers
+        self.size_queue = size_queue
+        self.size_model = None
+        self._size_model_lock = threading.Lock()
+        self.torch_pool = BoundedPool(
+            "torch",
+            ThreadPoolExecutor(max_workers=torch_workers, thread_name_prefix="torch-infer"),
+            torch_workers,
+            torch_queue
+        )
+        self.size_pool = None
+
+    def set_size_model(self, model):
+        """
+        Install the size model.
+
+        Thread mode keeps one pool and swaps the model reference; jobs already
+        running finish on the previous model. Process mode starts workers
+        holding the new model and returns the previous executor, which still
+        runs the jobs submitted to it: drain it with shutdown(wait=True) off
+        the event loop (see retire_executor).
+
+        Returns:
+            Executor or None: The process pool that was replaced
+        """
+        with self._size_model_lock:
+            self.size_model = model
+        if self.size_mode == "thread":
+            if self.size_pool is None:
+                executor = ThreadPoolExecutor(max_workers=self.size_workers, thread_name_prefix="size-infer")
+                self.size_pool = BoundedPool("size", executor, self.size_workers, self.size_queue)
+            return None
+
+        # spawn rather than fork: forking a process with torch threads running can deadlock
+        executor = ProcessPoolExecutor(
+            max_workers=self.size_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_size_worker,
+            initargs=(model,)
+        )
+        if self.size_pool is None:
+            self.size_pool = BoundedPool("size", executor, self.size_workers, self.size_queue)
+            return None
+        return self.size_pool.swap_executor(executor)
+
+    async def retire_executor(self, executor):
+        """Wait, off the event loop, for a replaced pool's jobs to finish, then shut it down"""
+        if executor is not None:
+            await asyncio.get_running_loop().run_in_executor(None, functools.partial(executor.shutdown, wait=True))
+
+    async def run_torch(self, fn, *args):
+        """Run a torch-bound function on the torch thread pool"""
+        return await self.torch_pool.run(fn, *args)
+
+    async def run_size_model(self, method_name, *args):
+        """Call a method of the size model on the size pool"""
+        if self.size_pool is None:
+            raise RuntimeError("Size model has not been set on the executor.")
+        if self.size_mode == "process":
+            return await self.size_pool.run(_call_size_model, method_name, *args)
+        return await self.size_pool.run(self._call_current_size_model, method_name, *args)
+
+    def _call_current_size_model(self, method_name, *args):
+        # Read when the job starts, so jobs queued during a swap use the new model
+        with self._size_model_lock:
+            model = self.size_model
+        return getattr(model, method_name)(*args)
+
+    def shutdown(self, wait=True):
+        self.torch_pool.shutdown(wait=wait)
+        if self.size_pool is not None:
+            self.size_pool.shutdown(wait=wait)
+
+    def stats(self):
+        return {
+            "torch": self.torch_pool.stats(),
+            "size": dict(self.size_pool.stats(), mode=self.size_mode) if self.size_pool else None,
+        }
@@ -1,17 +1,104 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from pydantic import BaseModel
+import time
+_import_started_at = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Request, Response
+from pydantic import BaseModel, ValidationError
 import uvicorn
+import asyncio
+import copy
 import os
-from typing import List, Dict, Optional
+import hmac
+from io import BytesIO
+from typing import Any, List, Dict, Optional
+_framework_imported_at = time.perf_counter()
+
 import torch
+_torch_imported_at = time.perf_counter()
 
 # Device setup (global)
 device = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
 print(f"Using device for FastAPI: {device}")
 
 # Import both AI models
-from skintone_match import CNNModel, preprocess_image_for_inference, predict_skin_tone
-from size_prediction import SizePredictionModel
+from skintone_match import CNNModel, get_preprocessor, predict_skin_tone_batch
+from size_prediction import NUMERIC_FEATURES, SizePredictionModel
+from batching import MicroBatcher
+from executor import InferenceExecutor, PoolFullError
+from cache import LRUCache, build_cache_backend, content_key, quantized_key
+from model_runtime import (
+    artifact_paths, configure_worker_threads, export_is_current, load_mmap_weights, load_runtime, stale_export_message
+)
+from metrics import CONTENT_TYPE, MetricsRegistry
+from profiling import RequestProfiler
+from torch.profiler import record_function
+from PIL import Image
+_app_imported_at = time.perf_counter()
+
+# Cold-start breakdown in milliseconds, reported at startup and in /health
+startup_report = {
+    "import_framework_ms": round((_framework_imported_at - _import_started_at) * 1000, 1),
+    "import_torch_ms": round((_torch_imported_at - _framework_imported_at) * 1000, 1),
+    "import_app_modules_ms": round((_app_imported_at - _torch_imported_at) * 1000, 1),
+}
+
+def record_startup_stage(stage, started_at):
+    startup_report[f"{stage}_ms"] = round((time.perf_counter() - started_at) * 1000, 1)
+
+# Skin tone weights, and which runtime serves them: "auto", "eager", "torchscript", "onnx" or "compile".
+# "auto" picks an artifact exported by `python model_runtime.py` when one sits next to the weights.
+SKINTONE_WEIGHTS_PATH = os.getenv(
+    "SKINTONE_WEIGHTS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'AI', 'trained_model.pth')
+)
+SKINTONE_RUNTIME = os.getenv("SKINTONE_RUNTIME", "auto")
+# "none", "dynamic" (int8 linear layers) or "static" (calibrated int8 export from AI/quantize_model.py)
+SKINTONE_QUANTIZATION = os.getenv("SKINTONE_QUANTIZATION", "none")
+# "auto" maps the .mmap.pt export of the weights read-only when it exists, so uvicorn workers
+# share one copy of the weights in the page cache; "0" always loads a private copy.
+# Only the eager runtime serves from the mapped pages, so SKINTONE_RUNTIME=auto keeps eager then
+SKINTONE_MMAP_WEIGHTS = os.getenv("SKINTONE_MMAP_WEIGHTS", "auto")
+
+# Number of uvicorn worker processes (uvicorn reads the same variable for --workers)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Run a dummy request through each model at startup so the first real one doesn't pay for lazy init
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") != "0"
+
+# Micro-batching settings for /predict_skin_tone/
+SKINTONE_MAX_BATCH_SIZE = int(os.getenv("SKINTONE_MAX_BATCH_SIZE", "16"))
+SKINTONE_MAX_WAIT_MS = float(os.getenv("SKINTONE_MAX_WAIT_MS", "5"))
+
+# Inference executor settings (blocking work runs here, not on the event loop)
+INFERENCE_TORCH_WORKERS = int(os.getenv("INFERENCE_TORCH_WORKERS", "2"))
+INFERENCE_TORCH_QUEUE = int(os.getenv("INFERENCE_TORCH_QUEUE", "64"))
+INFERENCE_SIZE_MODE = os.getenv("INFERENCE_SIZE_MODE", "thread")  # "thread" or "process"
+INFERENCE_SIZE_WORKERS = int(os.getenv("INFERENCE_SIZE_WORKERS", "1"))
+INFERENCE_SIZE_QUEUE = int(os.getenv("INFERENCE_SIZE_QUEUE", "64"))
+
+# Skin tone result cache, keyed by a hash of the uploaded image bytes
+SKINTONE_CACHE_MAX_MB = float(os.getenv("SKINTONE_CACHE_MAX_MB", "16"))  # 0 disables the cache
+SKINTONE_CACHE_TTL_SECONDS = float(os.getenv("SKINTONE_CACHE_TTL_SECONDS", "3600"))
+SKINTONE_CACHE_BACKEND = os.getenv("SKINTONE_CACHE_BACKEND", "")  # "" or "sqlite"
+SKINTONE_CACHE_PATH = os.getenv("SKINTONE_CACHE_PATH", "/tmp/stylesync/skintone_cache.sqlite")
+
+# Size prediction memo, keyed on the request features with the measurements rounded
+# to SIZE_CACHE_RESOLUTION inches (predictions are made on the rounded values)
+SIZE_CACHE_MAX_MB = float(os.getenv("SIZE_CACHE_MAX_MB", "8"))  # 0 disables the memo and the rounding
+SIZE_CACHE_RESOLUTION = float(os.getenv("SIZE_CACHE_RESOLUTION", "0.5"))  # 0 memoizes exact values only
+SIZE_CACHE_TTL_SECONDS = float(os.getenv("SIZE_CACHE_TTL_SECONDS", "86400"))
+
+# Exported size model (see `python size_prediction.py --export`)
+SIZE_MODEL_ARTIFACT = os.getenv("SIZE_MODEL_ARTIFACT", os.path.join(os.path.dirname(__file__), 'size_model.npz'))
+
+# Largest number of records/images accepted by the batch endpoints
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "256"))
+
+# Shared secret for /admin endpoints and the X-Profile header; empty disables both
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Where per-request profiles and session summaries are written
+PROFILING_DIR = os.getenv("PROFILING_DIR", "/tmp/stylesync/profiles")
+PROFILING_PROFILERS = os.getenv("PROFILING_PROFILERS", "torch,cprofile").split(",")
 
 app = FastAPI(
     title="StylesSync AI API",
@@ -39,55 +126,444 @@ class SizePredictionResponse(BaseModel):
     confidence: float
     message: str
 
+class SizePredictionBatchRequest(BaseModel):
+    # Validated per record, so one malformed record doesn't reject the batch
+    items: List[Dict[str, Any]]
+
+class SizePredictionBatchItem(BaseModel):
+    index: int
+    prediction: Optional[SizePredictionResponse] = None
+    error: Optional[str] = None
+
+class SizePredictionBatchResponse(BaseModel):
+    results: List[SizePredictionBatchItem]
+
+class SkinToneBatchItem(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    prediction: Optional[SkinTonePredictionResponse] = None
+    error: Optional[str] = None
+
+class SkinToneBatchResponse(BaseModel):
+    results: List[SkinToneBatchItem]
+
+class SizeModelUpdateRequest(BaseModel):
+    # Reviews in the training file's format, including the numeric size
+    records: List[Dict[str, Any]]
+    forgetting: float = 1.0  # below 1, down-weights the data the model was fit on so far
+    persist: bool = True  # also write the updated model over SIZE_MODEL_ARTIFACT
+
+class ProfilingRequest(BaseModel):
+    enabled: bool
+    requests: int = 0  # profile this many sampled requests, then stop (0 = until disabled)
+    sample_rate: float = 1.0
+    profilers: Optional[List[str]] = None  # "torch" and/or "cprofile"
+
+# Set by the startup hook
+skintone_model = None
+skintone_runtime = None
+size_model = None
+model_load_errors = {}  # what failed to load at startup -> error
+
+# One incremental size model update at a time, so none is lost to a concurrent swap
+size_model_update_lock = asyncio.Lock()
+
+inference_executor = InferenceExecutor(
+    torch_workers=INFERENCE_TORCH_WORKERS,
+    torch_queue=INFERENCE_TORCH_QUEUE,
+    size_workers=INFERENCE_SIZE_WORKERS,
+    size_queue=INFERENCE_SIZE_QUEUE,
+    size_mode=INFERENCE_SIZE_MODE
+)
+
+# Metrics (scraped from /metrics)
+metrics_registry = MetricsRegistry()
+request_count = metrics_registry.counter(
+    "stylessync_requests", "HTTP requests handled", ("endpoint", "method", "status")
+)
+request_latency = metrics_registry.histogram(
+    "stylessync_request_duration_seconds", "End-to-end request latency", ("endpoint",)
+)
+stage_latency = metrics_registry.histogram(
+    "stylessync_stage_duration_seconds",
+    "Time spent in each inference stage (forward is per forward pass, the rest per item)",
+    ("endpoint", "stage")
+)
+skintone_predictions = metrics_registry.counter(
+    "stylessync_skin_tone_predictions", "Skin tone predictions by class", ("predicted_class",)
+)
+size_predictions = metrics_registry.counter(
+    "stylessync_size_predictions", "Size predictions by size", ("predicted_size",)
+)
+
+def preprocess_upload(image_bytes, endpoint):
+    """Decode and preprocess one upload, timing the two stages separately"""
+    preprocessor = get_preprocessor()
+    with stage_latency.time(endpoint=endpoint, stage="decode"):
+        img = preprocessor.decode(image_bytes)
+    with stage_latency.time(endpoint=endpoint, stage="preprocess"):
+        return preprocessor.to_tensor(preprocessor.resize(img)).unsqueeze(0)
+
+def classify_skintone_batch(images, endpoint="/predict_skin_tone/"):
+    """Stack preprocessed images and classify them in one forward pass"""
+    with stage_latency.time(endpoint=endpoint, stage="forward"):
+        return predict_skin_tone_batch(skintone_model, torch.cat(images), device=str(device))
+
+async def run_skintone_batch(images):
+    return await inference_executor.run_torch(classify_skintone_batch, images)
+
+def classify_image_bytes(images_bytes, endpoint="/predict_skin_tone/batch"):
+    """
+    Decode and classify several uploads with a single forward pass.
+
+    Returns:
+        list: (predicted class, None) or (None, error message) for each upload
+    """
+    results = [None] * len(images_bytes)
+    tensors, positions = [], []
+    for i, image_bytes in enumerate(images_bytes):
+        try:
+            tensors.append(preprocess_upload(image_bytes, endpoint))
+            positions.append(i)
+        except Exception as e:
+            results[i] = (None, f"Could not read image: {e}")
+
+    if tensors:
+        predictions = classify_skintone_batch(tensors, endpoint)
+        for i, predicted_class in zip(positions, predictions):
+            results[i] = (predicted_class, None)
+    return results
+
+def warmup_models():
+    """One tiny image through decode/preprocess/forward, and one record through the size model"""
+    buffer = BytesIO()
+    Image.new('RGB', (256, 256), (180, 140, 120)).save(buffer, 'JPEG')
+    classify_image_bytes([buffer.getvalue()], endpoint="startup_warmup")
+    
+    if size_model is not None and size_model.coef_ is not None:
+        size_model.predict_many([{
+            'waist': 28, 'quality': 4, 'category': 'dresses', 'bust': 34,
+            'height': 65, 'length': 35, 'fit': 'fit'
+        }])
+
+def classify_upload_profiled(image_bytes):
+    """
+    Whole skin tone pipeline for one upload in a single thread, with each
+    stage labelled in the torch profiler trace. Profiled requests skip the
+    cache and the micro-batcher so the trace only holds this request's work.
+    """
+    endpoint = "/predict_skin_tone/"
+    preprocessor = get_preprocessor()
+    with record_function("decode"):
+        img = preprocessor.decode(image_bytes)
+    with record_function("preprocess"):
+        image_tensor = preprocessor.to_tensor(preprocessor.resize(img)).unsqueeze(0)
+    with record_function("forward"):
+        return classify_skintone_batch([image_tensor], endpoint)[0]
+
+def skintone_response(predicted_class):
+    skintone_predictions.inc(predicted_class=predicted_class)
+    return SkinTonePredictionResponse(
+        predicted_skin_tone_class=predicted_class,
+        message=f"Successfully predicted skin tone: class {predicted_class}"
+    )
+
+def size_response(predicted_size, probabilities):
+    # Calculate confidence (highest probability)
+    confidence = max(probabilities.values()) if probabilities else 0.0
+    size_predictions.inc(predicted_size=predicted_size)
+    
+    return SizePredictionResponse(
+        predicted_size=predicted_size,
+        size_probabilities=probabilities,
+        confidence=confidence,
+        message=f"Successfully predicted size: {predicted_size} (confidence: {confidence:.2%})"
+    )
+
+def record_size_stages(endpoint, timings):
+    for stage, seconds in timings.items():
+        stage_latency.observe(seconds, endpoint=endpoint, stage=stage)
+
+def install_size_model(model):
+    """
+    Serve size predictions from model, dropping the memoized ones if its version differs.
+    Returns the size process pool it replaced (None in thread mode), for retire_executor()
+    """
+    global size_model
+    if size_model is None or model.model_version != size_model.model_version:
+        size_cache.clear()
+    size_model = model
+    return inference_executor.set_size_model(model)
+
+async def predict_sizes(features_list, endpoint):
+    """
+    Size predictions for validated feature dicts. Memoized ones are served from
+    size_cache; the rest (each distinct key once) go to the size pool in one call.
+    """
+    if size_model is None:
+        raise RuntimeError(f"Size model failed to load: {model_load_errors.get('size_prediction')}")
+    if not size_cache.enabled:
+        predictions, timings = await inference_executor.run_size_model('predict_many_timed', features_list)
+        record_size_stages(endpoint, timings)
+        return predictions
+    
+    # The version is part of the key, so a prediction still running on a model
+    # that has since been swapped out can't be stored under the new model
+    version = size_model.model_version
+    results = [None] * len(features_list)
+    pending = {}  # key -> (snapped features, positions)
+    for i, features in enumerate(features_list):
+        snapped, key = quantized_key(features, NUMERIC_FEATURES, SIZE_CACHE_RESOLUTION, namespace=version)
+        cached = size_cache.get(key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(key, (snapped, []))[1].append(i)
+    
+    if pending:
+        predictions, timings = await inference_executor.run_size_model(
+            'predict_many_timed', [snapped for snapped, _ in pending.values()]
+        )
+        record_size_stages(endpoint, timings)
+        for (key, (_, positions)), prediction in zip(pending.items(), predictions):
+            size_cache.set(key, prediction)
+            for i in positions:
+                results[i] = prediction
+    return results
+
+def update_size_model(model, records, forgetting, persist):
+    """Fold records into a copy of the size model; the serving model is never modified"""
+    updated = copy.deepcopy(model)
+    summary = updated.partial_fit(records, forgetting=forgetting)
+    if persist and summary['rows']:
+        summary['model_version'] = updated.export_artifact(SIZE_MODEL_ARTIFACT)['model_version']
+    return updated, summary
+
+request_profiler = RequestProfiler(PROFILING_DIR, profilers=PROFILING_PROFILERS, header_token=ADMIN_TOKEN)
+
+def require_admin(token):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if token is None or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+skintone_batcher = MicroBatcher(
+    run_skintone_batch,
+    max_batch_size=SKINTONE_MAX_BATCH_SIZE,
+    max_wait_ms=SKINTONE_MAX_WAIT_MS
+)
+
+skintone_cache = LRUCache(
+    max_bytes=int(SKINTONE_CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=SKINTONE_CACHE_TTL_SECONDS
+)
+
+# Entries only go stale when the model changes, and install_size_model() clears the memo then
+size_cache = LRUCache(
+    max_bytes=int(SIZE_CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=SIZE_CACHE_TTL_SECONDS
+)
+
+def _pool_gauge(field):
+    def read():
+        values = {("torch",): getattr(inference_executor.torch_pool, field)}
+        if inference_executor.size_pool is not None:
+            values[("size",)] = getattr(inference_executor.size_pool, field)
+        return values
+    return read
+
+metrics_registry.gauge(
+    "stylessync_skin_tone_batch_queue_depth", "Skin tone images waiting for the next batch",
+    skintone_batcher.queue_depth
+)
+metrics_registry.gauge(
+    "stylessync_skin_tone_batches_in_flight", "Skin tone batches currently running",
+    skintone_batcher.batches_in_flight
+)
+def _cache_gauge(field):
+    def read():
+        return {("skin_tone",): skintone_cache.stats()[field], ("size",): size_cache.stats()[field]}
+    return read
+
+metrics_registry.gauge(
+    "stylessync_cache_hit_ratio", "Fraction of cache lookups served from the cache",
+    _cache_gauge("hit_rate"), ("cache",)
+)
+metrics_registry.gauge(
+    "stylessync_cache_bytes", "Approximate memory held by cache entries",
+    _cache_gauge("bytes"), ("cache",)
+)
+metrics_registry.gauge(
+    "stylessync_executor_in_flight", "Jobs running on each inference pool",
+    _pool_gauge("in_flight"), ("pool",)
+)
+metrics_registry.gauge(
+    "stylessync_executor_waiting", "Jobs queued for a free worker on each inference pool",
+    _pool_gauge("waiting"), ("pool",)
+)
+
 @app.on_event("startup")
 async def startup_event():
-    global skintone_model, size_model
+    global skintone_model, skintone_runtime
+    threads = configure_worker_threads(WEB_CONCURRENCY)
+    print(f"Worker {os.getpid()}: {threads} torch threads ({WEB_CONCURRENCY} workers)")
+    
+    # Each model loads on its own, so one failing doesn't leave the others
+    # unloaded; failures are kept in model_load_errors and shown on /health
     try:
         # Initialize the skin tone model
-        skintone_model = CNNModel(num_skin_tones=6)
+        stage_start = time.perf_counter()
+        eager_model = CNNModel(num_skin_tones=6)
         
         # Load trained weights if available
-        model_weights_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'AI', 'trained_model.pth')
-        if os.path.exists(model_weights_path):
-            skintone_model.load_state_dict(torch.load(model_weights_path, map_location=device))
+        model_weights_path = SKINTONE_WEIGHTS_PATH
+        mmap_weights_path = artifact_paths(model_weights_path)['mmap']
+        use_mmap = SKINTONE_MMAP_WEIGHTS != "0" and device.type == 'cpu' and os.path.exists(mmap_weights_path)
+        if use_mmap and not export_is_current(mmap_weights_path, model_weights_path):
+            # A retrained .pth wins over an export of the previous weights
+            print(f"Loading {model_weights_path} instead of mapping: {stale_export_message(mmap_weights_path, model_weights_path)}")
+            use_mmap = False
+        if use_mmap:
+            load_mmap_weights(eager_model, mmap_weights_path)
+            print(f"Mapped skin tone model weights from {mmap_weights_path}")
+            # The .pth may not be deployed alongside its export, so key the cache on the file actually loaded
+            weights_stat = os.stat(mmap_weights_path)
+            skintone_cache.namespace = f"skintone-{weights_stat.st_size}-{int(weights_stat.st_mtime)}"
+        elif os.path.exists(model_weights_path):
+            eager_model.load_state_dict(torch.load(model_weights_path, map_location=device))
             print(f"Loaded skin tone model weights from {model_weights_path}")
+            weights_stat = os.stat(model_weights_path)
+            skintone_cache.namespace = f"skintone-{weights_stat.st_size}-{int(weights_stat.st_mtime)}"
         else:
             print("No skin tone model weights found. Using randomly initialized model.")
+            # Random weights differ per process, so never share their results
+            skintone_cache.namespace = f"skintone-random-{os.getpid()}"
             
-        skintone_model.eval()
-        skintone_model.to(device)
-        print(f"Skin tone model loaded successfully on {device}")
+        eager_model.eval()
+        eager_model.to(device)
+        record_startup_stage("load_skintone_weights", stage_start)
         
-        # Initialize the size prediction model
-        size_model = SizePredictionModel()
+        stage_start = time.perf_counter()
+        try:
+            skintone_model, skintone_runtime = load_runtime(
+                SKINTONE_RUNTIME, eager_model, model_weights_path, device,
+                quantization=SKINTONE_QUANTIZATION, mapped_weights=use_mmap
+            )
+        except Exception as e:
+            # A missing export or optional dependency shouldn't take the endpoint down with it
+            print(f"Warning: could not load skin tone runtime '{SKINTONE_RUNTIME}' "
+                  f"(quantization: {SKINTONE_QUANTIZATION}): {e}. Serving the eager model instead.")
+            model_load_errors["skin_tone_runtime"] = str(e)
+            skintone_model, skintone_runtime = eager_model, 'eager'
+        record_startup_stage("select_skintone_runtime", stage_start)
+        # fp32 and int8 runtimes can give different classes for the same image,
+        # so workers serving different ones mustn't share results through the backend
+        skintone_cache.namespace += f"-{skintone_runtime}"
+        print(f"Skin tone model loaded successfully on {device} (runtime: {skintone_runtime})")
+    except Exception as e:
+        print(f"Error loading the skin tone model at startup: {e}")
+        model_load_errors["skin_tone"] = str(e)
+        skintone_model = None
+
+    if skintone_cache.enabled:
+        try:
+            skintone_cache.backend = build_cache_backend(SKINTONE_CACHE_BACKEND, SKINTONE_CACHE_PATH)
+            print(f"Skin tone cache enabled ({SKINTONE_CACHE_MAX_MB}MB, backend: {SKINTONE_CACHE_BACKEND or 'local'})")
+        except Exception as e:
+            print(f"Warning: could not open the skin tone cache backend: {e}. Caching in this process only.")
+            model_load_errors["skin_tone_cache_backend"] = str(e)
+
+    await skintone_batcher.start()
+    print(f"Skin tone batching enabled (max batch size {SKINTONE_MAX_BATCH_SIZE}, max wait {SKINTONE_MAX_WAIT_MS}ms)")
+    
+    # Load the exported size prediction model (no refitting at startup)
+    try:
+        stage_start = time.perf_counter()
+        if os.path.exists(SIZE_MODEL_ARTIFACT):
+            loaded_size_model = SizePredictionModel.load_artifact(SIZE_MODEL_ARTIFACT)
+            print(f"Loaded size model {loaded_size_model.model_version} from {SIZE_MODEL_ARTIFACT}")
+        else:
+            loaded_size_model = SizePredictionModel()
+            print(f"No size model artifact at {SIZE_MODEL_ARTIFACT}. /predict_size/ will fail until one is exported.")
+        install_size_model(loaded_size_model)
+        if size_cache.enabled:
+            print(f"Size prediction memo enabled ({SIZE_CACHE_MAX_MB}MB, measurements rounded to {SIZE_CACHE_RESOLUTION})")
+        record_startup_stage("load_size_model", stage_start)
         print("Size prediction model initialized successfully")
-        
     except Exception as e:
-        print(f"Error loading AI models at startup: {e}")
-        # Depending on criticality, you might want to raise the exception or exit
+        print(f"Error loading the size model at startup: {e}")
+        model_load_errors["size_prediction"] = str(e)
+    
+    if STARTUP_WARMUP and skintone_model is not None:
+        try:
+            stage_start = time.perf_counter()
+            await inference_executor.run_torch(warmup_models)
+            record_startup_stage("warmup", stage_start)
+        except Exception as e:
+            print(f"Warning: startup warmup failed: {e}")
+            model_load_errors["warmup"] = str(e)
+    
+    record_startup_stage("total", _import_started_at)
+    print("Startup time breakdown: " + ", ".join(f"{stage}={ms}" for stage, ms in startup_report.items()))
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, so unknown URLs can't blow up the series count
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        request_count.inc(endpoint=endpoint, method=request.method, status=status)
+        request_latency.observe(time.perf_counter() - start, endpoint=endpoint)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await skintone_batcher.stop()
+    inference_executor.shutdown(wait=False)
 
 @app.post("/predict_skin_tone/", response_model=SkinTonePredictionResponse)
-async def predict_skin_tone_api(file: UploadFile = File(...)):
+async def predict_skin_tone_api(file: UploadFile = File(...), x_profile: Optional[str] = Header(None)):
     try:
+        endpoint = "/predict_skin_tone/"
+        
         # Read the image bytes
-        image_bytes = await file.read()
+        with stage_latency.time(endpoint=endpoint, stage="upload_read"):
+            image_bytes = await file.read()
+        
+        if request_profiler.should_profile(x_profile):
+            predicted_class = await inference_executor.run_torch(
+                request_profiler.profile_call, "predict_skin_tone", classify_upload_profiled, image_bytes
+            )
+            return skintone_response(predicted_class)
+        
+        # Identical uploads (e.g. the same selfie re-sent) skip decode and inference
+        cache_key = content_key(image_bytes)
+        predicted_class = await skintone_cache.get_async(cache_key)
         
-        # Predict skin tone using the model
-        predicted_class = predict_skin_tone(skintone_model, image_bytes, device=str(device))
+        if predicted_class is None:
+            # Preprocess here, then let the batcher group this image with concurrent requests
+            image_tensor = await inference_executor.run_torch(preprocess_upload, image_bytes, endpoint)
+            predicted_class = await skintone_batcher.submit(image_tensor)
+            await skintone_cache.set_async(cache_key, predicted_class)
         
         if predicted_class is not None:
-            return SkinTonePredictionResponse(
-                predicted_skin_tone_class=predicted_class,
-                message=f"Successfully predicted skin tone: class {predicted_class}"
-            )
+            with stage_latency.time(endpoint=endpoint, stage="postprocess"):
+                return skintone_response(predicted_class)
         else:
             raise HTTPException(status_code=500, detail="Skin tone prediction failed.")
             
+    except PoolFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 @app.post("/predict_size/", response_model=SizePredictionResponse)
-async def predict_size_api(request: SizePredictionRequest):
+async def predict_size_api(request: SizePredictionRequest, x_profile: Optional[str] = Header(None)):
     try:
         # Convert request to dictionary format expected by the model
         features = {
@@ -100,31 +576,168 @@ async def predict_size_api(request: SizePredictionRequest):
             'fit': request.fit
         }
         
+        if request_profiler.should_profile(x_profile):
+            if size_cache.enabled:
+                # Predict on the same snapped features as predict_sizes(), so profiling can't change the answer
+                features, _ = quantized_key(features, NUMERIC_FEATURES, SIZE_CACHE_RESOLUTION)
+            # Profile in this process (size pool workers may be separate processes)
+            predictions, _ = await inference_executor.run_torch(
+                request_profiler.profile_call, "predict_size", size_model.predict_many_timed, [features]
+            )
+            return size_response(*predictions[0])
+        
         # Predict size using the model
-        predicted_size, probabilities = size_model.predict(features)
+        predicted_size, probabilities = (await predict_sizes([features], "/predict_size/"))[0]
         
-        # Calculate confidence (highest probability)
-        confidence = max(probabilities.values()) if probabilities else 0.0
+        return size_response(predicted_size, probabilities)
         
-        return SizePredictionResponse(
-            predicted_size=predicted_size,
-            size_probabilities=probabilities,
-            confidence=confidence,
-            message=f"Successfully predicted size: {predicted_size} (confidence: {confidence:.2%})"
-        )
+    except PoolFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Size prediction error: {str(e)}")
+
+@app.post("/predict_skin_tone/batch", response_model=SkinToneBatchResponse)
+async def predict_skin_tone_batch_api(files: List[UploadFile] = File(...)):
+    if len(files) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ITEMS} images per batch.")
+    
+    try:
+        results = [SkinToneBatchItem(index=i, filename=file.filename) for i, file in enumerate(files)]
+        
+        # Serve repeat uploads from the cache, collect the rest for one forward pass
+        pending_bytes, pending_positions, pending_keys = [], [], []
+        for i, file in enumerate(files):
+            with stage_latency.time(endpoint="/predict_skin_tone/batch", stage="upload_read"):
+                image_bytes = await file.read()
+            cache_key = content_key(image_bytes)
+            predicted_class = await skintone_cache.get_async(cache_key)
+            if predicted_class is not None:
+                results[i].prediction = skintone_response(predicted_class)
+            else:
+                pending_bytes.append(image_bytes)
+                pending_positions.append(i)
+                pending_keys.append(cache_key)
+        
+        if pending_bytes:
+            outcomes = await inference_executor.run_torch(classify_image_bytes, pending_bytes)
+            for i, cache_key, (predicted_class, error) in zip(pending_positions, pending_keys, outcomes):
+                if error is not None:
+                    results[i].error = error
+                else:
+                    await skintone_cache.set_async(cache_key, predicted_class)
+                    with stage_latency.time(endpoint="/predict_skin_tone/batch", stage="postprocess"):
+                        results[i].prediction = skintone_response(predicted_class)
+        
+        return SkinToneBatchResponse(results=results)
+    
+    except PoolFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@app.post("/predict_size/batch", response_model=SizePredictionBatchResponse)
+async def predict_size_batch_api(request: SizePredictionBatchRequest):
+    if len(request.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ITEMS} records per batch.")
+    
+    try:
+        results = [SizePredictionBatchItem(index=i) for i in range(len(request.items))]
+        
+        # Validate each record on its own and keep the bad ones out of the model call
+        valid_features, valid_positions = [], []
+        for i, item in enumerate(request.items):
+            try:
+                valid_features.append(SizePredictionRequest.model_validate(item).model_dump())
+                valid_positions.append(i)
+            except ValidationError as e:
+                results[i].error = "; ".join(
+                    f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+                )
+        
+        if valid_features:
+            # Score every valid record not in the memo in one vectorized pass
+            predictions = await predict_sizes(valid_features, "/predict_size/batch")
+            for i, (predicted_size, probabilities) in zip(valid_positions, predictions):
+                results[i].prediction = size_response(predicted_size, probabilities)
         
+        return SizePredictionBatchResponse(results=results)
+    
+    except PoolFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Size prediction error: {str(e)}")
 
+@app.get("/metrics")
+async def metrics():
+    """Request, stage latency and queue metrics in Prometheus text format"""
+    return Response(content=metrics_registry.render(), media_type=CONTENT_TYPE)
+
+@app.get("/admin/profiling")
+async def get_profiling(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    return request_profiler.stats()
+
+@app.post("/admin/profiling")
+async def set_profiling(request: ProfilingRequest, x_admin_token: Optional[str] = Header(None)):
+    """Start or stop a profiling session; stopping writes the aggregated summary"""
+    require_admin(x_admin_token)
+    try:
+        if request.enabled:
+            request_profiler.start_session(request.requests, request.sample_rate, request.profilers)
+        else:
+            request_profiler.stop_session()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return request_profiler.stats()
+
+@app.post("/admin/size_model/update")
+async def update_size_model_api(request: SizeModelUpdateRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    Incrementally update the size model with new labelled reviews, then swap it
+    in. Requests already running finish on the previous model. With several
+    uvicorn workers only this one swaps; the others load the persisted
+    artifact when they restart.
+    """
+    require_admin(x_admin_token)
+    async with size_model_update_lock:
+        previous_version = size_model.model_version if size_model is not None else None
+        try:
+            # Default thread pool: a long update shouldn't hold an inference worker
+            loop = asyncio.get_running_loop()
+            updated, summary = await loop.run_in_executor(
+                None, update_size_model, size_model, request.records, request.forgetting, request.persist
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Size model update error: {str(e)}")
+        
+        if summary['rows']:
+            # Requests already handed to the replaced process pool finish there before it shuts down
+            await inference_executor.retire_executor(install_size_model(updated))
+    return dict(summary, previous_version=previous_version, persisted=request.persist and summary['rows'] > 0)
+
 @app.get("/health")
 async def health_check():
+    if size_model is None:
+        size_status = "failed"
+    else:
+        size_status = "loaded" if size_model.coef_ is not None else "not trained"
     return {
-        "status": "ok", 
+        "status": "degraded" if model_load_errors else "ok", 
         "message": "StylesSync AI API is running",
         "models": {
-            "skin_tone": "loaded",
-            "size_prediction": "loaded"
-        }
+            "skin_tone": "loaded" if skintone_model is not None else "failed",
+            "skin_tone_runtime": skintone_runtime,
+            "size_prediction": size_status,
+            "size_model_version": size_model.model_version if size_model is not None else None
+        },
+        "load_errors": model_load_errors,
+        "skin_tone_batching": skintone_batcher.stats(),
+        "inference_executor": inference_executor.stats(),
+        "skin_tone_cache": skintone_cache.stats(),
+        "size_cache": dict(size_cache.stats(), resolution=SIZE_CACHE_RESOLUTION),
+        "startup": startup_report
     }
 
 # To run this, save it as main.py and run:
@@ -0,0 +1,168 @@
+import bisect
+import threading
+import time
+
+# metrics.py
+# Minimal Prometheus-compatible metrics: counters and histograms updated on
+# the hot path with a lock and a few additions, gauges read at scrape time.
+
+# Upper bounds (in seconds) of the default latency histogram buckets
+LATENCY_BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _label_key(labelnames, labels):
+    return tuple(map(labels.__getitem__, labelnames))
+
+class _Timer:
+    """Context manager observing its with-block's wall time (cheaper than @contextmanager)"""
+
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            yield self.name + "_total", _format_labels(self.labelnames, key), value
+
+class Histogram:
+    """Distribution of observed values (e.g. latencies) over fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS_S):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 2)
+            entry[index] += 1
+            entry[-1] += value
+
+    def time(self, **labels):
+        """Observe the wall time spent in the with-block"""
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        entry = self._values.get(_label_key(self.labelnames, labels))
+        return sum(entry[:-1]) if entry else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        for key, entry in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry[:-1]):
+                cumulative += count
+                yield self.name + "_bucket", _format_labels(self.labelnames, key, [("le", _format_value(bound))]), cumulative
+            yield self.name + "_sum", _format_labels(self.labelnames, key), entry[-1]
+            yield self.name + "_count", _format_labels(self.labelnames, key), cumulative
+
+class Gauge:
+    """
+    Point-in-time value read from a callback when metrics are scraped, so
+    things like queue depth cost nothing between scrapes.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, read, labelnames=()):
+        """
+        Args:
+            read (callable): Returns the current value, or with labelnames
+                a dict mapping label-value tuples to values
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.read = read
+
+    def samples(self):
+        value = self.read()
+        if not self.labelnames:
+            yield self.name, "", value
+            return
+        for key, item in sorted(value.items()):
+            yield self.name, _format_labels(self.labelnames, key), item
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS_S):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, read, labelnames=()):
+        return self.register(Gauge(name, documentation, read, labelnames))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,276 @@
+import json
+import os
+import time
+import torch
+
+from skintone_match import (
+    CNNModel, quantize_dynamic_model, quantized_artifact_path, record_export_source, source_record_path,
+    weights_fingerprint
+)
+
+# model_runtime.py
+# Export the skin tone CNN to optimized formats and pick which one to serve.
+
+RUNTIMES = ('eager', 'torchscript', 'onnx', 'compile')
+QUANTIZATION_MODES = ('none', 'dynamic', 'static')
+
+def artifact_paths(weights_path):
+    """Where exported artifacts for a given .pth weights file live"""
+    base = os.path.splitext(weights_path)[0]
+    return {
+        'torchscript': base + '.torchscript.pt',
+        'onnx': base + '.onnx',
+        'int8': quantized_artifact_path(weights_path),
+        'mmap': base + '.mmap.pt',
+    }
+
+def export_is_current(artifact_path, weights_path):
+    """
+    Whether an exported artifact was built from the weights file as it is now:
+    the SHA-256 recorded at export must match, and artifacts without a record
+    must be at least as new as the weights. Always True when there is no
+    weights file to compare with (a deployment that ships only the exports).
+    """
+    if not os.path.exists(weights_path):
+        return True
+    record_path = source_record_path(artifact_path)
+    if os.path.exists(record_path):
+        with open(record_path) as f:
+            return json.load(f).get('sha256') == weights_fingerprint(weights_path)
+    return os.path.getmtime(artifact_path) >= os.path.getmtime(weights_path)
+
+def stale_export_message(artifact_path, weights_path, refresh_command='python model_runtime.py'):
+    return (f"{artifact_path} was exported from a different version of {weights_path}; "
+            f"re-run `{refresh_command}` to refresh it")
+
+def available_cpus():
+    """CPUs this process may run on (respects affinity masks, e.g. container cpusets)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def configure_worker_threads(workers):
+    """
+    Split the CPUs between uvicorn workers so their torch intra-op pools
+    don't oversubscribe the cores. TORCH_NUM_THREADS overrides the split.
+
+    Returns:
+        int: Intra-op threads used by this worker
+    """
+    threads = int(os.getenv("TORCH_NUM_THREADS", "0")) or max(1, available_cpus() // max(1, workers))
+    torch.set_num_threads(threads)
+    try:
+        # Inter-op parallelism only adds contention when several workers share the cores
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set once, before any inter-op work has started
+        pass
+    return threads
+
+def export_mmap_weights(model, path):
+    """
+    Save the state dict as contiguous CPU tensors in torch's zip format,
+    which torch.load(mmap=True) can map straight from the page cache.
+    """
+    state = {name: tensor.detach().cpu().contiguous() for name, tensor in model.state_dict().items()}
+    torch.save(state, path)
+    return path
+
+def load_mmap_weights(model, path):
+    """
+    Point the model's parameters at a memory-mapped weights file instead of
+    copying them. Every worker mapping the same file shares its pages.
+    """
+    state = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+    model.load_state_dict(state, assign=True)
+    return model.eval()
+
+def export_torchscript(model, path, input_size=(128, 128)):
+    """
+    Trace and freeze the model, then save it.
+    optimize_for_inference() output can't be reloaded once saved, so that
+    pass runs at load time instead (see load_torchscript).
+    """
+    model = model.cpu().eval()
+    example = torch.randn(1, 3, *input_size)
+    with torch.no_grad():
+        frozen = torch.jit.freeze(torch.jit.trace(model, example))
+    torch.jit.save(frozen, path)
+    return path
+
+def load_torchscript(path):
+    module = torch.jit.load(path, map_location='cpu').eval()
+    return torch.jit.optimize_for_inference(module)
+
+def export_onnx(model, path, input_size=(128, 128)):
+    """Export the model to ONNX with a dynamic batch dimension"""
+    model = model.cpu().eval()
+    example = torch.randn(1, 3, *input_size)
+    torch.onnx.export(
+        model,
+        (example,),
+        path,
+        input_names=['input'],
+        output_names=['logits'],
+        dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+        opset_version=17
+    )
+    return path
+
+class OnnxRuntimeModel:
+    """Makes an onnxruntime session callable like a torch module"""
+
+    def __init__(self, path, intra_op_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, images):
+        outputs = self.session.run(None, {self.input_name: images.detach().cpu().numpy()})
+        return torch.from_numpy(outputs[0])
+
+def onnxruntime_available():
+    try:
+        import onnxruntime  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def load_runtime(runtime, eager_model, weights_path, device, quantization='none', mapped_weights=False):
+    """
+    Pick the model implementation to serve.
+
+    Args:
+        runtime (str): One of RUNTIMES, or "auto" to use the fastest exported
+            artifact that exists and was exported from the current weights
+            (ONNX, then TorchScript), falling back to eager
+        eager_model (CNNModel): Model with weights loaded, in eval mode
+        weights_path (str): The .pth file the artifacts were exported from
+        device (torch.device): Serving device; exported runtimes are CPU only
+        quantization (str): "dynamic" quantizes the linear layers at load
+            time; "static" loads the calibrated int8 export from
+            AI/quantize_model.py, and raises ValueError if it was built from
+            other weights. Either one takes precedence over runtime.
+        mapped_weights (bool): eager_model's weights are memory-mapped
+            (load_mmap_weights). Only the eager runtime shares those pages
+            between workers; the others load a private copy, so "auto" stays
+            on eager.
+
+    Returns:
+        tuple: (callable model, name of the runtime in use)
+    """
+    paths = artifact_paths(weights_path)
+
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode '{quantization}'. Expected one of {QUANTIZATION_MODES}.")
+    if quantization != 'none' and device.type != 'cpu':
+        raise ValueError("Quantized skin tone models only run on CPU.")
+    if quantization == 'dynamic':
+        return quantize_dynamic_model(eager_model), 'eager-int8-dynamic'
+    if quantization == 'static':
+        # Serving int8 results from other weights than the ones reported would be wrong, not just slow
+        if not export_is_current(paths['int8'], weights_path):
+            raise ValueError(stale_export_message(paths['int8'], weights_path, 'python AI/quantize_model.py'))
+        return torch.jit.load(paths['int8'], map_location='cpu').eval(), 'torchscript-int8-static'
+
+    if runtime == 'auto':
+        if device.type != 'cpu' or mapped_weights:
+            return eager_model, 'eager'
+        # Exports left over from earlier weights are skipped, so a retrain is never hidden by them
+        candidates = [name for name in ('onnx', 'torchscript') if os.path.exists(paths[name])
+                      and (name != 'onnx' or onnxruntime_available())]
+        for name in candidates:
+            if export_is_current(paths[name], weights_path):
+                runtime = name
+                break
+            print(f"Skipping {name}: {stale_export_message(paths[name], weights_path)}")
+        else:
+            return eager_model, 'eager'
+    elif runtime in ('torchscript', 'onnx') and not export_is_current(paths[runtime], weights_path):
+        print(f"Warning: {stale_export_message(paths[runtime], weights_path)}")
+
+    if runtime == 'eager':
+        return eager_model, 'eager'
+    if runtime == 'compile':
+        return torch.compile(eager_model), 'compile'
+    if runtime == 'torchscript':
+        return load_torchscript(paths['torchscript']), 'torchscript'
+    if runtime == 'onnx':
+        return OnnxRuntimeModel(paths['onnx'], intra_op_threads=torch.get_num_threads()), 'onnx'
+    raise ValueError(f"Unknown skin tone runtime '{runtime}'. Expected 'auto' or one of {RUNTIMES}.")
+
+def check_parity(reference, candidate, batch_sizes=(1, 8, 32), input_size=(128, 128), atol=1e-4, seed=0):
+    """
+    Compare candidate logits against the eager reference model.
+
+    Returns:
+        dict: Max absolute logit difference and argmax agreement per batch size
+    """
+    generator = torch.Generator().manual_seed(seed)
+    report = {}
+    with torch.no_grad():
+        for batch_size in batch_sizes:
+            images = torch.randn(batch_size, 3, *input_size, generator=generator)
+            expected = reference(images)
+            actual = candidate(images)
+            max_diff = (expected - actual).abs().max().item()
+            agreement = (expected.argmax(1) == actual.argmax(1)).float().mean().item()
+            report[batch_size] = {'max_abs_diff': max_diff, 'argmax_agreement': agreement, 'ok': max_diff <= atol}
+    return report
+
+def measure_latency(model, batch_size, input_size=(128, 128), warmup=5, iterations=30):
+    """Mean seconds per forward pass at a given batch size"""
+    images = torch.randn(batch_size, 3, *input_size)
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(images)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            model(images)
+    return (time.perf_counter() - start) / iterations
+
+def load_eager_model(weights_path, num_skin_tones=6):
+    model = CNNModel(num_skin_tones=num_skin_tones)
+    if weights_path and os.path.exists(weights_path):
+        model.load_state_dict(torch.load(weights_path, map_location='cpu'))
+    else:
+        print(f"No weights at {weights_path}; exporting a randomly initialized model.")
+    return model.eval()
+
+if __name__ == '__main__':
+    import argparse
+
+    default_weights = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'AI', 'trained_model.pth')
+    parser = argparse.ArgumentParser(description="Export the skin tone CNN for optimized serving")
+    parser.add_argument('--weights', default=default_weights, help="trained .pth state dict")
+    parser.add_argument('--num-classes', type=int, default=6)
+    parser.add_argument('--formats', nargs='+', default=['torchscript', 'onnx', 'mmap'], choices=['torchscript', 'onnx', 'mmap'])
+    args = parser.parse_args()
+
+    model = load_eager_model(args.weights, args.num_classes)
+    paths = artifact_paths(args.weights)
+
+    for fmt in args.formats:
+        if fmt == 'mmap':
+            export_mmap_weights(model, paths['mmap'])
+        elif fmt == 'torchscript':
+            export_torchscript(model, paths['torchscript'])
+        else:
+            export_onnx(model, paths['onnx'])
+        if os.path.exists(args.weights):
+            record_export_source(paths[fmt], args.weights)
+        if fmt == 'mmap':
+            print(f"Exported memory-mappable weights to {paths['mmap']}")
+            continue
+        exported, _ = load_runtime(fmt, model, args.weights, torch.device('cpu'))
+        report = check_parity(model, exported)
+        status = "OK" if all(r['ok'] for r in report.values()) else "MISMATCH"
+        print(f"Exported {fmt} to {paths[fmt]} - parity {status}")
+        for batch_size, r in report.items():
+            print(f"  batch {batch_size:>2}: max |logit diff| {r['max_abs_diff']:.2e}, argmax agreement {r['argmax_agreement']:.0%}")
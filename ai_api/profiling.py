@@ -0,0 +1,173 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import threading
+import time
+
+from torch.profiler import ProfilerActivity, profile, record_function
+
+# profiling.py
+# Opt-in per-request profiling. A request is profiled when it carries the
+# profiling header or an admin has armed a session; everything else only
+# pays for one attribute check.
+
+PROFILERS = ('torch', 'cprofile')
+
+class RequestProfiler:
+    """
+    Wraps selected requests in torch.profiler and/or cProfile, writes one
+    trace per request to trace_dir and aggregates operator-level totals
+    over a session of N consecutive profiled requests.
+    """
+
+    def __init__(self, trace_dir, profilers=PROFILERS, header_token=""):
+        """
+        Args:
+            trace_dir (str): Directory for traces and session summaries
+            profilers (tuple): Any of PROFILERS
+            header_token (str): Value of the profiling header that triggers
+                a profile; empty disables header-triggered profiling
+        """
+        self.trace_dir = trace_dir
+        self.profilers = self._check_profilers(profilers)
+        self.header_token = header_token
+        self.active = False
+        self.sample_rate = 1.0
+        self.remaining = 0  # 0 = no limit while active
+        self._lock = threading.Lock()  # one profiled request at a time
+        self._reset_session()
+
+    @staticmethod
+    def _check_profilers(profilers):
+        profilers = tuple(profilers)
+        unknown = set(profilers) - set(PROFILERS)
+        if unknown or not profilers:
+            raise ValueError(f"Unknown profilers {sorted(unknown)}. Expected some of {PROFILERS}.")
+        return profilers
+
+    def _reset_session(self):
+        self.session_id = time.strftime('%Y%m%d-%H%M%S')
+        self.session_requests = 0
+        self.operator_totals = {}  # op name -> [calls, self cpu us, total cpu us]
+        self.python_stats = None
+        self.last_summary_path = None
+
+    def start_session(self, requests=0, sample_rate=1.0, profilers=None):
+        """Profile the next `requests` sampled requests (0 = until stopped)"""
+        if profilers is not None:
+            self.profilers = self._check_profilers(profilers)
+        self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+        self.remaining = max(0, int(requests))
+        self._reset_session()
+        self.active = True
+
+    def stop_session(self):
+        """Stop profiling and write the aggregated summary of the session"""
+        self.active = False
+        if self.session_requests:
+            self.write_summary()
+
+    def should_profile(self, header_value=None):
+        """Cheap check run on every request"""
+        if header_value is None and not self.active:
+            return False
+        if header_value is not None:
+            return bool(self.header_token) and hmac.compare_digest(header_value.encode(), self.header_token.encode())
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def profile_call(self, name, fn, *args):
+        """
+        Run fn(*args) under the configured profilers and save the trace.
+        If another profiled request is already running, fn runs unprofiled
+        (the profilers can't be nested).
+        """
+        if not self._lock.acquire(blocking=False):
+            return fn(*args)
+        try:
+            return self._profile_locked(name, fn, args)
+        finally:
+            self._lock.release()
+
+    def _profile_locked(self, name, fn, args):
+        os.makedirs(self.trace_dir, exist_ok=True)
+        base = os.path.join(self.trace_dir, f"{self.session_id}-{self.session_requests:04d}-{name}")
+
+        python_profiler = cProfile.Profile() if 'cprofile' in self.profilers else None
+        torch_profiler = profile(activities=[ProfilerActivity.CPU], record_shapes=True) if 'torch' in self.profilers else None
+
+        if torch_profiler is not None:
+            torch_profiler.__enter__()
+        if python_profiler is not None:
+            python_profiler.enable()
+        try:
+            with record_function(name):
+                result = fn(*args)
+        finally:
+            if python_profiler is not None:
+                python_profiler.disable()
+            if torch_profiler is not None:
+                torch_profiler.__exit__(None, None, None)
+
+        if torch_profiler is not None:
+            torch_profiler.export_chrome_trace(base + '.trace.json')
+            for event in torch_profiler.key_averages():
+                totals = self.operator_totals.setdefault(event.key, [0, 0.0, 0.0])
+                totals[0] += event.count
+                totals[1] += event.self_cpu_time_total
+                totals[2] += event.cpu_time_total
+        if python_profiler is not None:
+            python_profiler.dump_stats(base + '.pstats')
+            if self.python_stats is None:
+                self.python_stats = pstats.Stats(python_profiler)
+            else:
+                self.python_stats.add(python_profiler)
+
+        self.session_requests += 1
+        if self.active and self.remaining:
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.stop_session()
+        return result
+
+    def operator_summary(self, limit=30):
+        """Operators sorted by self CPU time, summed over the session"""
+        rows = sorted(self.operator_totals.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {'operator': op, 'calls': calls, 'self_cpu_ms': self_us / 1000, 'cpu_total_ms': total_us / 1000}
+            for op, (calls, self_us, total_us) in rows
+        ]
+
+    def write_summary(self, limit=30):
+        """Write the session's operator table and top Python functions to a text file"""
+        os.makedirs(self.trace_dir, exist_ok=True)
+        path = os.path.join(self.trace_dir, f"{self.session_id}-summary.txt")
+        with open(path, 'w') as f:
+            f.write(f"Profiled requests: {self.session_requests}\n\n")
+            if self.operator_totals:
+                f.write(f"{'operator':<48}{'calls':>8}{'self ms':>12}{'total ms':>12}\n")
+                for row in self.operator_summary(limit):
+                    f.write(f"{row['operator'][:47]:<48}{row['calls']:>8}{row['self_cpu_ms']:>12.2f}{row['cpu_total_ms']:>12.2f}\n")
+            if self.python_stats is not None:
+                stream = io.StringIO()
+                self.python_stats.stream = stream
+                self.python_stats.sort_stats('cumulative').print_stats(limit)
+                f.write("\n" + stream.getvalue())
+        self.last_summary_path = path
+        return path
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "header_enabled": bool(self.header_token),
+            "profilers": list(self.profilers),
+            "sample_rate": self.sample_rate,
+            "remaining": self.remaining,
+            "trace_dir": self.trace_dir,
+            "session_id": self.session_id,
+            "session_requests": self.session_requests,
+            "last_summary": self.last_summary_path,
+            "top_operators": self.operator_summary(10),
+        }
@@ -1,9 +1,13 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from torchvision import transforms
 from PIL import Image
+from io import BytesIO
 import numpy as np
+import functools
+import hashlib
+import json
+import os
 
 # skintone_match.py
 
@@ -23,32 +27,164 @@ class CNNModel(nn.Module):
         x = self.pool(F.relu(self.conv1(x)))
         x = self.pool(F.relu(self.conv2(x)))
         x = self.pool(F.relu(self.conv3(x)))
-        x = x.view(-1, 128 * 16 * 16) # Flatten the tensor
+        x = x.reshape(-1, 128 * 16 * 16) # Flatten the tensor (reshape also handles channels_last)
         x = F.relu(self.fc1(x))
         x = self.fc2(x)
         return x
 
+class QuantizableCNNModel(CNNModel):
+    """
+    CNNModel with quant/dequant stubs and ReLU modules, so eager-mode static
+    quantization can fuse conv+relu and run the conv stack in int8.
+    Loads the same state dict as CNNModel.
+    """
+    def __init__(self, num_skin_tones=6):
+        super(QuantizableCNNModel, self).__init__(num_skin_tones)
+        self.quant = torch.ao.quantization.QuantStub()
+        self.dequant = torch.ao.quantization.DeQuantStub()
+        self.relu1 = nn.ReLU()
+        self.relu2 = nn.ReLU()
+        self.relu3 = nn.ReLU()
+        self.relu4 = nn.ReLU()
+
+    def forward(self, x):
+        x = self.quant(x)
+        x = self.pool(self.relu1(self.conv1(x)))
+        x = self.pool(self.relu2(self.conv2(x)))
+        x = self.pool(self.relu3(self.conv3(x)))
+        x = x.reshape(-1, 128 * 16 * 16)
+        x = self.relu4(self.fc1(x))
+        x = self.fc2(x)
+        return self.dequant(x)
+
+def quantize_dynamic_model(model):
+    """int8 weights for the Linear layers (mostly fc1); activations quantized on the fly"""
+    model = model.cpu().eval()
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+def quantize_static_model(model, calibration_batches, backend='x86'):
+    """
+    Fully int8 model (conv stack and linear layers), with activation ranges
+    calibrated by running calibration_batches (preprocessed image tensors)
+    through the model.
+    """
+    qmodel = QuantizableCNNModel(num_skin_tones=model.fc2.out_features)
+    qmodel.load_state_dict(model.state_dict())
+    qmodel.eval()
+
+    torch.backends.quantized.engine = backend
+    qmodel.qconfig = torch.ao.quantization.get_default_qconfig(backend)
+    torch.ao.quantization.fuse_modules(
+        qmodel,
+        [['conv1', 'relu1'], ['conv2', 'relu2'], ['conv3', 'relu3'], ['fc1', 'relu4']],
+        inplace=True
+    )
+    torch.ao.quantization.prepare(qmodel, inplace=True)
+    with torch.no_grad():
+        for images in calibration_batches:
+            qmodel(images)
+    torch.ao.quantization.convert(qmodel, inplace=True)
+    return qmodel
+
+def quantized_artifact_path(weights_path):
+    """Where the statically quantized TorchScript export of a .pth file is stored"""
+    return os.path.splitext(weights_path)[0] + '.int8.torchscript.pt'
+
+@functools.lru_cache(maxsize=8)
+def _file_sha256(path, size, mtime_ns):
+    # size and mtime_ns are only part of the cache key, so a changed file is hashed again
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def weights_fingerprint(weights_path):
+    """SHA-256 of a weights file"""
+    stat = os.stat(weights_path)
+    return _file_sha256(os.path.abspath(weights_path), stat.st_size, stat.st_mtime_ns)
+
+def source_record_path(artifact_path):
+    return artifact_path + '.source.json'
+
+def record_export_source(artifact_path, weights_path):
+    """Note which weights (by SHA-256) an exported artifact was built from"""
+    with open(source_record_path(artifact_path), 'w') as f:
+        json.dump({'weights': os.path.basename(weights_path), 'sha256': weights_fingerprint(weights_path)}, f)
+
+# ImageNet statistics used to normalize inputs, as in training
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+class ImagePreprocessor:
+    """
+    Reusable decode -> resize -> normalize pipeline for inference.
+    Everything that doesn't depend on the image is built once, and JPEGs are
+    decoded straight at a reduced scale (PIL draft mode) instead of decoding
+    a full phone-camera frame only to shrink it to 128x128.
+    """
+
+    def __init__(self, input_size=(128, 128), fast_decode=True):
+        """
+        Args:
+            input_size (tuple): Output (height, width)
+            fast_decode (bool): Use JPEG DCT scaling when the image is much
+                larger than input_size
+        """
+        self.input_size = tuple(input_size)
+        self.fast_decode = fast_decode
+        # Normalize((x / 255 - mean) / std) folded into one multiply-add on uint8 input
+        std = torch.tensor(IMAGENET_STD).view(3, 1, 1)
+        mean = torch.tensor(IMAGENET_MEAN).view(3, 1, 1)
+        self.scale = 1.0 / (255.0 * std)
+        self.bias = -mean / std
+
+    def decode(self, image_path_or_bytes):
+        """Open an image from a path or bytes and decode it to RGB"""
+        if isinstance(image_path_or_bytes, str):
+            # Assume it's a file path
+            img = Image.open(image_path_or_bytes)
+        elif isinstance(image_path_or_bytes, bytes):
+            # Assume it's image bytes (e.g., from a FastAPI UploadFile)
+            img = Image.open(BytesIO(image_path_or_bytes))
+        else:
+            raise ValueError("Input must be an image path (str) or image bytes (bytes).")
+
+        if self.fast_decode and img.format == 'JPEG':
+            # Picks the largest 1/2, 1/4 or 1/8 scale that still covers the target size
+            height, width = self.input_size
+            img.draft('RGB', (width, height))
+        return img.convert('RGB')
+
+    def resize(self, img):
+        """Resize like transforms.Resize(input_size) does for PIL images"""
+        height, width = self.input_size
+        return img.resize((width, height), Image.BILINEAR)
+
+    def to_tensor(self, img):
+        """uint8 HWC image -> normalized float CHW tensor"""
+        pixels = torch.from_numpy(np.array(img, dtype=np.uint8)).permute(2, 0, 1)
+        return pixels.float().mul_(self.scale).add_(self.bias)
+
+    def __call__(self, image_path_or_bytes):
+        img = self.resize(self.decode(image_path_or_bytes))
+        return self.to_tensor(img).unsqueeze(0) # Add batch dimension
+
+_preprocessors = {}
+
+def get_preprocessor(input_size=(128, 128)):
+    """Shared ImagePreprocessor for the given input size"""
+    input_size = tuple(input_size)
+    if input_size not in _preprocessors:
+        _preprocessors[input_size] = ImagePreprocessor(input_size)
+    return _preprocessors[input_size]
+
 def preprocess_image_for_inference(image_path_or_bytes, input_size=(128, 128)):
     """
     Preprocesses an image for PyTorch model inference.
     Handles both file paths and raw bytes (e.g., from an API request).
     """
-    if isinstance(image_path_or_bytes, str):
-        # Assume it's a file path
-        img = Image.open(image_path_or_bytes).convert('RGB')
-    elif isinstance(image_path_or_bytes, bytes):
-        # Assume it's image bytes (e.g., from a FastAPI UploadFile)
-        from io import BytesIO
-        img = Image.open(BytesIO(image_path_or_bytes)).convert('RGB')
-    else:
-        raise ValueError("Input must be an image path (str) or image bytes (bytes).")
-
-    preprocess = transforms.Compose([
-        transforms.Resize(input_size),
-        transforms.ToTensor(), # Converts to [C, H, W] and scales to [0.0, 1.0]
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]), # ImageNet means/stds
-    ])
-    return preprocess(img).unsqueeze(0) # Add batch dimension
+    return get_preprocessor(input_size)(image_path_or_bytes)
 
 def predict_skin_tone(model, image_path_or_bytes, device='cpu'):
     """
@@ -62,9 +198,24 @@ def predict_skin_tone(model, image_path_or_bytes, device='cpu'):
         outputs = model(preprocessed_image)
         _, predicted = torch.max(outputs.data, 1)
         
-        predicted_class = predicted.item()
-        print(f"Predicted skin tone class: {predicted_class}")
-        return predicted_class
+        return predicted.item()
+
+def predict_skin_tone_batch(model, images, device='cpu'):
+    """
+    Runs one forward pass over a batch of preprocessed images.
+
+    Args:
+        model (CNNModel): Model already in eval mode
+        images (torch.Tensor): Tensor of shape [N, C, H, W] from preprocess_image_for_inference
+        device (str): Device to run the forward pass on
+
+    Returns:
+        list: Predicted skin tone class for each image, in input order
+    """
+    with torch.no_grad():
+        outputs = model(images.to(device))
+        _, predicted = torch.max(outputs, 1)
+        return predicted.cpu().tolist()
 
 if __name__ == '__main__':
     # This block is for local testing and demonstration.
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import random
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import main
+from executor import InferenceExecutor
+from size_prediction import SizePredictionModel
+from synthetic import modcloth_record, size_requests, write_modcloth_jsonl
+
+# test_size_model_swap.py
+# /admin/size_model/update swaps the size model while /predict_size/ requests
+# are queued on the size pool; none of them may fail.
+
+@pytest.fixture(scope="module")
+def trained_size_model(tmp_path_factory):
+    data_path = write_modcloth_jsonl(str(tmp_path_factory.mktemp("size") / "modcloth.json"), 2000)
+    model = SizePredictionModel(data_path)
+    model.train(solver='lbfgs')
+    return model
+
+async def predict_during_update(n_requests):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        rng = random.Random(1)
+        update = {'records': [modcloth_record(rng) for _ in range(200)], 'persist': False}
+        predictions = [client.post("/predict_size/", json=payload) for payload in size_requests(n_requests)]
+        # Let some predictions queue on the size pool first, then swap in the middle of them
+        first_half = [asyncio.ensure_future(request) for request in predictions[:n_requests // 2]]
+        await asyncio.sleep(0)
+        swap = client.post("/admin/size_model/update", json=update, headers={"X-Admin-Token": "test-token"})
+        responses = await asyncio.gather(*first_half, swap, *predictions[n_requests // 2:])
+    return responses[:n_requests // 2] + responses[n_requests // 2 + 1:], responses[n_requests // 2]
+
+@pytest.mark.parametrize("size_mode", ["thread", "process"])
+def test_predictions_survive_a_model_update(monkeypatch, trained_size_model, size_mode):
+    executor = InferenceExecutor(torch_workers=1, size_workers=1, size_queue=256, size_mode=size_mode)
+    monkeypatch.setattr(main, "inference_executor", executor)
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "test-token")
+    monkeypatch.setattr(main.size_cache, "max_bytes", 0)  # every request goes to the size pool
+    monkeypatch.setattr(main, "size_model", None)
+    main.install_size_model(trained_size_model)
+    try:
+        predictions, update = asyncio.run(predict_during_update(64))
+        stats = executor.stats()["size"]
+    finally:
+        executor.shutdown(wait=True)
+
+    assert update.status_code == 200, update.text
+    assert update.json()["model_version"] != trained_size_model.model_version
+    assert main.size_model.model_version == update.json()["model_version"]
+    failures = [response.text for response in predictions if response.status_code != 200]
+    assert not failures
+    # The pool and its metrics outlive the swap
+    assert stats["completed"] == 64